@@ -0,0 +1,175 @@
+# /home/ubuntu/load_forecasting_agents/agents/auto_arima.py
+import numpy as np
+import logging
+import time
+import warnings
+from concurrent.futures import ProcessPoolExecutor
+from statsmodels.tsa.arima.model import ARIMA
+from statsmodels.tsa.seasonal import STL
+from statsmodels.tsa.stattools import kpss
+from pandas.tseries.frequencies import to_offset
+
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+
+# Seasonal period (in grid steps) searched for each grid frequency; grids not listed are searched without seasonality
+SEASONAL_PERIODS = {"15min": 96, "30min": 48, "h": 24, "D": 7, "W-MON": 52, "MS": 12}
+INFORMATION_CRITERIA = ("aic", "bic")
+MAX_P, MAX_Q, MAX_SEASONAL_P, MAX_SEASONAL_Q = 5, 5, 2, 2
+MAX_D = 2
+SEASONAL_STRENGTH_THRESHOLD = 0.64 # Seasonal differencing above this STL seasonal strength (as in R's nsdiffs)
+KPSS_ALPHA = 0.05
+
+
+def seasonal_period(grid_freq: str = None) -> int:
+    """Seasonal period for a grid frequency, or 1 (no seasonality) if unknown."""
+    if not grid_freq:
+        return 1
+    try:
+        return SEASONAL_PERIODS.get(to_offset(grid_freq).freqstr, 1)
+    except ValueError:
+        return 1
+
+
+def differencing_orders(y: np.ndarray, m: int = 1) -> tuple[int, int]:
+    """
+    Chooses the seasonal (D) and regular (d) differencing orders of a series.
+
+    D is 1 if the STL seasonal strength of the series exceeds SEASONAL_STRENGTH_THRESHOLD; d is
+    the number of differences (of the seasonally differenced series) after which a KPSS test no
+    longer rejects stationarity at KPSS_ALPHA.
+    """
+    y = np.asarray(y, dtype=np.float64)
+    D = 0
+    if m > 1 and len(y) >= 2 * m + 1:
+        decomposition = STL(y, period=m).fit()
+        seasonal_and_remainder = decomposition.seasonal + decomposition.resid
+        strength = max(0.0, 1 - np.var(decomposition.resid) / np.var(seasonal_and_remainder))
+        if strength > SEASONAL_STRENGTH_THRESHOLD:
+            D = 1
+            y = difference(y, D=1, m=m)
+    d = 0
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore") # KPSS warns when the statistic is outside its p-value table
+        while d < MAX_D and len(y) > 10 and np.ptp(y) > 0 and kpss(y, regression="c", nlags="auto")[1] < KPSS_ALPHA:
+            y = np.diff(y)
+            d += 1
+    return d, D
+
+
+def arima_trend(order: tuple, seasonal_order: tuple = (0, 0, 0, 0)) -> str:
+    """Trend term for an ARIMA model: a constant is only identifiable without differencing."""
+    return "c" if order[1] + seasonal_order[1] == 0 else "n"
+
+
+def difference(y: np.ndarray, d: int = 0, D: int = 0, m: int = 1) -> np.ndarray:
+    """Applies D seasonal (lag m) and d regular differences."""
+    for _ in range(D):
+        y = y[m:] - y[:-m]
+    for _ in range(d):
+        y = np.diff(y)
+    return y
+
+
+def _fit_information_criteria(w: np.ndarray, order: tuple, seasonal_order: tuple) -> tuple[float, float]:
+    """
+    Fits one ARIMA candidate to the already differenced series `w` and returns its (AIC, BIC), or
+    infinities if the fit fails. Fitting the ARMA part to pre-differenced data keeps the state
+    space small (seasonal differencing inside the model adds m states); all candidates of a search
+    share d and D, so their criteria stay comparable. Parameter covariances are not needed for ranking.
+    """
+    arma_order = (order[0], 0, order[2])
+    seasonal_arma_order = (seasonal_order[0], 0, seasonal_order[2], seasonal_order[3])
+    try:
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore") # Convergence and frequency warnings
+            fit = ARIMA(w, order=arma_order, seasonal_order=seasonal_arma_order,
+                        trend=arima_trend(order, seasonal_order)).fit(cov_type="none", low_memory=True)
+        if not (np.isfinite(fit.aic) and np.isfinite(fit.bic)):
+            return np.inf, np.inf
+        return float(fit.aic), float(fit.bic)
+    except Exception:
+        return np.inf, np.inf
+
+
+def _neighbours(order: tuple, seasonal_order: tuple) -> list:
+    """Stepwise moves from a candidate: p, q, P, Q by +-1, and p and q (or P and Q) together by +-1."""
+    p, d, q = order
+    P, D, Q, m = seasonal_order
+    moves = [(dp, dq, 0, 0) for dp, dq in ((1, 0), (-1, 0), (0, 1), (0, -1), (1, 1), (-1, -1))]
+    if m > 1:
+        moves += [(0, 0, dP, dQ) for dP, dQ in ((1, 0), (-1, 0), (0, 1), (0, -1), (1, 1), (-1, -1))]
+    candidates = []
+    for dp, dq, dP, dQ in moves:
+        new_p, new_q, new_P, new_Q = p + dp, q + dq, P + dP, Q + dQ
+        if 0 <= new_p <= MAX_P and 0 <= new_q <= MAX_Q and 0 <= new_P <= MAX_SEASONAL_P and 0 <= new_Q <= MAX_SEASONAL_Q:
+            candidates.append(((new_p, d, new_q), (new_P, D, new_Q, m)))
+    return candidates
+
+
+def auto_arima_order(y, m: int = 1, d: int = None, D: int = None, criterion: str = "aic",
+                     max_workers: int = None, max_steps: int = 20) -> dict:
+    """
+    Stepwise (Hyndman-Khandakar) search for ARIMA orders.
+
+    Starts from four initial candidates and repeatedly moves to the best neighbour (see
+    `_neighbours`) while it improves the information criterion, so only a small part of the grid
+    is fitted. The candidates of each step are fitted concurrently in a process pool (in this process
+    with max_workers=1), on the series differenced once up front.
+
+    Args:
+        y: Series values (no NaNs).
+        m: Seasonal period in steps (1 for no seasonal terms).
+        d, D: (Optional) Regular and seasonal differencing orders (see `differencing_orders` if None).
+        criterion: "aic" or "bic".
+        max_workers: Maximum number of processes fitting candidates (default: one per core).
+        max_steps: Maximum number of stepwise moves.
+
+    Returns:
+        A dict with "order", "seasonal_order", the criterion value ("score") and the number of fitted models.
+    """
+    if criterion not in INFORMATION_CRITERIA:
+        raise ValueError(f"Unknown information criterion '{criterion}'. Available: {list(INFORMATION_CRITERIA)}")
+    y = np.asarray(y, dtype=np.float64)
+    if d is None or D is None:
+        auto_d, auto_D = differencing_orders(y, m)
+        d = auto_d if d is None else d
+        D = auto_D if D is None else D
+    seasonal = m > 1
+    if not seasonal and D:
+        raise ValueError("Seasonal differencing requires a seasonal period m > 1.")
+    start = time.monotonic()
+    initial = [((2, d, 2), (1, D, 1, m) if seasonal else (0, 0, 0, 0)),
+               ((0, d, 0), (0, D, 0, m) if seasonal else (0, 0, 0, 0)),
+               ((1, d, 0), (1, D, 0, m) if seasonal else (0, 0, 0, 0)),
+               ((0, d, 1), (0, D, 1, m) if seasonal else (0, 0, 0, 0))]
+    scores = {}
+    index = INFORMATION_CRITERIA.index(criterion)
+    w = difference(y, d, D, m)
+
+    executor = ProcessPoolExecutor(max_workers=max_workers) if max_workers != 1 else None
+    fit_map = executor.map if executor is not None else map
+    try:
+        def fit_all(candidates):
+            candidates = [c for c in dict.fromkeys(candidates) if c not in scores]
+            results = fit_map(_fit_information_criteria, [w] * len(candidates),
+                              [c[0] for c in candidates], [c[1] for c in candidates])
+            for candidate, result in zip(candidates, results):
+                scores[candidate] = result[index]
+
+        fit_all(initial)
+        best = min(scores, key=scores.get)
+        for _ in range(max_steps):
+            fit_all(_neighbours(*best))
+            step_best = min(scores, key=scores.get)
+            if scores[step_best] >= scores[best]:
+                break
+            best = step_best
+    finally:
+        if executor is not None:
+            executor.shutdown()
+
+    if not np.isfinite(scores[best]):
+        raise ValueError("No ARIMA candidate could be fitted.")
+    logging.info(f"Auto-ARIMA selected {best[0]}x{best[1]} ({criterion.upper()} {scores[best]:.2f}) after fitting "
+                 f"{len(scores)} models in {time.monotonic() - start:.1f}s.")
+    return {"order": best[0], "seasonal_order": best[1], "score": scores[best], "fitted_models": len(scores)}
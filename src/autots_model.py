@@ -0,0 +1,107 @@
+# /home/ubuntu/load_forecasting_agents/agents/autots_model.py
+import pandas as pd
+import logging
+import threading
+import _thread
+import mlflow
+from autots import model_forecast
+
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+
+DEFAULT_AUTOTS_BUDGET = 900 # Seconds for the whole AutoTS candidate (search, validation and final forecast)
+AUTOTS_GENERATIONS_SHARE = 0.5 # Part of the budget after which no new generation is started, leaving time for validation
+AUTOTS_FIT_SHARE = 0.7 # Part of the budget after which the search is ended; the rest is left for the final forecast
+AUTOTS_SLOW_MODEL_SHARE = 0.05 # Models slower than this part of the budget are skipped for the rest of the search
+DEFAULT_AUTOTS_MODEL_LIST = "fast"
+DEFAULT_AUTOTS_ENSEMBLE = "simple"
+AUTOTS_MAX_GENERATIONS = 20
+
+
+def fit_within(model, df: pd.DataFrame, seconds: float):
+    """
+    Fits an AutoTS search, ending it after `seconds` the way Ctrl+C does: with AutoTS's default
+    model_interrupt ("stop"), the KeyboardInterrupt is caught, the run ends and the best model
+    evaluated so far is kept. The interrupt can only be delivered to the main thread; elsewhere the
+    search is bounded by its generation_timeout alone.
+
+    Returns:
+        The fitted AutoTS object. Raises TimeoutError if no model was evaluated in time.
+    """
+    if threading.current_thread() is not threading.main_thread():
+        return model.fit(df)
+    finished = threading.Event()
+    lock = threading.Lock()
+
+    def interrupt():
+        with lock:
+            if not finished.is_set():
+                _thread.interrupt_main()
+
+    timer = threading.Timer(seconds, interrupt)
+    timer.daemon = True
+    timer.start()
+    try:
+        try:
+            model = model.fit(df)
+        finally:
+            with lock:
+                finished.set()
+            timer.cancel()
+    except KeyboardInterrupt:
+        # Delivered outside the evaluation loops AutoTS guards (e.g. while preparing the data)
+        pass
+    if not model.best_model_name:
+        raise TimeoutError(f"AutoTS found no model within {seconds:.0f}s.")
+    if getattr(model, "run_was_interrupted", False):
+        logging.info(f"AutoTS search ended after {seconds:.0f}s; keeping the best model found so far.")
+    return model
+
+
+class AutoTSForecaster(mlflow.pyfunc.PythonModel):
+    """
+    MLflow pyfunc model serving the best template (a single model or an ensemble) of an AutoTS search.
+
+    Only the template and the history it is refitted on are kept, not the search results. This is
+    how AutoTS itself predicts after a search: the template is refitted on the history each time
+    a longer horizon is needed. The last forecast is cached, so requests within its horizon are
+    served without refitting.
+
+    The whole history is kept, because that is what the template was evaluated on and what some
+    templates (seasonal or ensemble models) need; a shorter tail would change the forecasts. The
+    pickled artifact therefore grows with the history by about 16 bytes per row (timestamp and
+    float64 value), e.g. about 1.4 MB for ten years of hourly data.
+
+    Input: a DataFrame with a "ds" column of timestamps to forecast (on the history's grid, after
+    its last timestamp). Output: "ds", "yhat", "yhat_lower" and "yhat_upper" for those timestamps.
+    """
+
+    def __init__(self, template: dict, history: pd.DataFrame, frequency: str, prediction_interval: float = 0.9):
+        self.template = template # AutoTS "Model", "ModelParameters" and "TransformationParameters"
+        self.history = history # Wide frame (DatetimeIndex, one column per series) the template is refitted on
+        self.frequency = frequency
+        self.prediction_interval = prediction_interval
+        self._forecast = None
+
+    def forecast(self, steps: int) -> pd.DataFrame:
+        """Forecasts `steps` grid steps after the end of the history (reusing the cached forecast if long enough)."""
+        if self._forecast is None or len(self._forecast) < steps:
+            prediction = model_forecast(model_name=self.template["Model"],
+                                        model_param_dict=self.template["ModelParameters"],
+                                        model_transform_dict=self.template["TransformationParameters"],
+                                        df_train=self.history, forecast_length=steps, frequency=self.frequency,
+                                        prediction_interval=self.prediction_interval, n_jobs=1)
+            value_col = self.history.columns[0]
+            self._forecast = pd.DataFrame({"yhat": prediction.forecast[value_col].to_numpy(),
+                                           "yhat_lower": prediction.lower_forecast[value_col].to_numpy(),
+                                           "yhat_upper": prediction.upper_forecast[value_col].to_numpy()},
+                                          index=prediction.forecast.index)
+        return self._forecast.iloc[:steps]
+
+    def predict(self, context, model_input, params=None):
+        ds = pd.to_datetime(model_input["ds"])
+        grid = pd.date_range(self.history.index[-1], ds.max(), freq=self.frequency)[1:]
+        forecast = self.forecast(max(len(grid), 1))
+        forecast = forecast.reindex(pd.DatetimeIndex(ds))
+        return pd.DataFrame({"ds": ds.to_numpy(), "yhat": forecast["yhat"].to_numpy(),
+                             "yhat_lower": forecast["yhat_lower"].to_numpy(),
+                             "yhat_upper": forecast["yhat_upper"].to_numpy()})
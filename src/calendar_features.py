@@ -0,0 +1,103 @@
+# /home/ubuntu/load_forecasting_agents/agents/calendar_features.py
+import pandas as pd
+import numpy as np
+import logging
+import threading
+from pandas.tseries.holiday import USFederalHolidayCalendar
+
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+
+# Holiday calendars that can be selected by name
+HOLIDAY_CALENDARS = {
+    "US": USFederalHolidayCalendar,
+}
+# Extra days added around a requested range when the per-date table is (re)built,
+# so that consecutive calls on neighbouring data do not trigger a rebuild
+TABLE_MARGIN_DAYS = 366
+
+CALENDAR_FEATURES = ["hour", "dayofweek", "dayofyear", "month", "year", "weekofyear", "quarter"]
+HOLIDAY_FEATURES = ["is_holiday", "is_working_day"]
+
+
+class CalendarFeatureEngine:
+    """
+    Computes calendar features for a DatetimeIndex.
+
+    Per-date attributes (day of week, ISO week, month, holidays, ...) are computed once for
+    each calendar day in a cached table and broadcast back to rows with integer indexing, so
+    the cost per row is a subtraction and a gather instead of a datetime decomposition.
+    """
+
+    def __init__(self, holiday_calendar: str = None):
+        if holiday_calendar is not None and holiday_calendar not in HOLIDAY_CALENDARS:
+            raise ValueError(f"Unknown holiday calendar '{holiday_calendar}'. Available: {list(HOLIDAY_CALENDARS)}")
+        self.holiday_calendar = holiday_calendar
+        self._first_day = None # Days since epoch of the first table entry
+        self._last_day = None
+        self._table = None
+        self._lock = threading.Lock()
+
+    @property
+    def feature_names(self) -> list:
+        return CALENDAR_FEATURES + (HOLIDAY_FEATURES if self.holiday_calendar else [])
+
+    def _build_table(self, first_day: int, last_day: int) -> dict:
+        days = pd.DatetimeIndex(np.arange(first_day, last_day + 1).astype("datetime64[D]"))
+        table = {
+            "dayofweek": days.dayofweek.to_numpy(dtype=np.int32),
+            "dayofyear": days.dayofyear.to_numpy(dtype=np.int32),
+            "month": days.month.to_numpy(dtype=np.int32),
+            "year": days.year.to_numpy(dtype=np.int32),
+            "weekofyear": days.isocalendar().week.to_numpy(dtype=np.int64),
+            "quarter": days.quarter.to_numpy(dtype=np.int32),
+        }
+        if self.holiday_calendar:
+            holidays = HOLIDAY_CALENDARS[self.holiday_calendar]().holidays(start=days[0], end=days[-1])
+            is_holiday = days.isin(holidays)
+            table["is_holiday"] = is_holiday.astype(np.int8)
+            table["is_working_day"] = ((table["dayofweek"] < 5) & ~is_holiday).astype(np.int8)
+        return table
+
+    def _ensure_range(self, first_day: int, last_day: int) -> tuple[int, dict]:
+        with self._lock:
+            if self._table is None or first_day < self._first_day or last_day > self._last_day:
+                new_first = first_day - TABLE_MARGIN_DAYS if self._table is None else min(first_day - TABLE_MARGIN_DAYS, self._first_day)
+                new_last = last_day + TABLE_MARGIN_DAYS if self._table is None else max(last_day + TABLE_MARGIN_DAYS, self._last_day)
+                self._table = self._build_table(new_first, new_last)
+                self._first_day, self._last_day = new_first, new_last
+                logging.info(f"Built calendar table for {new_last - new_first + 1} days.")
+            return self._first_day, self._table
+
+    def transform(self, index: pd.DatetimeIndex) -> dict:
+        """
+        Returns a dict of feature name -> numpy array aligned with `index`.
+        Timezone-aware indexes use their local wall-clock time.
+        """
+        if index.tz is not None:
+            index = index.tz_localize(None)
+        values = index.to_numpy()
+        days = values.astype("datetime64[D]")
+        day_numbers = days.astype(np.int64)
+        features = {"hour": ((values - days.astype(values.dtype)) // np.timedelta64(1, "h")).astype(np.int32)}
+        if len(day_numbers) == 0:
+            for name in self.feature_names[1:]:
+                features[name] = np.empty(0, dtype=np.int32)
+            return features
+
+        first_day, table = self._ensure_range(int(day_numbers.min()), int(day_numbers.max()))
+        positions = day_numbers - first_day
+        for name, column in table.items():
+            features[name] = column[positions]
+        return features
+
+
+_engines = {}
+_engines_lock = threading.Lock()
+
+
+def get_calendar_engine(holiday_calendar: str = None) -> CalendarFeatureEngine:
+    """Returns the shared engine for a holiday calendar, so per-date tables are reused across calls."""
+    with _engines_lock:
+        if holiday_calendar not in _engines:
+            _engines[holiday_calendar] = CalendarFeatureEngine(holiday_calendar)
+        return _engines[holiday_calendar]
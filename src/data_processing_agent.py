@@ -3,17 +3,154 @@ import pandas as pd
 import numpy as np
 import logging
 import os
+import shutil
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from urllib.parse import urlparse
+from urllib.request import urlopen
+from agents.processed_data import (is_parquet_path, is_store_path, processed_filename, save_processed_data, append_processed_data,
+                                   read_processed_tail, read_processed_metadata, write_series_partition,
+                                   ProcessedDataWriter)
+from agents.processed_cache import ProcessedDataCache, DEFAULT_CACHE_MAX_BYTES
+from agents.calendar_features import get_calendar_engine
+from agents.lag_features import resolve_lag_spec, lag_warmup, add_lag_features
+from agents.datetime_parsing import detect_datetime_format, parse_datetimes, DETECTION_SAMPLE_SIZE
+from agents.time_grid import granularity_to_freq, infer_grid_freq, grid_label, regularize, DEFAULT_MAX_GAP
+from agents.dtype_profiles import DTYPE_PROFILES, apply_dtype_profile, log_memory_usage
+from agents.data_profile import ProfileBuilder, build_profile, load_profile, merge_profiles, save_profile, profile_path
+from agents.outliers import (OUTLIER_REPAIRS, DEFAULT_OUTLIER_WINDOW, DEFAULT_OUTLIER_SIGMAS, SCALE_SAMPLE_SIZE,
+                             repair_outliers, robust_scale)
 logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
-class DataProcessingAgent    def __init__(self, raw_data_dir='/home/ubuntu/load_forecasting_agents/data/raw',
-                 processed_data_dir='/home/ubuntu/load_forecasting_agents/data/processed'):     self.raw_data_dir = raw_data_dir
+
+RAW_COPY_BUFFER_BYTES = 16 * 1024 * 1024
+DEFAULT_CHUNKSIZE = 500_000
+# Bump whenever cleaning or feature engineering output changes, so cached results are not reused
+FEATURE_ENGINEERING_VERSION = 5
+# Agent attributes that process_incremental takes from the existing dataset's metadata for the duration of the call
+INCREMENTAL_SETTINGS = ("datetime_format", "grid_freq", "resample_agg", "max_gap", "dtype_profile", "outlier_repair",
+                        "outlier_window", "outlier_sigmas", "outlier_scale", "resolved_lag_spec")
+
+class DataProcessingAgent:
+    def __init__(self, raw_data_dir='/home/ubuntu/load_forecasting_agents/data/raw',
+                 processed_data_dir='/home/ubuntu/load_forecasting_agents/data/processed',
+                 cache_dir: str = None, cache_max_bytes: int = DEFAULT_CACHE_MAX_BYTES,
+                 holiday_calendar: str = None, lag_spec: dict | str = None, resample_freq: str = None,
+                 resample_agg: str = "mean", max_gap: int = DEFAULT_MAX_GAP, dtype_profile: str = "standard",
+                 outlier_repair: str = None, outlier_window: int = DEFAULT_OUTLIER_WINDOW,
+                 outlier_sigmas: float = DEFAULT_OUTLIER_SIGMAS):
+        """
+        Args:
+            raw_data_dir: Directory where raw input copies are stored.
+            processed_data_dir: Directory where processed outputs are written.
+            cache_dir: (Optional) Directory for the content-addressed cache of processed results.
+                       Caching is disabled if None.
+            cache_max_bytes: Size limit of the cache on disk; least recently used entries are evicted.
+            holiday_calendar: (Optional) Name of a holiday calendar (e.g. "US") used to add
+                              is_holiday/is_working_day features. No holiday features if None.
+            lag_spec: (Optional) Lag/rolling feature spec (see lag_features.DEFAULT_LAG_SPEC), or
+                      lag_features.AUTO_LAG_SPEC to scale the default spec to the grid step of the
+                      data. No lag features are added if None.
+            resample_freq: (Optional) Target time grid: a project forecast granularity ("Hourly",
+                           "Daily", ...), a pandas offset alias ("15min") or "infer" to use the
+                           median spacing of the data. The series is not resampled if None.
+            resample_agg: Aggregation used when several readings fall into one grid interval.
+            max_gap: Longest run of empty grid intervals that is filled by interpolation;
+                     longer gaps are dropped.
+            dtype_profile: "standard" keeps int32/int64 calendar features and float64 values;
+                           "compact" stores calendar features as int8/int16, values and lag
+                           features as float32 and holiday flags as categoricals (see dtype_profiles).
+            outlier_repair: (Optional) How points flagged by the Hampel (rolling median/MAD) test are
+                            repaired: "median", "interpolate", "clip", "drop" or "flag" (count only).
+                            No outlier detection if None.
+            outlier_window: Rows (odd) in the centred window of the outlier test.
+            outlier_sigmas: Outlier threshold in robust standard deviations.
+        """
+        self.raw_data_dir = raw_data_dir
         self.processed_data_dir = processed_data_dir
         self.datetime_col = None
         self.value_col = None
+        self.datetime_format = None # Explicit (given or detected) format of the datetime column
+        self.cache = ProcessedDataCache(cache_dir, max_bytes=cache_max_bytes) if cache_dir else None
+        self.holiday_calendar = holiday_calendar
+        self.calendar_engine = get_calendar_engine(holiday_calendar)
+        self.lag_spec = lag_spec
+        self.resolved_lag_spec = None # lag_spec with offsets resolved to rows for the current dataset
+        if resample_freq is not None and resample_freq != "infer" and granularity_to_freq(resample_freq) is None:
+            raise ValueError(f"Unknown resample frequency '{resample_freq}'.")
+        self.resample_freq = resample_freq
+        self.resample_agg = resample_agg
+        self.max_gap = max_gap
+        self.grid_freq = None # Resolved grid frequency of the current dataset (None if not resampled)
+        if dtype_profile not in DTYPE_PROFILES:
+            raise ValueError(f"Unknown dtype profile '{dtype_profile}'. Available: {list(DTYPE_PROFILES)}")
+        self.dtype_profile = dtype_profile
+        self.memory_bytes = None # In-memory size of the last processed frame
+        if outlier_repair is not None and outlier_repair not in OUTLIER_REPAIRS:
+            raise ValueError(f"Unknown outlier repair '{outlier_repair}'. Available: {list(OUTLIER_REPAIRS)}")
+        if outlier_window < 3 or outlier_window % 2 == 0:
+            raise ValueError("outlier_window must be an odd number of rows >= 3.")
+        self.outlier_repair = outlier_repair
+        self.outlier_window = outlier_window
+        self.outlier_sigmas = outlier_sigmas
+        self.outlier_scale = None # Robust deviation of the current series, shared by the outlier tests of all its chunks
+        self.cleaning_stats = {} # Counts of rows fixed while cleaning the current dataset
+        self.profile = None # Reference profile of the last processed frame (also written as a sidecar)
         os.makedirs(self.raw_data_dir, exist_ok=True)
         os.makedirs(self.processed_data_dir, exist_ok=True)
         logging.info("DataProcessingAgent initialized.")
 
+    def _resolve_source(self, source_path: str) -> tuple[str | None, bool]:
+        """
+        Resolves a local path (falling back to the raw data directory) or URL.
+        Returns the resolved path and whether it is a URL; the path is None if it cannot be found.
+        """
+        parsed_url = urlparse(source_path)
+        is_url = all([parsed_url.scheme, parsed_url.netloc])
+
+        if not is_url and not os.path.isabs(source_path) and not os.path.exists(source_path):
+             potential_path = os.path.join(self.raw_data_dir, source_path)
+             if os.path.exists(potential_path):
+                 logging.info(f"Found file in raw data directory: {potential_path}")
+                 return potential_path, False
+             logging.error(f"Local file not found: {source_path} or {potential_path}")
+             return None, False
+        elif not is_url and not os.path.exists(source_path):
+            logging.error(f"Local file not found: {source_path}")
+            return None, False
+        return source_path, is_url
+
+    def _save_raw_copy(self, source_path: str, is_url: bool) -> str:
+        """
+        Copies the raw source into the raw data directory byte-for-byte, without parsing it.
+        Returns the local path to read from (the copy if one was made, otherwise the source).
+        """
+        if not is_url and os.path.abspath(source_path).startswith(os.path.abspath(self.raw_data_dir)):
+            return source_path
+
+        raw_filename = os.path.basename(urlparse(source_path).path) if is_url else os.path.basename(source_path)
+        raw_save_path = os.path.join(self.raw_data_dir, raw_filename)
+        try:
+            if is_url:
+                with urlopen(source_path) as response, open(raw_save_path, "wb") as out:
+                    shutil.copyfileobj(response, out, RAW_COPY_BUFFER_BYTES)
+            else:
+                shutil.copyfile(source_path, raw_save_path)
+            logging.info(f"Saved raw data copy to: {raw_save_path}")
+            return raw_save_path
+        except Exception as save_err:
+            logging.warning(f"Could not save raw data copy to {raw_save_path}: {save_err}")
+            return source_path
+
+    def _check_columns(self, source_path: str) -> bool:
+        """Reads only the CSV header and checks that the datetime and value columns exist."""
+        columns = pd.read_csv(source_path, nrows=0).columns
+        if self.datetime_col not in columns:
+            logging.error(f"Datetime column '{self.datetime_col}' not found.")
+            return False
+        if self.value_col not in columns:
+            logging.error(f"Value column '{self.value_col}' not found.")
+            return False
+        return True
+
     def _load_data(self, source_path: str) -> pd.DataFrame | None:
         """
         Internal method to load data from a CSV file (local path or URL).
@@ -21,42 +158,19 @@ class DataProcessingAgent    def __init__(self, raw_data_dir='/home/ubuntu/load_
         """
         logging.info(f"Attempting to load data from: {source_path}")
         try:
-            parsed_url = urlparse(source_path)
-            is_url = all([parsed_url.scheme, parsed_url.netloc])
-
-            if not is_url and not os.path.isabs(source_path) and not os.path.exists(source_path):
-                 potential_path = os.path.join(self.raw_data_dir, source_path)
-                 if os.path.exists(potential_path):
-                     source_path = potential_path
-                     logging.info(f"Found file in raw data directory: {source_path}")
-                 else:
-                     logging.error(f"Local file not found: {source_path} or {potential_path}")
-                     return None
-            elif not is_url and not os.path.exists(source_path):
-                logging.error(f"Local file not found: {source_path}")
+            source_path, is_url = self._resolve_source(source_path)
+            if source_path is None:
                 return None
 
-            df = pd.read_csv(source_path)
-            logging.info(f"Successfully loaded data. Shape: {df.shape}")
+            # Save raw copy if needed (streamed to disk, not round-tripped through pandas)
+            source_path = self._save_raw_copy(source_path, is_url)
 
-            if self.datetime_col not in df.columns:
-                logging.error(f"Datetime column \'{self.datetime_col}\' not found.")
+            if not self._check_columns(source_path):
                 return None
-            if self.value_col not in df.columns:
-                logging.error(f"Value column \'{self.value_col}\' not found.")
-                return None
-
-            # Save raw copy if needed
-            if is_url or not os.path.abspath(source_path).startswith(os.path.abspath(self.raw_data_dir)):
-                 raw_filename = os.path.basename(source_path)
-                 raw_save_path = os.path.join(self.raw_data_dir, raw_filename)
-                 try:
-                     df.to_csv(raw_save_path, index=False)
-                     logging.info(f"Saved raw data copy to: {raw_save_path}")
-                 except Exception as save_err:
-                     logging.warning(f"Could not save raw data copy to {raw_save_path}: {save_err}")
 
-            return df[[self.datetime_col, self.value_col]].copy()
+            df = pd.read_csv(source_path, usecols=[self.datetime_col, self.value_col])
+            logging.info(f"Successfully loaded data. Shape: {df.shape}")
+            return df[[self.datetime_col, self.value_col]]
 
         except FileNotFoundError:
             logging.error(f"File not found error for: {source_path}")
@@ -65,50 +179,148 @@ class DataProcessingAgent    def __init__(self, raw_data_dir='/home/ubuntu/load_
             logging.error(f"Error loading data from {source_path}: {e}")
             return None
 
-    def _validate_and_clean(self, df: pd.DataFrame) -> pd.DataFrame | None:
-        """Validates, cleans, and standardizes the loaded dataframe."""
+    def _iter_chunks(self, source_path: str, chunksize: int):
+        """
+        Yields raw chunks of at most `chunksize` rows containing only the datetime and value columns.
+        Both columns are read as strings so no per-chunk type inference is needed; values are then
+        converted like in `_validate_and_clean`, with malformed cells (e.g. "n/a") becoming NaN.
+        """
+        reader = pd.read_csv(
+            source_path,
+            usecols=[self.datetime_col, self.value_col],
+            dtype={self.datetime_col: str, self.value_col: str},
+            chunksize=chunksize,
+        )
+        with reader:
+            for chunk in reader:
+                chunk[self.value_col] = pd.to_numeric(chunk[self.value_col], errors="coerce").astype(np.float64)
+                yield chunk[[self.datetime_col, self.value_col]]
+
+    def _stream_sample(self, source_path: str, chunksize: int, sample_sizes: dict) -> dict:
+        """
+        Values spread over the whole source, read chunk by chunk (sampled columns only): up to
+        `sample_sizes[column]` evenly spaced non-missing values of each column per chunk. The datetime
+        format is detected from them rather than from the first chunk alone (e.g. day-first dates
+        whose first days are <= 12), and the outlier test's series deviation is estimated from them.
+        """
+        dtypes = {self.datetime_col: str, self.value_col: "float64"}
+        reader = pd.read_csv(source_path, usecols=list(sample_sizes), dtype=str, chunksize=chunksize)
+        samples = {column: [] for column in sample_sizes}
+        with reader:
+            for chunk in reader:
+                if self.value_col in chunk:
+                    chunk[self.value_col] = pd.to_numeric(chunk[self.value_col], errors="coerce")
+                for column, size in sample_sizes.items():
+                    values = chunk[column].dropna()
+                    if len(values) > size:
+                        values = values.iloc[np.linspace(0, len(values) - 1, size).astype(int)]
+                    samples[column].append(values)
+        return {column: pd.concat(values, ignore_index=True) if values else pd.Series(dtype=dtypes[column])
+                for column, values in samples.items()}
+
+    def _validate_and_clean(self, df: pd.DataFrame, ffill_seed: float = None, anchor: pd.Series = None,
+                            regularize_grid: bool = True, outlier_context=None,
+                            strict_datetime_format: bool = False, detect_outliers: bool = True,
+                            after: pd.Timestamp = None) -> pd.DataFrame | None:
+        """
+        Validates, cleans, and standardizes the loaded dataframe.
+
+        Args:
+            df: Raw dataframe with the datetime and value columns.
+            ffill_seed: (Optional) Last known value preceding `df`, used when cleaning a chunk of a
+                        larger stream so that leading NaNs are forward filled across the chunk boundary
+                        instead of back filled.
+            anchor: (Optional) Last processed row preceding `df`, used to interpolate across the
+                    boundary when regularizing (see time_grid.regularize).
+            regularize_grid: Whether to put the result on the time grid (step 6). Callers that
+                             regularize themselves (e.g. across stream chunks) pass False.
+            outlier_context: (Optional) Cleaned values immediately preceding `df`, used to fill the
+                             outlier test's windows at the start of an increment.
+            strict_datetime_format: Fail instead of falling back to per-value parsing when the
+                                    datetime format does not match, e.g. for a chunk of a stream
+                                    whose other chunks were parsed with that format.
+            detect_outliers: Whether to run the outlier test (step 5b). Callers that test across
+                             chunk boundaries themselves (see process_data_streaming) pass False.
+            after: (Optional) Last timestamp of already processed data. Rows at or before it are
+                   dropped right after parsing, so they cannot affect the imputation, outlier
+                   test or regularization of the remaining rows. The result may then be empty.
+        """
         logging.info("Starting data validation and cleaning...")
         if df is None or df.empty:
             logging.error("Input DataFrame is empty or None.")
             return None
 
-        # 1. Handle Datetime Column
-        try:
-            df[self.datetime_col] = pd.to_datetime(df[self.datetime_col])
-            logging.info(f"Converted \'{self.datetime_col}\' to datetime objects.")
-        except Exception as e:
-            logging.error(f"Error converting \'{self.datetime_col}\' to datetime: {e}. Attempting inference.")
+        # 1. Handle Datetime Column (explicit-format fast path, detected once from a sample)
+        if self.datetime_format is None:
+            self.datetime_format = detect_datetime_format(df[self.datetime_col])
+            if self.datetime_format:
+                logging.info(f"Detected datetime format for '{self.datetime_col}': {self.datetime_format}")
+        parsed = False
+        while self.datetime_format and not parsed:
+            try:
+                df[self.datetime_col] = parse_datetimes(df[self.datetime_col], self.datetime_format)
+                parsed = True
+                logging.info(f"Converted '{self.datetime_col}' to datetime objects using format {self.datetime_format}.")
+            except Exception as e:
+                if strict_datetime_format:
+                    logging.error(f"Format {self.datetime_format} did not match all values of '{self.datetime_col}': {e}.")
+                    return None
+                # A given format may be stale (e.g. from a previous upload); detect the format of this data instead
+                detected = detect_datetime_format(df[self.datetime_col])
+                if detected == self.datetime_format:
+                    detected = None
+                logging.warning(f"Format {self.datetime_format} did not match all values of '{self.datetime_col}': {e}. "
+                                + (f"Retrying with detected format {detected}." if detected else "Falling back to per-value parsing."))
+                self.datetime_format = detected # None is not recorded in the metadata, so later runs do not reuse a wrong format
+        if not parsed:
             try:
-                df[self.datetime_col] = pd.to_datetime(df[self.datetime_col], infer_datetime_format=True)
-                logging.info(f"Successfully converted \'{self.datetime_col}\' with format inference.")
-            except Exception as e2:
-                 logging.error(f"Failed to convert \'{self.datetime_col}\' to datetime even with inference: {e2}")
+                df[self.datetime_col] = pd.to_datetime(df[self.datetime_col], format="mixed")
+                logging.info(f"Converted '{self.datetime_col}' to datetime objects with per-value parsing.")
+            except Exception as e:
+                 logging.error(f"Failed to convert '{self.datetime_col}' to datetime: {e}")
                  return None
 
         # 2. Handle Value Column
         try:
-            df[self.value_col] = pd.to_numeric(df[self.value_col], errors=\'coerce\')
-            logging.info(f"Converted \'{self.value_col}\' to numeric.")
+            # Always float64, so chunks with and without missing values (and whole files) get one dtype
+            df[self.value_col] = pd.to_numeric(df[self.value_col], errors='coerce').astype(np.float64)
+            logging.info(f"Converted '{self.value_col}' to numeric.")
         except Exception as e:
-            logging.error(f"Error converting \'{self.value_col}\' to numeric: {e}")
+            logging.error(f"Error converting '{self.value_col}' to numeric: {e}")
             return None
 
         # 3. Set Index and Sort
         df = df.set_index(self.datetime_col).sort_index()
-        logging.info(f"Set \'{self.datetime_col}\' as index and sorted.")
+        logging.info(f"Set '{self.datetime_col}' as index and sorted.")
 
         # 4. Handle Duplicates (keep first by default)
         initial_rows = len(df)
-        df = df[~df.index.duplicated(keep=\'first\')]
+        df = df[~df.index.duplicated(keep='first')]
         if len(df) < initial_rows:
             logging.warning(f"Removed {initial_rows - len(df)} duplicate index entries.")
 
+        # 4b. Drop rows that were already processed
+        if after is not None:
+            duplicates = df.index == after
+            late = df.index < after
+            if duplicates.any():
+                logging.info(f"Dropped {int(duplicates.sum())} rows already present at {after}.")
+            if late.any():
+                logging.warning(f"Dropped {int(late.sum())} late rows older than the last processed timestamp {after}.")
+            df = df[df.index > after]
+            if df.empty:
+                return df
+
         # 5. Handle Missing Values (Load Value Column)
         missing_count = df[self.value_col].isnull().sum()
+        self.cleaning_stats["duplicate_rows"] = self.cleaning_stats.get("duplicate_rows", 0) + initial_rows - len(df)
+        self.cleaning_stats["missing_values"] = self.cleaning_stats.get("missing_values", 0) + int(missing_count)
         if missing_count > 0:
-            logging.warning(f"Found {missing_count} missing values in \'{self.value_col}\'. Imputing with forward fill.")
+            logging.warning(f"Found {missing_count} missing values in '{self.value_col}'. Imputing with forward fill.")
             # Simple imputation: forward fill. More sophisticated methods could be added.
             df[self.value_col] = df[self.value_col].ffill()
+            if ffill_seed is not None:
+                df[self.value_col] = df[self.value_col].fillna(ffill_seed)
             # Check if any NaNs remain (e.g., at the beginning)
             remaining_nan = df[self.value_col].isnull().sum()
             if remaining_nan > 0:
@@ -118,104 +330,738 @@ class DataProcessingAgent    def __init__(self, raw_data_dir='/home/ubuntu/load_
                      logging.error("Could not impute all NaNs. Filling remaining with 0.")
                      df[self.value_col] = df[self.value_col].fillna(0)
 
-        # 6. Infer Frequency and Resample if needed (Optional - depends on use case)
-        # inferred_freq = pd.infer_freq(df.index)
-        # logging.info(f"Inferred frequency: {inferred_freq}")
-        # If a specific frequency is required by the user/model, resample here.
-        # Example: df = df.resample(\'H\').mean() # Resample to hourly, taking the mean
+        # 5b. Detect and repair outliers (spikes, zero-drops) with a rolling median/MAD test
+        if self.outlier_repair and detect_outliers:
+            df = self._repair_outliers(df, context=outlier_context)
+
+        # 6. Resample onto a regular time grid (if a target frequency is configured)
+        if regularize_grid and self._resolve_grid_freq(df.index):
+            df = self._regularize(df, anchor=anchor)
 
         logging.info("Data validation and cleaning completed.")
         return df
 
-    def _engineer_features(self, df: pd.DataFrame) -> pd.DataFrame:
-        """Engineers time-based features."""
+    def _repair_outliers(self, df: pd.DataFrame, context=None, lookahead=None) -> pd.DataFrame:
+        """
+        Runs the outlier test and repair on `df` (see outliers.repair_outliers) and counts the flagged
+        points. The series' robust deviation is computed once, from the first rows tested, unless it
+        was set beforehand (from a sample of a stream, or from the metadata of the data being appended to).
+        """
+        if self.outlier_scale is None:
+            prior = np.asarray(context if context is not None else [], dtype=np.float64)[-self.outlier_window:]
+            self.outlier_scale = robust_scale(np.concatenate((prior, df[self.value_col].to_numpy(dtype=np.float64))))
+        df, n_outliers = repair_outliers(df, self.value_col, self.outlier_repair, window=self.outlier_window,
+                                         n_sigmas=self.outlier_sigmas, context=context, lookahead=lookahead,
+                                         scale=self.outlier_scale)
+        self.cleaning_stats["outliers"] = self.cleaning_stats.get("outliers", 0) + n_outliers
+        if n_outliers:
+            logging.warning(f"Flagged {n_outliers} outliers in '{self.value_col}' (repair: {self.outlier_repair}).")
+        return df
+
+    def _resolve_grid_freq(self, index: pd.DatetimeIndex) -> str | None:
+        """Resolves `resample_freq` to the grid frequency of the current dataset, inferring it once if requested."""
+        if self.grid_freq is None and self.resample_freq is not None:
+            if self.resample_freq == "infer":
+                self.grid_freq = infer_grid_freq(index)
+                if self.grid_freq is None:
+                    logging.warning("Could not infer a grid frequency; the series is not resampled.")
+                    return None
+                logging.info(f"Inferred grid frequency: {self.grid_freq}")
+            else:
+                self.grid_freq = granularity_to_freq(self.resample_freq)
+        return self.grid_freq
+
+    def _regularize(self, df: pd.DataFrame, anchor: pd.Series = None) -> pd.DataFrame:
+        initial_rows = len(df)
+        df = regularize(df, self.value_col, self.grid_freq, agg=self.resample_agg, max_gap=self.max_gap, anchor=anchor)
+        logging.info(f"Resampled {initial_rows} rows onto a {self.grid_freq} grid of {len(df)} rows.")
+        return df
+
+    def _engineer_features(self, df: pd.DataFrame, history=None) -> pd.DataFrame:
+        """
+        Engineers time-based features.
+
+        Args:
+            df: Cleaned frame with a sorted datetime index.
+            history: (Optional) Cleaned values immediately preceding `df`, used as lag/rolling
+                     history when `df` is a chunk or an increment of a longer series.
+        """
         logging.info("Starting feature engineering...")
         if df is None or df.empty:
             logging.error("Input DataFrame for feature engineering is empty or None.")
             return df # Return original empty/None df
 
-        df[\'hour\'] = df.index.hour
-        df[\'dayofweek\'] = df.index.dayofweek # Monday=0, Sunday=6
-        df[\'dayofyear\'] = df.index.dayofyear
-        df[\'month\'] = df.index.month
-        df[\'year\'] = df.index.year
-        df[\'weekofyear\'] = df.index.isocalendar().week.astype(int)
-        df[\'quarter\'] = df.index.quarter
+        # Calendar features (hour, dayofweek with Monday=0, dayofyear, month, year, ISO weekofyear,
+        # quarter and optional holiday flags) are looked up from a cached per-date table
+        calendar_features = self.calendar_engine.transform(df.index)
+        for name, values in calendar_features.items():
+            df[name] = values
 
-        # Example Lag Feature (can be customized or expanded)
-        # df[f\'{self.value_col}_lag1\'] = df[self.value_col].shift(1)
-        # df = df.dropna() # Drop rows with NaNs created by lag features
+        # Lag and rolling-window features; leading rows without a complete history are trimmed
+        if self.lag_spec:
+            if self.resolved_lag_spec is None:
+                self.resolved_lag_spec = resolve_lag_spec(self.lag_spec, df.index)
+            df = add_lag_features(df, self.value_col, self.resolved_lag_spec, history=history)
 
+        df = apply_dtype_profile(df, self.dtype_profile)
         logging.info("Feature engineering completed.")
         return df
 
-    def process_data(self, source_path: str, datetime_col: str, value_col: str, output_filename: str = None) -> pd.DataFrame | None:
+    def _cache_params(self) -> dict:
+        """Processing parameters that, together with the raw bytes, determine the processed output."""
+        return {
+            "datetime_col": self.datetime_col,
+            "value_col": self.value_col,
+            "datetime_format": self.datetime_format, # As given (detection is deterministic for the same bytes)
+            "feature_engineering_version": FEATURE_ENGINEERING_VERSION,
+            "holiday_calendar": self.holiday_calendar,
+            "lag_spec": self.lag_spec,
+            "resample_freq": self.resample_freq,
+            "resample_agg": self.resample_agg,
+            "max_gap": self.max_gap,
+            "dtype_profile": self.dtype_profile,
+            "outlier_repair": self.outlier_repair,
+            "outlier_window": self.outlier_window,
+            "outlier_sigmas": self.outlier_sigmas,
+        }
+
+    def _processing_metadata(self) -> dict:
+        """Metadata stored with the processed data so that downstream stages can rebuild its features."""
+        return {
+            "datetime_col": self.datetime_col,
+            "value_col": self.value_col,
+            "feature_engineering_version": FEATURE_ENGINEERING_VERSION,
+            "holiday_calendar": self.holiday_calendar,
+            "lag_spec": self.resolved_lag_spec,
+            "datetime_format": self.datetime_format,
+            "grid_freq": self.grid_freq,
+            "resample_agg": self.resample_agg if self.grid_freq else None,
+            "max_gap": self.max_gap if self.grid_freq else None,
+            "dtype_profile": self.dtype_profile,
+            "outlier_repair": self.outlier_repair,
+            "outlier_window": self.outlier_window if self.outlier_repair else None,
+            "outlier_sigmas": self.outlier_sigmas if self.outlier_repair else None,
+            "outlier_scale": self.outlier_scale if self.outlier_repair else None,
+        }
+
+    def _agent_settings(self) -> dict:
+        """Constructor arguments that determine processing, used to build identical agents in worker processes."""
+        return {
+            "holiday_calendar": self.holiday_calendar,
+            "lag_spec": self.lag_spec,
+            "resample_freq": self.resample_freq,
+            "resample_agg": self.resample_agg,
+            "max_gap": self.max_gap,
+            "dtype_profile": self.dtype_profile,
+            "outlier_repair": self.outlier_repair,
+            "outlier_window": self.outlier_window,
+            "outlier_sigmas": self.outlier_sigmas,
+        }
+
+    def _lookup_cache(self, source_path: str) -> tuple[str, str | None, pd.DataFrame | None]:
+        """
+        Resolves and stages the source, then looks it up in the cache.
+        Returns the path to load from, the cache key (None if the source could not be hashed)
+        and the cached frame on a hit.
+        """
+        try:
+            resolved_path, is_url = self._resolve_source(source_path)
+            if resolved_path is None:
+                return source_path, None, None
+            local_path = self._save_raw_copy(resolved_path, is_url)
+            if is_url and local_path == resolved_path:
+                return source_path, None, None # Could not stage a local copy to hash
+            key = self.cache.make_key(local_path, self._cache_params())
+        except Exception as e:
+            logging.warning(f"Could not compute cache key for {source_path}: {e}")
+            return source_path, None, None
+        return local_path, key, self.cache.get(key)
+
+    def process_data(self, source_path: str, datetime_col: str, value_col: str, output_filename: str = None,
+                     datetime_format: str = None) -> pd.DataFrame | None:
         """
         Orchestrates the data loading, cleaning, and feature engineering process.
+        A profile sidecar (<output>.profile.json, see data_profile) is written next to the output
+        so that MonitoringAgent does not need to reload the data as its drift reference.
 
         Args:
             source_path: Path or URL to the raw CSV data.
             datetime_col: Name of the datetime column.
             value_col: Name of the value (load) column.
-            output_filename: (Optional) Filename to save the processed data CSV.
-                             If None, defaults to processed_<original_basename>.csv.
+            output_filename: (Optional) Filename to save the processed data. A .parquet extension
+                             stores typed columns and the datetime index; a .store extension writes a
+                             ProcessedDataStore partitioned by month; .csv is kept for
+                             compatibility. If None, defaults to processed_<original_basename>.parquet.
+            datetime_format: (Optional) Known format of the datetime column (strftime format or
+                             "epoch_s"/"epoch_ms"/"epoch_us"/"epoch_ns"). Detected from a sample if
+                             None or if it does not match the data; the format used is available as
+                             `self.datetime_format` afterwards (None if the values had to be parsed one by one).
 
         Returns:
             A pandas DataFrame with the processed data, or None if processing fails.
         """
         self.datetime_col = datetime_col
         self.value_col = value_col
+        self.datetime_format = datetime_format
+        self.resolved_lag_spec = None
+        self.grid_freq = None
+        self.outlier_scale = None
+        self.cleaning_stats = {}
         logging.info(f"Starting data processing for source: {source_path}")
 
-        # 1. Load
-        df_raw = self._load_data(source_path)
-        if df_raw is None:
-            return None
-
-        # 2. Validate & Clean
-        df_clean = self._validate_and_clean(df_raw)
-        if df_clean is None:
-            return None
+        # 0. Reuse a cached result for identical raw bytes and settings
+        load_path, cache_key, df_processed = (source_path, None, None)
+        if self.cache is not None:
+            load_path, cache_key, df_processed = self._lookup_cache(source_path)
 
-        # 3. Engineer Features
-        df_processed = self._engineer_features(df_clean)
         if df_processed is None:
-             logging.error("Feature engineering failed.")
-             return None # Should not happen if df_clean was valid, but check anyway
+            # 1. Load
+            df_raw = self._load_data(load_path)
+            if df_raw is None:
+                return None
+
+            # 2. Validate & Clean
+            df_clean = self._validate_and_clean(df_raw)
+            if df_clean is None:
+                return None
+
+            # 3. Engineer Features
+            df_processed = self._engineer_features(df_clean)
+            if df_processed is None:
+                 logging.error("Feature engineering failed.")
+                 return None # Should not happen if df_clean was valid, but check anyway
+            if df_processed.empty:
+                logging.error("No rows left after feature engineering (series shorter than the lag warm-up).")
+                return None
+
+            if cache_key is not None:
+                self.cache.put(cache_key, df_processed,
+                               metadata={**self._processing_metadata(), "cleaning_stats": self.cleaning_stats})
+        else:
+            cached_metadata = read_processed_metadata(self.cache.path_for(cache_key))
+            self.resolved_lag_spec = cached_metadata.get("lag_spec") if self.lag_spec else None
+            self.grid_freq = cached_metadata.get("grid_freq")
+            self.datetime_format = cached_metadata.get("datetime_format", self.datetime_format)
+            self.cleaning_stats = cached_metadata.get("cleaning_stats", {})
+            self.outlier_scale = cached_metadata.get("outlier_scale")
+
+        self.memory_bytes = log_memory_usage(df_processed, f"Processed frame ({self.dtype_profile} dtypes)")
 
         # 4. Save Processed Data
         if output_filename is None:
             base_name = os.path.basename(source_path)
             name, ext = os.path.splitext(base_name)
-            output_filename = f"processed_{name}.csv"
+            output_filename = processed_filename(name)
 
         save_path = os.path.join(self.processed_data_dir, output_filename)
         try:
-            df_processed.to_csv(save_path)
+            cached_path = self.cache.path_for(cache_key) if cache_key is not None else None
+            if cached_path and is_parquet_path(save_path) and not is_store_path(save_path) \
+                    and not os.path.isdir(save_path) and os.path.exists(cached_path):
+                shutil.copyfile(cached_path, save_path)
+            else:
+                save_processed_data(df_processed, save_path, metadata=self._processing_metadata())
             logging.info(f"Successfully saved processed data to: {save_path}")
         except Exception as e:
             logging.error(f"Error saving processed data to {save_path}: {e}")
             # Return the dataframe even if saving fails, but log the error
 
+        # 5. Profile sidecar (quantiles, histograms, sorted samples, gap and missing counts) for monitoring
+        try:
+            profile_columns = [self.value_col] + self.calendar_engine.feature_names
+            self.profile = build_profile(df_processed, profile_columns, grid_freq=self.grid_freq,
+                                         cleaning_stats=self.cleaning_stats)
+            save_profile(self.profile, profile_path(save_path))
+            logging.info(f"Saved data profile to: {profile_path(save_path)}")
+        except Exception as e:
+            logging.warning(f"Could not write data profile for {save_path}: {e}")
+
         logging.info("Data processing pipeline finished.")
         return df_processed
 
+    def process_data_streaming(self, source_path: str, datetime_col: str, value_col: str,
+                               output_filename: str = None, chunksize: int = DEFAULT_CHUNKSIZE,
+                               datetime_format: str = None) -> str | None:
+        """
+        Streaming variant of `process_data` for inputs too large to hold in memory.
+
+        The source is read in chunks of at most `chunksize` rows (datetime and value columns only),
+        and each chunk is validated, cleaned, featurized and appended to the processed file before the
+        next one is read, so peak memory is bounded by the chunk size rather than the file size.
+        Forward-fill state and lag/rolling history are carried across chunk boundaries. When resampling,
+        the readings of each chunk's last (possibly incomplete) grid interval are held back and
+        aggregated with the next chunk. Likewise, the last half outlier window of each chunk is
+        tested together with the next chunk, so every point is tested with the same window as in
+        `process_data`; the series deviation that floors the test is estimated up front from values
+        sampled across the whole source. The profile sidecar is built from the written chunks (see
+        `ProfileBuilder`); its quantiles, histograms and samples are approximate for long outputs.
+        The input is expected to be in
+        chronological order; rows at or before the last timestamp of a previous chunk are treated
+        as duplicates and dropped. Unless `datetime_format` is given, it is detected up front from
+        timestamps sampled across the whole source (one extra pass reading only the sampled
+        columns); every chunk must then match it, and processing fails on the first one that does not.
+
+        Args:
+            source_path: Path or URL to the raw CSV data.
+            datetime_col: Name of the datetime column.
+            value_col: Name of the value (load) column.
+            output_filename: (Optional) Filename to save the processed data (.parquet, .store or .csv).
+                             A .store output keeps larger-than-memory results queryable by date range.
+                             If None, defaults to processed_<original_basename>.parquet.
+            chunksize: Maximum number of rows held in memory at once.
+            datetime_format: (Optional) Known format of the datetime column (strftime format or
+                             "epoch_s"/"epoch_ms"/"epoch_us"/"epoch_ns"). Detected from a sample if
+                             None; the format used is available as `self.datetime_format` afterwards.
+
+        Returns:
+            Path to the processed data file, or None if processing fails.
+        """
+        self.datetime_col = datetime_col
+        self.value_col = value_col
+        self.datetime_format = datetime_format
+        self.resolved_lag_spec = None
+        self.grid_freq = None
+        self.outlier_scale = None
+        self.cleaning_stats = {}
+        logging.info(f"Starting streaming data processing for source: {source_path} (chunksize={chunksize})")
+
+        try:
+            resolved_path, is_url = self._resolve_source(source_path)
+            if resolved_path is None:
+                return None
+            local_path = self._save_raw_copy(resolved_path, is_url)
+            if not self._check_columns(local_path):
+                return None
+            sample_sizes = {}
+            if self.datetime_format is None:
+                sample_sizes[datetime_col] = DETECTION_SAMPLE_SIZE
+            if self.outlier_repair:
+                sample_sizes[value_col] = SCALE_SAMPLE_SIZE
+            samples = self._stream_sample(local_path, chunksize, sample_sizes) if sample_sizes else {}
+            if self.outlier_repair:
+                self.outlier_scale = robust_scale(samples[value_col])
+            if self.datetime_format is None:
+                self.datetime_format = detect_datetime_format(samples[datetime_col])
+                if self.datetime_format is None:
+                    logging.error(f"No single datetime format matches the sampled values of '{datetime_col}'; pass datetime_format explicitly.")
+                    return None
+                logging.info(f"Detected datetime format for '{datetime_col}' across the source: {self.datetime_format}")
+        except Exception as e:
+            logging.error(f"Error preparing streaming source {source_path}: {e}")
+            return None
+
+        if output_filename is None:
+            base_name = os.path.basename(source_path)
+            name, ext = os.path.splitext(base_name)
+            output_filename = processed_filename(name)
+        save_path = os.path.join(self.processed_data_dir, output_filename)
+        partial_path = os.path.join(self.processed_data_dir, f"partial_{output_filename}")
+
+        last_timestamp = None
+        last_value = None
+        history = np.empty(0)
+        pending = None # Cleaned readings of the last, possibly incomplete, grid interval
+        anchor = None # Last regularized row, for interpolation across chunk boundaries
+        held = None # Cleaned rows at the end of the previous chunk whose outlier test windows reach into the next one
+        outlier_context = None # Values (before repair) preceding `held`, for the outlier test windows
+        profile_builder = None # Profile of the written rows, built chunk by chunk
+
+        def repair_outliers_across_chunks(df_clean, final=False):
+            # Tests the rows whose windows are complete; the last half window waits for the next chunk
+            nonlocal held, outlier_context
+            if held is not None:
+                df_clean = pd.concat([held, df_clean]) if df_clean is not None else held
+            split = len(df_clean) if final else max(len(df_clean) - self.outlier_window // 2, 0)
+            tested, held = df_clean.iloc[:split], df_clean.iloc[split:]
+            if tested.empty:
+                return tested
+            tested_values = tested[self.value_col].to_numpy(dtype=np.float64)
+            repaired = self._repair_outliers(tested, context=outlier_context,
+                                             lookahead=held[self.value_col].to_numpy(dtype=np.float64))
+            if outlier_context is not None:
+                tested_values = np.concatenate((outlier_context, tested_values))
+            outlier_context = tested_values[-self.outlier_window:]
+            return repaired
+
+        def write_features(df_clean, writer):
+            nonlocal history, profile_builder
+            chunk_values = df_clean[self.value_col].to_numpy(dtype=np.float64)
+            df_processed = self._engineer_features(df_clean, history=history)
+            if self.resolved_lag_spec:
+                history = np.concatenate((history, chunk_values))[-lag_warmup(self.resolved_lag_spec):]
+            if not df_processed.empty:
+                writer.write(df_processed, metadata=self._processing_metadata())
+                if profile_builder is None:
+                    profile_builder = ProfileBuilder([self.value_col] + self.calendar_engine.feature_names, grid_freq=self.grid_freq)
+                profile_builder.update(df_processed)
+
+        def write_rows(df_clean, writer):
+            nonlocal pending, anchor
+            if self._resolve_grid_freq(df_clean.index):
+                if pending is not None:
+                    df_clean = pd.concat([pending, df_clean])
+                in_open_interval = df_clean.index >= grid_label(df_clean.index[-1], self.grid_freq)
+                pending = df_clean[in_open_interval]
+                df_clean = df_clean[~in_open_interval]
+                if df_clean.empty:
+                    return
+                df_clean = self._regularize(df_clean, anchor=anchor)
+                if df_clean.empty:
+                    return
+                anchor = df_clean.iloc[-1]
+            write_features(df_clean, writer)
+
+        def raw_chunks():
+            # Chunks before the first known value are merged into the next one, so their NaNs are back filled as in a single pass
+            leading = None
+            for chunk in self._iter_chunks(local_path, chunksize):
+                if leading is not None:
+                    chunk = pd.concat([leading, chunk], ignore_index=True)
+                    leading = None
+                if last_value is None and chunk[self.value_col].isna().all():
+                    leading = chunk
+                    continue
+                yield chunk
+            if leading is not None:
+                yield leading
+
+        try:
+            with ProcessedDataWriter(partial_path) as writer:
+                for chunk_number, chunk in enumerate(raw_chunks()):
+                    df_clean = self._validate_and_clean(chunk, ffill_seed=last_value, regularize_grid=False,
+                                                        strict_datetime_format=True, detect_outliers=False)
+                    if df_clean is None:
+                        raise ValueError(f"Validation failed for chunk {chunk_number} (datetime format {self.datetime_format}).")
+
+                    if last_timestamp is not None:
+                        overlap = df_clean.index <= last_timestamp
+                        if overlap.any():
+                            logging.warning(f"Dropped {int(overlap.sum())} rows in chunk {chunk_number} at or before the previous chunk's last timestamp {last_timestamp}.")
+                            df_clean = df_clean[~overlap]
+                        if df_clean.empty:
+                            continue
+
+                    last_timestamp = df_clean.index[-1]
+                    last_value = df_clean[self.value_col].iloc[-1]
+                    if self.outlier_repair:
+                        df_clean = repair_outliers_across_chunks(df_clean)
+                        if df_clean.empty:
+                            continue
+                    write_rows(df_clean, writer)
+
+                if held is not None and not held.empty:
+                    df_clean = repair_outliers_across_chunks(None, final=True)
+                    if not df_clean.empty:
+                        write_rows(df_clean, writer)
+                if pending is not None and not pending.empty:
+                    df_clean = self._regularize(pending, anchor=anchor)
+                    if not df_clean.empty:
+                        write_features(df_clean, writer)
+
+            rows_written = writer.rows_written
+            if rows_written == 0:
+                raise ValueError("No rows were produced from the source.")
+            if os.path.isdir(save_path): # Previous store or appended dataset
+                shutil.rmtree(save_path)
+            os.replace(partial_path, save_path)
+        except Exception as e:
+            logging.error(f"Error during streaming processing of {source_path}: {e}")
+            if os.path.isdir(partial_path):
+                shutil.rmtree(partial_path)
+            elif os.path.exists(partial_path):
+                os.remove(partial_path)
+            return None
+
+        try:
+            self.profile = profile_builder.profile(cleaning_stats=self.cleaning_stats)
+            save_profile(self.profile, profile_path(save_path))
+            logging.info(f"Saved data profile to: {profile_path(save_path)}")
+        except Exception as e:
+            logging.warning(f"Could not write data profile for {save_path}: {e}")
+            if os.path.exists(profile_path(save_path)): # Never leave the previous output's profile behind
+                os.remove(profile_path(save_path))
+
+        logging.info(f"Streaming data processing finished. Wrote {rows_written} rows to: {save_path}")
+        return save_path
+
+    def process_batch(self, source_path: str, datetime_col: str, value_col: str, series_col: str = None,
+                      output_filename: str = None, max_workers: int = None, datetime_format: str = None) -> dict | None:
+        """
+        Processes many series in parallel across a process pool.
+
+        Each series is loaded, cleaned and featurized by its own worker (with its own agent
+        instance, so no state is shared) and written as one partition of a single Parquet dataset
+        directory (`series_id=<id>/`). A failing series is reported and does not abort the batch.
+        Each series gets its own profile sidecar (see `profile_path` with a series id).
+
+        Args:
+            source_path: Either a long-format CSV with a series identifier column, or a directory
+                         of per-series CSV files (the file name without extension is the series id).
+            datetime_col: Name of the datetime column.
+            value_col: Name of the value (load) column.
+            series_col: Name of the series identifier column. Required for long-format input.
+            output_filename: (Optional) Name of the output dataset directory (a .store name writes a
+                             ProcessedDataStore partitioned by series and month). If None, defaults to processed_<original_basename>.parquet.
+            max_workers: Number of worker processes (defaults to the number of CPUs).
+            datetime_format: (Optional) Known format of the datetime column (strftime format or
+                             "epoch_s"/"epoch_ms"/"epoch_us"/"epoch_ns"). If None, it is detected
+                             by each worker from a sample of its own series, so a series in another
+                             format does not push the others to per-value parsing; the format used
+                             is recorded in each series' partition metadata.
+
+        Returns:
+            A dict with the dataset path ("output_path"), processed row counts per series
+            ("processed"), error messages per failed series ("failed") and outlier counts per
+            series ("outliers", zero if outlier detection is off), or None if the input could
+            not be read at all.
+        """
+        logging.info(f"Starting batch processing for source: {source_path}")
+        tasks = {}
+        try:
+            if os.path.isdir(source_path):
+                for filename in sorted(os.listdir(source_path)):
+                    if filename.lower().endswith(".csv"):
+                        tasks[os.path.splitext(filename)[0]] = os.path.join(source_path, filename)
+            else:
+                if not series_col:
+                    logging.error("series_col is required for long-format batch input.")
+                    return None
+                resolved_path, is_url = self._resolve_source(source_path)
+                if resolved_path is None:
+                    return None
+                df_long = pd.read_csv(resolved_path, usecols=[series_col, datetime_col, value_col],
+                                      dtype={series_col: str})
+                for series_id, df_series in df_long.groupby(series_col, sort=False):
+                    tasks[series_id] = df_series[[datetime_col, value_col]]
+                del df_long
+        except Exception as e:
+            logging.error(f"Error reading batch input {source_path}: {e}")
+            return None
+
+        if not tasks:
+            logging.error(f"No series found in batch input {source_path}.")
+            return None
+
+        if output_filename is None:
+            name = os.path.splitext(os.path.basename(os.path.normpath(source_path)))[0]
+            output_filename = processed_filename(name)
+        dataset_path = os.path.join(self.processed_data_dir, output_filename)
+        if os.path.isdir(dataset_path):
+            shutil.rmtree(dataset_path)
+        elif os.path.exists(dataset_path):
+            os.remove(dataset_path)
+        os.makedirs(dataset_path)
+
+        processed, failed, outliers = {}, {}, {}
+        logging.info(f"Processing {len(tasks)} series with up to {max_workers or os.cpu_count()} workers...")
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            futures = {
+                executor.submit(_process_series_task, self.raw_data_dir, self.processed_data_dir, dataset_path,
+                                series_id, source, datetime_col, value_col, datetime_format,
+                                self._agent_settings()): series_id
+                for series_id, source in tasks.items()
+            }
+            for future in as_completed(futures):
+                series_id = futures[future]
+                try:
+                    processed[series_id], outliers[series_id] = future.result()
+                except Exception as e:
+                    failed[series_id] = str(e)
+                    logging.error(f"Processing failed for series '{series_id}': {e}")
+
+        logging.info(f"Batch processing finished. {len(processed)} series succeeded, {len(failed)} failed. Output: {dataset_path}")
+        if self.outlier_repair:
+            logging.info(f"Outliers flagged per series: {outliers}")
+        return {"output_path": dataset_path, "processed": processed, "failed": failed, "outliers": outliers}
+
+    def process_incremental(self, new_data, processed_path: str, datetime_col: str, value_col: str,
+                            datetime_format: str = None) -> pd.DataFrame | None:
+        """
+        Processes newly arrived readings and appends them to an existing processed dataset.
+
+        Only the tail of the existing dataset is read: its last timestamp is used to drop rows that
+        were already processed, its last value seeds the forward fill of the new rows and its last
+        values serve as lag/rolling history. If the existing data was resampled, the new rows are put on the
+        same grid; readings that fall into its last, already processed interval are dropped. Features are computed for the new rows only, so the cost is proportional to the new data rather than
+        to the full history. Rows at or before the last processed timestamp are dropped before any
+        cleaning (older ones cannot be merged and are dropped with a warning), so they do not affect
+        the new rows. If `processed_path` does not exist yet, it is created. The grid, dtype profile,
+        outlier and lag settings stored with the existing data apply to this call only; the agent's
+        own settings are restored afterwards.
+        The outlier test of the new rows uses the stored series deviation and the processed tail as
+        the start of its windows. Rows already appended are not revisited, so the last half outlier
+        window of the previous increment keeps the judgement made without the new rows.
+
+        Args:
+            new_data: DataFrame of new raw rows, or a path/URL to a CSV of new rows.
+            processed_path: Path to the existing processed dataset (Parquet or CSV).
+            datetime_col: Name of the datetime column.
+            value_col: Name of the value (load) column.
+            datetime_format: (Optional) Known format of the datetime column. If None, the format
+                             stored with the processed data is used, or detected from a sample.
+
+        Returns:
+            A pandas DataFrame with the newly appended processed rows (possibly empty), or None on failure.
+        """
+        # The dataset's own settings apply to this call only, not to later calls on this agent
+        saved_settings = {name: getattr(self, name) for name in INCREMENTAL_SETTINGS}
+        try:
+            return self._append_increment(new_data, processed_path, datetime_col, value_col, datetime_format)
+        finally:
+            for name, value in saved_settings.items():
+                setattr(self, name, value)
+
+    def _append_increment(self, new_data, processed_path: str, datetime_col: str, value_col: str,
+                          datetime_format: str = None) -> pd.DataFrame | None:
+        """Body of `process_incremental`; may override the settings listed in INCREMENTAL_SETTINGS."""
+        self.datetime_col = datetime_col
+        self.value_col = value_col
+        self.datetime_format = datetime_format
+        self.resolved_lag_spec = None
+        self.grid_freq = None
+        self.outlier_scale = None
+        self.cleaning_stats = {}
+        logging.info(f"Starting incremental processing into: {processed_path}")
+
+        if isinstance(new_data, pd.DataFrame):
+            missing_cols = [col for col in (datetime_col, value_col) if col not in new_data.columns]
+            if missing_cols:
+                logging.error(f"Columns {missing_cols} not found in new data.")
+                return None
+            df_new = new_data[[datetime_col, value_col]].copy()
+        else:
+            df_new = self._load_data(new_data)
+            if df_new is None:
+                return None
+
+        try:
+            # Reuse the settings the existing data was built with, so increments get identical features
+            existing_metadata = read_processed_metadata(processed_path)
+            if self.datetime_format is None:
+                self.datetime_format = existing_metadata.get("datetime_format")
+            # Data written before resampling existed has no grid_freq entry; fall back to this agent's settings then
+            regularize_grid = True
+            if "grid_freq" in existing_metadata:
+                self.grid_freq = existing_metadata["grid_freq"]
+                regularize_grid = self.grid_freq is not None
+                self.resample_agg = existing_metadata.get("resample_agg") or self.resample_agg
+                self.max_gap = existing_metadata.get("max_gap") or self.max_gap
+            # Appended parts must keep the dataset's column types
+            self.dtype_profile = existing_metadata.get("dtype_profile", self.dtype_profile)
+            if "outlier_repair" in existing_metadata:
+                self.outlier_repair = existing_metadata["outlier_repair"]
+                self.outlier_window = existing_metadata.get("outlier_window") or self.outlier_window
+                self.outlier_sigmas = existing_metadata.get("outlier_sigmas") or self.outlier_sigmas
+                self.outlier_scale = existing_metadata.get("outlier_scale")
+            history_rows = self.outlier_window if self.outlier_repair else 1
+            if self.lag_spec:
+                self.resolved_lag_spec = existing_metadata.get("lag_spec")
+                if self.resolved_lag_spec:
+                    history_rows = max(history_rows, lag_warmup(self.resolved_lag_spec))
+            df_tail = read_processed_tail(processed_path, n_rows=history_rows)
+        except Exception as e:
+            logging.error(f"Error reading the tail of {processed_path}: {e}")
+            return None
+        last_timestamp, last_value, history, anchor = None, None, None, None
+        if df_tail is not None and not df_tail.empty:
+            last_timestamp = df_tail.index[-1]
+            last_value = df_tail[value_col].iloc[-1]
+            history = df_tail[value_col].to_numpy(dtype=np.float64)
+            anchor = df_tail.iloc[-1]
+
+        df_clean = self._validate_and_clean(df_new, ffill_seed=last_value, anchor=anchor, regularize_grid=regularize_grid,
+                                            outlier_context=history, after=last_timestamp)
+        if df_clean is None:
+            return None
+
+        if df_clean.empty:
+            logging.info("No new rows to append.")
+            return df_clean
+
+        df_processed = self._engineer_features(df_clean, history=history)
+        if df_processed.empty:
+            logging.info("No new rows left after the lag warm-up.")
+            return df_processed
+        try:
+            append_processed_data(df_processed, processed_path, metadata=self._processing_metadata())
+        except Exception as e:
+            logging.error(f"Error appending processed data to {processed_path}: {e}")
+            return None
+        self._update_profile(df_processed, processed_path)
+
+        logging.info(f"Appended {len(df_processed)} processed rows to: {processed_path}")
+        return df_processed
+
+    def _update_profile(self, df_appended: pd.DataFrame, processed_path: str) -> None:
+        """
+        Merges the profile of appended rows into the dataset's profile sidecar, if it has one. If the
+        merge fails the sidecar is removed, so that it never describes fewer rows than the dataset has.
+        """
+        sidecar_path = profile_path(processed_path)
+        try:
+            profile = load_profile(sidecar_path)
+            if profile is None:
+                return
+            profile_columns = [self.value_col] + self.calendar_engine.feature_names
+            appended = build_profile(df_appended, profile_columns, grid_freq=self.grid_freq, cleaning_stats=self.cleaning_stats)
+            save_profile(merge_profiles(profile, appended), sidecar_path)
+            logging.info(f"Updated data profile: {sidecar_path}")
+        except Exception as e:
+            logging.warning(f"Could not update the data profile {sidecar_path}, removing it: {e}")
+            if os.path.exists(sidecar_path):
+                os.remove(sidecar_path)
+
+def _process_series_task(raw_data_dir: str, processed_data_dir: str, dataset_path: str, series_id,
+                         source, datetime_col: str, value_col: str, datetime_format: str = None,
+                         agent_settings: dict = None) -> tuple[int, int]:
+    """
+    Processes a single series in a worker process and writes it as a partition of `dataset_path`.
+    `source` is either a DataFrame of raw rows or a path to a per-series CSV; `agent_settings`
+    are the parent agent's processing settings (see DataProcessingAgent._agent_settings).
+    Returns the number of processed rows and of flagged outliers; raises on failure so the caller can record it.
+    """
+    agent = DataProcessingAgent(raw_data_dir=raw_data_dir, processed_data_dir=processed_data_dir, **(agent_settings or {}))
+    agent.datetime_col = datetime_col
+    agent.value_col = value_col
+    agent.datetime_format = datetime_format
+
+    df_raw = source if isinstance(source, pd.DataFrame) else agent._load_data(source)
+    if df_raw is None:
+        raise ValueError("Failed to load data.")
+    df_clean = agent._validate_and_clean(df_raw)
+    if df_clean is None:
+        raise ValueError("Validation and cleaning failed.")
+    df_processed = agent._engineer_features(df_clean)
+    if df_processed.empty:
+        raise ValueError("No rows left after feature engineering (series shorter than the lag warm-up).")
+    write_series_partition(df_processed, dataset_path, series_id, metadata=agent._processing_metadata())
+    sidecar_path = profile_path(dataset_path, series_id)
+    try:
+        profile_columns = [value_col] + agent.calendar_engine.feature_names
+        save_profile(build_profile(df_processed, profile_columns, grid_freq=agent.grid_freq,
+                                   cleaning_stats=agent.cleaning_stats), sidecar_path)
+    except Exception as e:
+        logging.warning(f"Could not write data profile for series '{series_id}': {e}")
+        if os.path.exists(sidecar_path):
+            os.remove(sidecar_path)
+    return len(df_processed), agent.cleaning_stats.get("outliers", 0)
+
 # Example usage (for testing within the script)
-if __name__ == \'__main__\':
+if __name__ == '__main__':
     # Create a dummy CSV for testing with missing data and duplicates
     dummy_data = {
-        \'timestamp\': pd.to_datetime([\'2023-01-01 00:00\', \'2023-01-01 01:00\', \'2023-01-01 01:00\', \'2023-01-01 02:00\', \'2023-01-01 03:00\', \'2023-01-01 05:00\']),
-        \'load_kw\': [100, 110, 111, np.nan, 105, 120],
-        \'other_col\': [\'a\', \'b\', \'b_dup\', \'c\', \'d\', \'f\']
+        'timestamp': pd.to_datetime(['2023-01-01 00:00', '2023-01-01 01:00', '2023-01-01 01:00', '2023-01-01 02:00', '2023-01-01 03:00', '2023-01-01 05:00']),
+        'load_kw': [100, 110, 111, np.nan, 105, 120],
+        'other_col': ['a', 'b', 'b_dup', 'c', 'd', 'f']
     }
     dummy_df = pd.DataFrame(dummy_data)
-    dummy_path = \'/home/ubuntu/load_forecasting_agents/data/raw/dummy_load_data_v2.csv\'
+    dummy_path = '/home/ubuntu/load_forecasting_agents/data/raw/dummy_load_data_v2.csv'
     os.makedirs(os.path.dirname(dummy_path), exist_ok=True)
     dummy_df.to_csv(dummy_path, index=False)
     print(f"Created dummy data at {dummy_path}")
 
     agent = DataProcessingAgent()
-    processed_df = agent.process_data(source_path=dummy_path, datetime_col=\'timestamp\', value_col=\'load_kw\')
+    processed_df = agent.process_data(source_path=dummy_path, datetime_col='timestamp', value_col='load_kw')
 
     if processed_df is not None:
         print("\n--- Processed Data ---")
@@ -231,7 +1077,7 @@ if __name__ == \'__main__\':
     url = "https://raw.githubusercontent.com/cs109/2014_data/master/countries.csv"
     print(f"\nTesting URL processing from: {url}")
     # These columns will likely fail validation, demonstrating error handling
-    url_processed_df = agent.process_data(source_path=url, datetime_col=\'Year\', value_col=\'LifeExpectancy\') # Example columns
+    url_processed_df = agent.process_data(source_path=url, datetime_col='Year', value_col='LifeExpectancy') # Example columns
     if url_processed_df is not None:
         print("\nURL Data processed successfully (using example columns):")
         print(url_processed_df.head())
@@ -0,0 +1,359 @@
+# /home/ubuntu/load_forecasting_agents/agents/data_profile.py
+import pandas as pd
+import numpy as np
+import json
+import logging
+import os
+from pandas.tseries.frequencies import to_offset
+from pandas.tseries.offsets import Tick
+from agents.processed_data import series_partition_path
+
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+
+PROFILE_SUFFIX = ".profile.json"
+PROFILE_VERSION = 1
+QUANTILE_PROBS = np.linspace(0.0, 1.0, 101)
+HISTOGRAM_BINS = 32
+SAMPLE_SIZE = 256 # Evenly spaced order statistics kept per column, enough for a KS test against new data
+RESERVOIR_SIZE = 100_000 # Values kept per column when profiling a stream chunk by chunk
+
+
+def profile_path(processed_path: str, series_id=None) -> str:
+    """
+    Path of the profile sidecar written next to a processed dataset. Each series of a
+    series-partitioned dataset has its own sidecar, kept outside the dataset directory.
+    """
+    path = os.path.normpath(processed_path)
+    if series_id is not None:
+        path = f"{path}.{os.path.basename(series_partition_path(path, series_id))}"
+    return path + PROFILE_SUFFIX
+
+
+def _column_profile(values: np.ndarray) -> dict:
+    """
+    Summarizes one column from a single sort: quantiles, histogram counts (by binary search on the
+    sorted values) and a sorted sample are all read off the sorted array.
+    """
+    missing = int(np.isnan(values).sum())
+    x = np.sort(values[~np.isnan(values)])
+    n = len(x)
+    if n == 0:
+        return {"count": 0, "missing": missing}
+    edges = np.linspace(x[0], x[-1], HISTOGRAM_BINS + 1) if x[-1] > x[0] else np.array([x[0], x[0]])
+    cumulative = np.searchsorted(x, edges[1:], side="right")
+    sample = x[np.linspace(0, n - 1, min(SAMPLE_SIZE, n)).round().astype(int)]
+    return {
+        "count": n,
+        "missing": missing,
+        "mean": float(x.mean()),
+        "std": float(x.std(ddof=1)) if n > 1 else 0.0,
+        "min": float(x[0]),
+        "max": float(x[-1]),
+        "quantiles": np.quantile(x, QUANTILE_PROBS).tolist(),
+        "histogram": {"edges": edges.tolist(), "counts": np.diff(cumulative, prepend=0).tolist()},
+        "sample": sample.tolist(),
+    }
+
+
+def _profile_values(values: pd.Series) -> np.ndarray:
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        values = values.astype(values.cat.categories.dtype)
+    return values.to_numpy(dtype=np.float64, na_value=np.nan)
+
+
+def _gap_stats(index: pd.DatetimeIndex, grid_freq: str = None) -> dict:
+    """Counts gaps (steps longer than the grid step, or the median step) and the intervals they skip."""
+    if len(index) < 2:
+        return {"step": None, "gaps": 0, "missing_intervals": 0}
+    diffs = np.diff(index.as_unit("ns").asi8)
+    offset = to_offset(grid_freq) if grid_freq else None
+    step = pd.Timedelta(offset).value if isinstance(offset, Tick) else int(np.median(diffs))
+    if step <= 0:
+        return {"step": None, "gaps": 0, "missing_intervals": 0}
+    long_steps = diffs[diffs > step]
+    return {
+        "step": str(pd.Timedelta(step, unit="ns")),
+        "gaps": int(len(long_steps)),
+        "missing_intervals": int((long_steps // step - 1).sum()),
+        "longest_gap": str(pd.Timedelta(int(long_steps.max()), unit="ns")) if len(long_steps) else None,
+    }
+
+
+def build_profile(df: pd.DataFrame, columns: list, grid_freq: str = None, cleaning_stats: dict = None) -> dict:
+    """
+    Builds a compact reference profile of a processed frame.
+
+    Args:
+        df: Processed frame with a sorted DatetimeIndex.
+        columns: Columns to profile (missing ones are skipped).
+        grid_freq: (Optional) Grid frequency of the data, used as the expected step for gap counts.
+        cleaning_stats: (Optional) Counts recorded while cleaning (e.g. imputed missing values).
+
+    Returns:
+        A JSON-serializable dict.
+    """
+    profile = {
+        "version": PROFILE_VERSION,
+        "rows": int(len(df)),
+        "start": str(df.index[0]) if len(df) else None,
+        "end": str(df.index[-1]) if len(df) else None,
+        "gaps": _gap_stats(df.index, grid_freq),
+        "cleaning": cleaning_stats or {},
+        "quantile_probs": QUANTILE_PROBS.tolist(),
+        "columns": {},
+    }
+    for col in columns:
+        if col not in df.columns:
+            continue
+        profile["columns"][col] = _column_profile(_profile_values(df[col]))
+    return profile
+
+
+class ProfileBuilder:
+    """
+    Builds the profile of a dataset written chunk by chunk (e.g. by a streaming writer) without
+    holding it in memory.
+
+    Row counts, gaps and each column's count, missing, mean, std, min and max are accumulated
+    exactly. Quantiles, histogram and sample are read off a uniform reservoir sample of at most
+    `reservoir_size` values per column, so they are exact as long as a column has no more values
+    than that and approximate (marked with "approximate": True) beyond.
+
+    Usage:
+        builder = ProfileBuilder(columns, grid_freq)
+        for chunk in chunks:
+            builder.update(chunk)
+        profile = builder.profile(cleaning_stats)
+    """
+
+    def __init__(self, columns: list, grid_freq: str = None, reservoir_size: int = RESERVOIR_SIZE, seed: int = 0):
+        self.columns = list(columns)
+        self.reservoir_size = reservoir_size
+        self.rng = np.random.default_rng(seed)
+        offset = to_offset(grid_freq) if grid_freq else None
+        self.step = pd.Timedelta(offset).value if isinstance(offset, Tick) else None
+        self.rows = 0
+        self.start = None
+        self.end = None
+        self.gaps = {"gaps": 0, "missing_intervals": 0, "longest_gap": 0}
+        self.stats = {}
+
+    def update(self, df: pd.DataFrame) -> "ProfileBuilder":
+        """Adds the rows of the next chunk (timestamps after those of previous chunks)."""
+        if df.empty:
+            return self
+        index = df.index.as_unit("ns").asi8
+        if self.end is not None:
+            index = np.concatenate(([self.end], index))
+        diffs = np.diff(index)
+        if self.step is None and len(diffs):
+            # Without a grid frequency the median step of the first chunk is the expected step
+            self.step = int(np.median(diffs))
+        if self.step and self.step > 0 and len(diffs):
+            long_steps = diffs[diffs > self.step]
+            if len(long_steps):
+                self.gaps["gaps"] += int(len(long_steps))
+                self.gaps["missing_intervals"] += int((long_steps // self.step - 1).sum())
+                self.gaps["longest_gap"] = max(self.gaps["longest_gap"], int(long_steps.max()))
+        if self.start is None:
+            self.start = df.index[0]
+        self.end = int(index[-1])
+        self.rows += len(df)
+
+        for col in self.columns:
+            if col not in df.columns:
+                continue
+            values = _profile_values(df[col])
+            x = values[~np.isnan(values)]
+            stats = self.stats.setdefault(col, {"count": 0, "missing": 0, "mean": 0.0, "m2": 0.0, "min": np.inf,
+                                                "max": -np.inf, "keys": np.empty(0), "values": np.empty(0)})
+            stats["missing"] += int(len(values) - len(x))
+            if len(x) == 0:
+                continue
+            n_a, n_b = stats["count"], len(x)
+            n = n_a + n_b
+            delta = x.mean() - stats["mean"]
+            stats["m2"] += ((x - x.mean()) ** 2).sum() + delta ** 2 * n_a * n_b / n
+            stats["mean"] += delta * n_b / n
+            stats["count"] = n
+            stats["min"], stats["max"] = min(stats["min"], x.min()), max(stats["max"], x.max())
+            # Reservoir sampling: keep the values with the smallest random keys
+            keys = np.concatenate((stats["keys"], self.rng.random(n_b)))
+            kept = np.concatenate((stats["values"], x))
+            if len(keys) > self.reservoir_size:
+                keep = np.argpartition(keys, self.reservoir_size)[:self.reservoir_size]
+                keys, kept = keys[keep], kept[keep]
+            stats["keys"], stats["values"] = keys, kept
+        return self
+
+    def profile(self, cleaning_stats: dict = None) -> dict:
+        """Returns the profile of all rows added so far, in the format of `build_profile`."""
+        if self.step and self.step > 0 and self.rows > 1:
+            gaps = {
+                "step": str(pd.Timedelta(self.step, unit="ns")),
+                "gaps": self.gaps["gaps"],
+                "missing_intervals": self.gaps["missing_intervals"],
+                "longest_gap": str(pd.Timedelta(self.gaps["longest_gap"], unit="ns")) if self.gaps["gaps"] else None,
+            }
+        else:
+            gaps = {"step": None, "gaps": 0, "missing_intervals": 0}
+        profile = {
+            "version": PROFILE_VERSION,
+            "rows": self.rows,
+            "start": str(self.start) if self.rows else None,
+            "end": str(pd.Timestamp(self.end, tz=self.start.tz)) if self.rows else None,
+            "gaps": gaps,
+            "cleaning": cleaning_stats or {},
+            "quantile_probs": QUANTILE_PROBS.tolist(),
+            "columns": {},
+        }
+        approximate = False
+        for col, stats in self.stats.items():
+            column = _column_profile(stats["values"])
+            column["missing"] = stats["missing"]
+            n = stats["count"]
+            if n > len(stats["values"]):
+                approximate = True
+                lo, hi = float(stats["min"]), float(stats["max"])
+                edges = np.linspace(lo, hi, HISTOGRAM_BINS + 1) if hi > lo else np.array([lo, lo])
+                cumulative = np.searchsorted(np.sort(stats["values"]), edges[1:], side="right")
+                column["quantiles"][0], column["quantiles"][-1] = lo, hi
+                column.update({
+                    "count": n,
+                    "mean": float(stats["mean"]),
+                    "std": float(np.sqrt(stats["m2"] / (n - 1))),
+                    "min": lo,
+                    "max": hi,
+                    "histogram": {"edges": edges.tolist(),
+                                  "counts": np.diff(np.round(cumulative * n / len(stats["values"])), prepend=0).astype(int).tolist()},
+                })
+            profile["columns"][col] = column
+        if approximate:
+            profile["approximate"] = True
+        return profile
+
+
+def _weighted_quantiles(values: np.ndarray, weights: np.ndarray, probs: np.ndarray) -> np.ndarray:
+    """Quantiles of weighted points, interpolating on the cumulative weight at each point's midpoint."""
+    order = np.argsort(values, kind="stable")
+    values, weights = values[order], weights[order]
+    positions = (np.cumsum(weights) - weights / 2) / weights.sum()
+    return np.interp(probs, positions, values)
+
+
+def _merge_histograms(a: dict, b: dict, lo: float, hi: float) -> dict:
+    """Rebins two histograms onto HISTOGRAM_BINS bins over [lo, hi], spreading each source bin's count evenly over its width."""
+    edges = np.linspace(lo, hi, HISTOGRAM_BINS + 1) if hi > lo else np.array([lo, lo])
+    counts = np.zeros(len(edges) - 1)
+    for histogram in (a, b):
+        source_edges = np.asarray(histogram["edges"], dtype=np.float64)
+        for left, right, count in zip(source_edges[:-1], source_edges[1:], histogram["counts"]):
+            if right > left:
+                overlap = np.clip(np.minimum(edges[1:], right) - np.maximum(edges[:-1], left), 0, None)
+                counts += count * overlap / (right - left)
+            else:
+                counts[min(np.searchsorted(edges, left, side="right") - 1, len(counts) - 1)] += count
+    # Rounding the running total keeps the counts adding up to the number of values
+    return {"edges": edges.tolist(), "counts": np.diff(np.round(np.cumsum(counts)), prepend=0).astype(int).tolist()}
+
+
+def _merge_column_profiles(a: dict, b: dict) -> dict:
+    """
+    Merges two column summaries. Counts, mean, std, min and max are combined exactly; quantiles and
+    the sample are read off both samples, each point weighted by the rows it stands for.
+    """
+    if not a.get("count") or not b.get("count"):
+        merged = dict(a if a.get("count") else b)
+        merged["missing"] = a.get("missing", 0) + b.get("missing", 0)
+        return merged
+    n_a, n_b = a["count"], b["count"]
+    n = n_a + n_b
+    delta = b["mean"] - a["mean"]
+    mean = a["mean"] + delta * n_b / n
+    m2 = a["std"] ** 2 * (n_a - 1) + b["std"] ** 2 * (n_b - 1) + delta ** 2 * n_a * n_b / n
+    values = np.concatenate([a["sample"], b["sample"]])
+    weights = np.concatenate([np.full(len(a["sample"]), n_a / len(a["sample"])),
+                              np.full(len(b["sample"]), n_b / len(b["sample"]))])
+    lo, hi = min(a["min"], b["min"]), max(a["max"], b["max"])
+    quantiles = _weighted_quantiles(values, weights, QUANTILE_PROBS)
+    quantiles[0], quantiles[-1] = lo, hi
+    return {
+        "count": n,
+        "missing": a["missing"] + b["missing"],
+        "mean": float(mean),
+        "std": float(np.sqrt(m2 / (n - 1))),
+        "min": lo,
+        "max": hi,
+        "quantiles": quantiles.tolist(),
+        "histogram": _merge_histograms(a["histogram"], b["histogram"], lo, hi),
+        "sample": _weighted_quantiles(values, weights, np.linspace(0.0, 1.0, min(SAMPLE_SIZE, n))).tolist(),
+    }
+
+
+def _merge_gap_stats(a: dict, b: dict, a_end: str, b_start: str) -> dict:
+    """Adds up the gaps of two consecutive spans, plus the gap between them if there is one."""
+    step = a.get("step") or b.get("step")
+    if step is None:
+        return a
+    step_ns = pd.Timedelta(step).value
+    boundary = (pd.Timestamp(b_start) - pd.Timestamp(a_end)).value if a_end and b_start else 0
+    longest = [pd.Timedelta(gap_stats["longest_gap"]).value for gap_stats in (a, b) if gap_stats.get("longest_gap")]
+    if boundary > step_ns:
+        longest.append(boundary)
+    return {
+        "step": step,
+        "gaps": a.get("gaps", 0) + b.get("gaps", 0) + int(boundary > step_ns),
+        "missing_intervals": a.get("missing_intervals", 0) + b.get("missing_intervals", 0) + max(0, boundary // step_ns - 1),
+        "longest_gap": str(pd.Timedelta(max(longest), unit="ns")) if longest else None,
+    }
+
+
+def merge_profiles(profile: dict, appended: dict) -> dict:
+    """
+    Merges the profile of rows appended after a dataset into the dataset's profile, so the sidecar
+    keeps covering the whole dataset without reading it again.
+
+    Row counts, gap counts, cleaning counts and each column's count, missing, mean, std, min and max
+    stay exact. Quantiles, histogram and sample are merged from the two summaries and become
+    approximate; the merged profile is marked with "approximate": True.
+
+    Args:
+        profile: Profile of the existing rows.
+        appended: Profile of the rows that follow them (see `build_profile`).
+
+    Returns:
+        The merged profile.
+    """
+    if not profile.get("rows"):
+        return appended
+    if not appended.get("rows"):
+        return profile
+    cleaning = dict(profile.get("cleaning") or {})
+    for key, count in (appended.get("cleaning") or {}).items():
+        cleaning[key] = cleaning.get(key, 0) + count
+    columns = {col: _merge_column_profiles(stats, appended["columns"][col]) if col in appended["columns"] else stats
+               for col, stats in profile["columns"].items()}
+    return {
+        "version": PROFILE_VERSION,
+        "rows": profile["rows"] + appended["rows"],
+        "start": profile["start"],
+        "end": appended["end"],
+        "gaps": _merge_gap_stats(profile["gaps"], appended["gaps"], profile["end"], appended["start"]),
+        "cleaning": cleaning,
+        "quantile_probs": QUANTILE_PROBS.tolist(),
+        "columns": columns,
+        "approximate": True,
+    }
+
+
+def save_profile(profile: dict, path: str) -> None:
+    with open(path, "w") as f:
+        json.dump(profile, f)
+
+
+def load_profile(path: str) -> dict | None:
+    """Loads a profile sidecar, or returns None if there is none."""
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return json.load(f)
@@ -0,0 +1,213 @@
+# /home/ubuntu/load_forecasting_agents/agents/datetime_parsing.py
+import pandas as pd
+import numpy as np
+import logging
+import pyarrow as pa
+from pandas.tseries.api import guess_datetime_format
+
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+
+DETECTION_SAMPLE_SIZE = 1000
+# Pseudo-formats for integer epoch timestamps, mapped to their pandas unit
+EPOCH_FORMATS = {"epoch_s": "s", "epoch_ms": "ms", "epoch_us": "us", "epoch_ns": "ns"}
+EPOCH_UNIT_SECONDS = {"epoch_s": 1, "epoch_ms": 1e3, "epoch_us": 1e6, "epoch_ns": 1e9}
+# Integers are only taken for epoch timestamps if they fall in this range (1980-01-01 to 2100-01-01, in seconds)
+PLAUSIBLE_EPOCH_SECONDS = (315532800, 4102444800)
+# Zero-padded numeric strftime fields and their widths, for the fixed-width fast path
+FIXED_WIDTH_FIELDS = {"Y": 4, "m": 2, "d": 2, "H": 2, "M": 2, "S": 2}
+# Digit-only formats, tried before all-digit values are taken for epoch timestamps (e.g. 20230101)
+COMPACT_FORMATS = ["%Y%m%d%H%M%S", "%Y%m%d%H%M", "%Y%m%d"]
+# Tried in order after pandas' own guess; the first one that parses the whole sample wins
+CANDIDATE_FORMATS = [
+    "%Y-%m-%d %H:%M:%S",
+    "%Y-%m-%dT%H:%M:%S",
+    "%Y-%m-%d %H:%M",
+    "%Y-%m-%dT%H:%M",
+    "%Y-%m-%d %H:%M:%S.%f",
+    "%Y-%m-%dT%H:%M:%S.%f",
+    "%Y-%m-%d %H:%M:%S%z",
+    "%Y-%m-%dT%H:%M:%S%z",
+    "%Y-%m-%d",
+    "%Y/%m/%d %H:%M:%S",
+    "%Y/%m/%d %H:%M",
+    "%m/%d/%Y %H:%M:%S",
+    "%m/%d/%Y %H:%M",
+    "%d/%m/%Y %H:%M:%S",
+    "%d/%m/%Y %H:%M",
+    "%d.%m.%Y %H:%M:%S",
+    "%d.%m.%Y %H:%M",
+    "%m/%d/%Y",
+    "%d/%m/%Y",
+]
+
+
+def _compact_format(values: pd.Series) -> str | None:
+    """Returns the compact format (e.g. "%Y%m%d%H%M") that parses every all-digit value, if any."""
+    if not (pd.api.types.is_integer_dtype(values) or pd.api.types.is_string_dtype(values) or values.dtype == object):
+        return None
+    strings = values.astype(str)
+    if not strings.str.fullmatch(r"\d+").all():
+        return None
+    lengths = strings.str.len().unique()
+    for fmt in COMPACT_FORMATS:
+        width = sum(FIXED_WIDTH_FIELDS[field] for field in fmt[1::2])
+        if len(lengths) != 1 or lengths[0] != width:
+            continue
+        try:
+            pd.to_datetime(strings, format=fmt)
+            return fmt
+        except (ValueError, TypeError):
+            continue
+    return None
+
+
+def _epoch_unit(values: pd.Series) -> str | None:
+    """
+    Returns the epoch pseudo-format for integer-like values, judged by their magnitude, or None
+    if the values would not be timestamps within PLAUSIBLE_EPOCH_SECONDS in that unit.
+    """
+    if pd.api.types.is_integer_dtype(values):
+        numbers = values.to_numpy(dtype=np.int64)
+    elif pd.api.types.is_string_dtype(values) or values.dtype == object:
+        strings = values.astype(str)
+        if not strings.str.fullmatch(r"-?\d+").all():
+            return None
+        numbers = strings.astype(np.int64).to_numpy()
+    else:
+        return None
+    magnitude = np.abs(numbers).max()
+    if magnitude < 1e11:
+        unit = "epoch_s"
+    elif magnitude < 1e14:
+        unit = "epoch_ms"
+    elif magnitude < 1e17:
+        unit = "epoch_us"
+    else:
+        unit = "epoch_ns"
+    seconds = numbers / EPOCH_UNIT_SECONDS[unit]
+    if seconds.min() < PLAUSIBLE_EPOCH_SECONDS[0] or seconds.max() > PLAUSIBLE_EPOCH_SECONDS[1]:
+        return None
+    return unit
+
+
+def detect_datetime_format(values: pd.Series, sample_size: int = DETECTION_SAMPLE_SIZE) -> str | None:
+    """
+    Detects the format of a timestamp column from a small sample.
+
+    Returns an strftime format, an epoch pseudo-format (e.g. "epoch_ms") or None if no single
+    format parses the whole sample.
+    """
+    sample = values.dropna()
+    if sample.empty:
+        return None
+    if len(sample) > sample_size:
+        # Spread the sample over the column so a format change part-way through is more likely to be seen
+        sample = sample.iloc[np.linspace(0, len(sample) - 1, sample_size).astype(int)]
+
+    compact_format = _compact_format(sample)
+    if compact_format:
+        return compact_format
+    epoch_format = _epoch_unit(sample)
+    if epoch_format:
+        return epoch_format
+
+    sample = sample.astype(str)
+    guessed = guess_datetime_format(sample.iloc[0])
+    candidates = ([guessed] if guessed else []) + [fmt for fmt in CANDIDATE_FORMATS if fmt != guessed]
+    for fmt in candidates:
+        try:
+            pd.to_datetime(sample, format=fmt)
+            return fmt
+        except (ValueError, TypeError):
+            continue
+    return None
+
+
+def _fixed_width_layout(fmt: str) -> tuple[int, dict, dict] | None:
+    """
+    Maps a format made only of zero-padded numeric fields and literal separators to
+    character positions. Returns (width, field -> start offset, offset -> literal byte),
+    or None if the format has variable-width parts.
+    """
+    offset, fields, literals = 0, {}, {}
+    i = 0
+    while i < len(fmt):
+        if fmt[i] == "%":
+            if i + 1 >= len(fmt) or fmt[i + 1] not in FIXED_WIDTH_FIELDS:
+                return None
+            fields[fmt[i + 1]] = offset
+            offset += FIXED_WIDTH_FIELDS[fmt[i + 1]]
+            i += 2
+        else:
+            literals[offset] = ord(fmt[i])
+            offset += 1
+            i += 1
+    if "Y" not in fields or "m" not in fields or "d" not in fields:
+        return None
+    return offset, fields, literals
+
+
+def _parse_fixed_width(values: pd.Series, fmt: str) -> pd.Series | None:
+    """
+    Parses zero-padded fixed-width timestamps by slicing digit columns out of a byte matrix,
+    which avoids per-value strptime (the slow path pandas takes for non-ISO formats). Returns None if the
+    format or the values do not fit that layout, so the caller can fall back to pandas.
+    The result has the datetime unit pandas gives the same format, so both paths produce one dtype.
+    """
+    layout = _fixed_width_layout(fmt)
+    if layout is None or values.isna().any():
+        return None
+    width, fields, literals = layout
+    # Arrow keeps the strings in one contiguous byte buffer; with equal byte lengths it is an (n, width) matrix
+    strings = pa.array(values.astype(str), type=pa.large_binary(), from_pandas=True)
+    if isinstance(strings, pa.ChunkedArray):
+        strings = strings.combine_chunks()
+    if len(strings) == 0:
+        return None
+    offsets = np.frombuffer(strings.buffers()[1], dtype=np.int64)[strings.offset:strings.offset + len(strings) + 1]
+    if not (np.diff(offsets) == width).all():
+        return None
+    chars = np.frombuffer(strings.buffers()[2], dtype=np.uint8)[offsets[0]:offsets[-1]].reshape(-1, width)
+
+    for position, literal in literals.items():
+        if not (chars[:, position] == literal).all():
+            return None
+
+    def field(name):
+        start = fields[name]
+        digits = chars[:, start:start + FIXED_WIDTH_FIELDS[name]] - np.uint8(ord("0")) # Wraps non-digits to > 9
+        if (digits > 9).any():
+            raise ValueError(f"Non-digit characters in %{name} field.")
+        number = np.zeros(len(chars), dtype=np.int64)
+        for position in range(digits.shape[1]):
+            number = number * 10 + digits[:, position]
+        return number
+
+    year, month, day = field("Y"), field("m"), field("d")
+    hour = field("H") if "H" in fields else 0
+    minute = field("M") if "M" in fields else 0
+    second = field("S") if "S" in fields else 0
+    if ((month < 1) | (month > 12)).any() or ((day < 1) | (day > 31)).any() \
+            or np.any(hour > 23) or np.any(minute > 59) or np.any(second > 59):
+        raise ValueError(f"Timestamp field out of range for format {fmt}.")
+
+    month_start = ((year - 1970) * 12 + (month - 1)).astype("datetime64[M]")
+    dates = month_start.astype("datetime64[D]") + (day - 1)
+    if (dates.astype("datetime64[M]") != month_start).any():
+        raise ValueError(f"Day out of range for month for format {fmt}.")
+    timestamps = dates.astype("datetime64[s]") + (hour * 3600 + minute * 60 + second)
+    # The unit pandas parses this format to (it differs between pandas versions), from a single value
+    unit_dtype = pd.to_datetime(values.iloc[:1], format=fmt).dtype
+    return pd.Series(timestamps, index=values.index, name=values.name).astype(unit_dtype)
+
+
+def parse_datetimes(values: pd.Series, fmt: str) -> pd.Series:
+    """Parses a timestamp column with an explicit format (or epoch pseudo-format). Raises on mismatch."""
+    if fmt in EPOCH_FORMATS:
+        return pd.to_datetime(values.astype(np.int64), unit=EPOCH_FORMATS[fmt])
+    if pd.api.types.is_integer_dtype(values):
+        values = values.astype(str) # Compact formats (e.g. %Y%m%d) read as integers
+    parsed = _parse_fixed_width(values, fmt)
+    if parsed is not None:
+        return parsed
+    return pd.to_datetime(values, format=fmt)
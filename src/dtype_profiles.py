@@ -0,0 +1,65 @@
+# /home/ubuntu/load_forecasting_agents/agents/dtype_profiles.py
+import pandas as pd
+import numpy as np
+import logging
+
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+
+# "standard" keeps the dtypes produced by processing (int32/int64 calendar features, float64 values).
+# "compact" stores calendar features in the smallest integer type that holds their range, values and
+# derived lag/rolling features as float32 and 0/1 flags as categoricals.
+DTYPE_PROFILES = ("standard", "compact")
+COMPACT_CALENDAR_DTYPES = {
+    "hour": np.int8,
+    "dayofweek": np.int8,
+    "dayofyear": np.int16,
+    "month": np.int8,
+    "year": np.int16,
+    "weekofyear": np.int8,
+    "quarter": np.int8,
+}
+COMPACT_FLAG_COLUMNS = ("is_holiday", "is_working_day")
+FLAG_CATEGORIES = pd.CategoricalDtype(categories=[0, 1])
+
+
+def compact_dtypes(df: pd.DataFrame) -> dict:
+    """Returns the column -> dtype mapping that the compact profile applies to `df`."""
+    dtypes = {}
+    for col in df.columns:
+        if col in COMPACT_CALENDAR_DTYPES:
+            dtypes[col] = COMPACT_CALENDAR_DTYPES[col]
+        elif col in COMPACT_FLAG_COLUMNS:
+            dtypes[col] = FLAG_CATEGORIES
+        elif pd.api.types.is_float_dtype(df[col]):
+            dtypes[col] = np.float32
+    return dtypes
+
+
+def apply_dtype_profile(df: pd.DataFrame, profile: str) -> pd.DataFrame:
+    """Casts a processed frame to a dtype profile. The standard profile returns `df` unchanged."""
+    if profile not in DTYPE_PROFILES:
+        raise ValueError(f"Unknown dtype profile '{profile}'. Available: {list(DTYPE_PROFILES)}")
+    if profile == "standard" or df is None:
+        return df
+    dtypes = {col: dtype for col, dtype in compact_dtypes(df).items() if df[col].dtype != dtype}
+    return df.astype(dtypes) if dtypes else df
+
+
+def to_plain_dtypes(df: pd.DataFrame) -> pd.DataFrame:
+    """Replaces categorical columns by their codes' values, e.g. for model signatures and JSON payloads."""
+    categorical = [col for col in df.columns if isinstance(df[col].dtype, pd.CategoricalDtype)]
+    if not categorical:
+        return df
+    return df.astype({col: df[col].cat.categories.dtype for col in categorical})
+
+
+def frame_memory_bytes(df: pd.DataFrame) -> int:
+    """Memory used by a frame, including its index."""
+    return int(df.memory_usage(index=True, deep=True).sum())
+
+
+def log_memory_usage(df: pd.DataFrame, label: str) -> int:
+    """Logs and returns the memory used by a frame."""
+    n_bytes = frame_memory_bytes(df)
+    logging.info(f"{label}: {df.shape[0]} rows x {df.shape[1]} columns, {n_bytes / 1024 ** 2:.1f} MiB in memory.")
+    return n_bytes
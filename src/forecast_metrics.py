@@ -0,0 +1,66 @@
+# /home/ubuntu/load_forecasting_agents/agents/forecast_metrics.py
+import numpy as np
+import logging
+
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+
+METRIC_NAMES = ("MAPE", "sMAPE", "MAE", "RMSE", "R2_Score", "Pinball")
+HIGHER_IS_BETTER_METRICS = ("R2_Score",) # Metrics where the largest value is best
+
+
+def compute_metrics(y_true, y_pred, quantile: float = 0.5) -> dict:
+    """
+    Computes all METRIC_NAMES for a batch of forecasts in one vectorized pass.
+
+    `y_true` and `y_pred` broadcast against each other along the last axis, e.g. one actuals
+    vector (points,) against predictions of several models (models x points), or folds x points
+    for both. Actuals that are NaN are masked out of every metric; MAPE additionally skips zero
+    actuals. A row with non-finite predictions scores inf (R2: -inf) instead of a misleading number.
+
+    Metrics:
+        MAPE: mean absolute percentage error, as a fraction (like sklearn).
+        sMAPE: symmetric MAPE, 2|e| / (|y| + |yhat|), as a fraction; pairs where both are zero count as 0.
+        MAE, RMSE: mean absolute and root mean squared error.
+        R2_Score: coefficient of determination (1.0 for a perfect forecast of a constant series, 0.0 otherwise, like sklearn).
+        Pinball: pinball (quantile) loss of the predictions read as the `quantile` forecast; MAE / 2 for the median.
+
+    Returns:
+        A dict of metric name -> array with the leading (batch) shape, or floats for 1-D inputs.
+    """
+    y_true, y_pred = np.broadcast_arrays(np.asarray(y_true, dtype=np.float64), np.asarray(y_pred, dtype=np.float64))
+    valid = ~np.isnan(y_true)
+    count = valid.sum(axis=-1)
+    finite = np.where(valid, np.isfinite(y_pred), True).all(axis=-1)
+    # Masked and non-finite points contribute zeros to the sums below; the rows they break are fixed up at the end
+    usable = valid & np.isfinite(y_pred)
+    true = np.where(usable, y_true, 0.0)
+    pred = np.where(usable, y_pred, 0.0)
+    error = true - pred
+    abs_error = np.abs(error)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        nonzero = usable & (true != 0)
+        n_nonzero = nonzero.sum(axis=-1)
+        mape = np.where(nonzero, abs_error / np.abs(np.where(nonzero, true, 1.0)), 0.0).sum(axis=-1) / n_nonzero
+        # All actuals zero: perfect if the predictions are (close to) zero too
+        all_zero_pred = np.where(valid, np.isclose(y_pred, 0.0), True).all(axis=-1)
+        mape = np.where(n_nonzero == 0, np.where(all_zero_pred, 0.0, np.inf), mape)
+
+        denominator = np.abs(true) + np.abs(pred)
+        smape = (np.where(denominator > 0, 2 * abs_error / np.where(denominator > 0, denominator, 1.0), 0.0).sum(axis=-1)
+                 / count)
+        mae = abs_error.sum(axis=-1) / count
+        rmse = np.sqrt((error ** 2).sum(axis=-1) / count)
+        mean_true = true.sum(axis=-1, keepdims=True) / count[..., None]
+        total = np.where(usable, (true - mean_true) ** 2, 0.0).sum(axis=-1)
+        residual = (error ** 2).sum(axis=-1)
+        r2 = np.where(total > 0, 1 - residual / np.where(total > 0, total, 1.0), np.where(residual == 0, 1.0, 0.0))
+        pinball = np.maximum(quantile * error, (quantile - 1) * error).sum(axis=-1) / count
+
+    metrics = {"MAPE": mape, "sMAPE": smape, "MAE": mae, "RMSE": rmse, "R2_Score": r2, "Pinball": pinball}
+    for name, values in metrics.items():
+        bad = -np.inf if name in HIGHER_IS_BETTER_METRICS else np.inf
+        metrics[name] = np.where(finite, values, bad)
+    if y_true.ndim == 1:
+        return {name: float(values) for name, values in metrics.items()}
+    return metrics
@@ -0,0 +1,50 @@
+# /home/ubuntu/load_forecasting_agents/agents/global_model.py
+import pandas as pd
+import numpy as np
+import logging
+from agents.lag_features import lag_feature_names
+
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+
+SERIES_CODE_FEATURE = "series_code" # Categorical feature identifying the series in a global model
+GLOBAL_SCALINGS = ("mean", "max", "none")
+
+
+def series_scale(values, scaling: str = "mean") -> float:
+    """
+    Scale of one series: its mean ("mean") or maximum ("max") absolute value, or 1.0 ("none").
+    Falls back to 1.0 for series without a usable (finite, non-zero) scale.
+    """
+    if scaling not in GLOBAL_SCALINGS:
+        raise ValueError(f"Unknown series scaling '{scaling}'. Available: {list(GLOBAL_SCALINGS)}")
+    if scaling == "none":
+        return 1.0
+    magnitude = np.abs(np.asarray(values, dtype=np.float64))
+    magnitude = magnitude[np.isfinite(magnitude)]
+    if len(magnitude) == 0:
+        return 1.0
+    scale = float(magnitude.mean() if scaling == "mean" else magnitude.max())
+    return scale if np.isfinite(scale) and scale > 0 else 1.0
+
+
+def scaled_feature_names(feature_spec: dict, columns) -> list:
+    """
+    Features that carry the series' own values (lags and rolling statistics) and are therefore
+    divided by the series scale along with the target. All of them scale linearly with the values.
+    """
+    if not feature_spec or not feature_spec.get("lag_spec"):
+        return []
+    names = lag_feature_names(feature_spec["lag_spec"], feature_spec["value_col"])
+    return [name for name in names if name in columns]
+
+
+def to_global_features(features: pd.DataFrame, series_code: int, scale: float, scaled_features: list) -> pd.DataFrame:
+    """
+    Turns one series' feature rows into global-model inputs: value-derived features are divided by
+    the series scale and the series code is added as the first column.
+    """
+    features = features.copy()
+    for name in scaled_features:
+        features[name] = features[name].to_numpy(dtype=np.float64) / scale
+    features.insert(0, SERIES_CODE_FEATURE, np.int32(series_code))
+    return features
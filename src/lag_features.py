@@ -0,0 +1,207 @@
+# /home/ubuntu/load_forecasting_agents/agents/lag_features.py
+import pandas as pd
+import numpy as np
+import logging
+from numpy.lib.stride_tricks import sliding_window_view
+
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+
+# Lags and windows are expressed in rows, so the series is expected to be on a regular time grid.
+# Rolling statistics cover the `window` values *before* each row (the row's own value is never used).
+DEFAULT_LAG_SPEC = {
+    "lags": [1, 2, 3, 24],
+    "rolling_windows": [24],
+    "rolling_stats": ["mean", "std", "min", "max"],
+    "same_hour_last_week": True,
+}
+ROLLING_STATS = ("mean", "std", "min", "max")
+AUTO_LAG_SPEC = "auto" # Lag spec scaled to the grid step of the data when it is resolved (see lag_spec_for_step)
+
+
+def lag_spec_for_step(step: pd.Timedelta) -> dict:
+    """
+    Scales DEFAULT_LAG_SPEC, which is made for hourly data, to another grid step. On sub-daily grids
+    the seasonal lag and the rolling window span one day; on daily grids the window spans one week,
+    next to the same-weekday lag. Weekly and coarser grids only get short lags and a short window,
+    since a day or a week is less than one row there.
+    """
+    if step < pd.Timedelta(days=1):
+        rows_per_day = int(pd.Timedelta(days=1) // step)
+        return {**DEFAULT_LAG_SPEC, "lags": sorted({1, 2, 3, rows_per_day}), "rolling_windows": [max(2, rows_per_day)]}
+    if step < pd.Timedelta(days=7):
+        rows_per_week = int(pd.Timedelta(days=7) // step)
+        return {**DEFAULT_LAG_SPEC, "lags": [1, 2, 3], "rolling_windows": [max(2, rows_per_week)],
+                "same_hour_last_week": rows_per_week > 3}
+    return {**DEFAULT_LAG_SPEC, "lags": [1, 2, 3], "rolling_windows": [3], "same_hour_last_week": False}
+
+
+def resolve_lag_spec(spec: dict | str, index: pd.DatetimeIndex) -> dict:
+    """
+    Returns a copy of `spec` with every offset resolved to a row count, so it can be stored with
+    the processed data and the model and replayed exactly at serving time.
+    `same_hour_last_week` is converted into `same_hour_last_week_lag` using the index spacing, and
+    AUTO_LAG_SPEC into the spec `lag_spec_for_step` gives for it.
+    """
+    step = pd.Series(index).diff().median() if len(index) >= 2 else None
+    if spec == AUTO_LAG_SPEC:
+        if step is None:
+            raise ValueError("At least two timestamps are needed to scale the lag spec to the grid step.")
+        spec = lag_spec_for_step(step)
+    resolved = {
+        "lags": sorted(set(int(lag) for lag in spec.get("lags", []))),
+        "rolling_windows": sorted(set(int(window) for window in spec.get("rolling_windows", []))),
+        "rolling_stats": [stat for stat in ROLLING_STATS if stat in spec.get("rolling_stats", [])],
+        "same_hour_last_week_lag": spec.get("same_hour_last_week_lag"),
+    }
+    if any(lag < 1 for lag in resolved["lags"]) or any(window < 2 for window in resolved["rolling_windows"]):
+        raise ValueError("Lags must be >= 1 and rolling windows >= 2 rows.")
+    if spec.get("same_hour_last_week") and resolved["same_hour_last_week_lag"] is None:
+        if step is None:
+            raise ValueError("At least two timestamps are needed to resolve the same-hour-last-week lag.")
+        resolved["same_hour_last_week_lag"] = int(pd.Timedelta(days=7) // step)
+        if resolved["same_hour_last_week_lag"] == 0:
+            logging.warning(f"The same-hour-last-week lag is shorter than one row at a grid step of {step}; "
+                            f"no same-hour-last-week feature is added.")
+            resolved["same_hour_last_week_lag"] = None
+    return resolved
+
+
+def lag_warmup(spec: dict) -> int:
+    """Number of leading rows that lack a complete history under a resolved spec."""
+    offsets = spec["lags"] + spec["rolling_windows"]
+    if spec.get("same_hour_last_week_lag"):
+        offsets.append(spec["same_hour_last_week_lag"])
+    return max(offsets, default=0)
+
+
+def lag_feature_names(spec: dict, value_col: str) -> list:
+    """Feature column names produced by `compute_lag_features`, in order."""
+    names = [f"{value_col}_lag{lag}" for lag in spec["lags"]]
+    if spec.get("same_hour_last_week_lag"):
+        names.append(f"{value_col}_same_hour_last_week")
+    for window in spec["rolling_windows"]:
+        names.extend(f"{value_col}_roll{window}_{stat}" for stat in spec["rolling_stats"])
+    return names
+
+
+def _shifted(x: np.ndarray, lag: int) -> np.ndarray:
+    out = np.full(len(x), np.nan)
+    if lag < len(x):
+        out[lag:] = x[:len(x) - lag]
+    return out
+
+
+def compute_lag_features(values, spec: dict, value_col: str) -> dict:
+    """
+    Computes all lag and rolling-window features for a resolved spec in one vectorized pass.
+
+    Lags are array slices, rolling mean/std come from cumulative sums and rolling min/max from a
+    strided window view, so no per-feature pandas `shift`/`rolling` calls are made. Rows without
+    a complete history are NaN, as are the rolling statistics of windows containing a NaN value
+    (missing values do not spread past their windows).
+
+    Returns:
+        A dict of feature name -> float64 array aligned with `values`.
+    """
+    x = np.asarray(values, dtype=np.float64)
+    n = len(x)
+    features = {}
+    for lag in spec["lags"]:
+        features[f"{value_col}_lag{lag}"] = _shifted(x, lag)
+    if spec.get("same_hour_last_week_lag"):
+        features[f"{value_col}_same_hour_last_week"] = _shifted(x, spec["same_hour_last_week_lag"])
+
+    if spec["rolling_windows"]:
+        # Centre before accumulating so the sums of squares keep their precision on long series.
+        # NaNs are accumulated as zeros and counted separately, so they only void their own windows.
+        missing = np.isnan(x)
+        centre = float(np.nanmean(x)) if n and not missing.all() else 0.0
+        centred = np.where(missing, 0.0, x - centre)
+        csum = np.concatenate(([0.0], np.cumsum(centred)))
+        csum_sq = np.concatenate(([0.0], np.cumsum(centred * centred)))
+        cmissing = np.concatenate(([0], np.cumsum(missing)))
+
+    for window in spec["rolling_windows"]:
+        stats = {stat: np.full(n, np.nan) for stat in spec["rolling_stats"]}
+        if window < n:
+            # Row t uses x[t - window : t]
+            window_sum = csum[window:n] - csum[:n - window]
+            mean = window_sum / window
+            mean[cmissing[window:n] - cmissing[:n - window] > 0] = np.nan
+            if "mean" in stats:
+                stats["mean"][window:] = mean + centre
+            if "std" in stats:
+                window_sum_sq = csum_sq[window:n] - csum_sq[:n - window]
+                variance = (window_sum_sq - window * mean * mean) / (window - 1)
+                stats["std"][window:] = np.sqrt(np.clip(variance, 0.0, None)) # NaN where the mean is
+            if "min" in stats or "max" in stats:
+                windows = sliding_window_view(x[:n - 1], window)
+                if "min" in stats:
+                    stats["min"][window:] = windows.min(axis=1)
+                if "max" in stats:
+                    stats["max"][window:] = windows.max(axis=1)
+        for stat in spec["rolling_stats"]:
+            features[f"{value_col}_roll{window}_{stat}"] = stats[stat]
+    return features
+
+
+def recursive_forecast(predict, features: np.ndarray, columns: list, history, spec: dict, value_col: str) -> np.ndarray:
+    """
+    Forecasts the len(features) consecutive steps that follow `history`, one step at a time.
+
+    The lag and rolling features of each step are recomputed from `history` extended with the
+    predictions of the earlier steps, so a lag shorter than the step's distance from the forecast
+    origin uses a prediction, never an actual value from inside the horizon. Steps whose features
+    only reach back into `history` get the same features as in training.
+
+    Args:
+        predict: Maps a (1, len(columns)) feature matrix to a one-element array of predictions.
+        features: Feature matrix of the steps, columns in `columns` order. Its lag and rolling
+                  columns are overwritten (on a copy); the other columns (e.g. calendar) are used as given.
+        columns: Feature names of the matrix columns.
+        history: Values immediately preceding the first step (at least `lag_warmup(spec)` for full features).
+        spec: Resolved lag spec (see `resolve_lag_spec`).
+        value_col: Name of the value column the features are derived from.
+
+    Returns:
+        A float64 array with one prediction per step.
+    """
+    warmup = lag_warmup(spec)
+    features = np.array(features, copy=True)
+    positions = {name: columns.index(name) for name in lag_feature_names(spec, value_col) if name in columns}
+    history = np.asarray(history, dtype=np.float64)[-warmup:] if warmup else np.empty(0)
+    values = np.concatenate((history, np.full(len(features), np.nan)))
+    for step in range(len(features)):
+        row = len(history) + step
+        # Only the last `warmup` values (and the row itself, whose value is never used) are needed
+        window = compute_lag_features(values[max(0, row - warmup):row + 1], spec, value_col)
+        for name, position in positions.items():
+            features[step, position] = window[name][-1]
+        values[row] = predict(features[step:step + 1])[0]
+    return values[len(history):]
+
+
+def add_lag_features(df: pd.DataFrame, value_col: str, spec: dict, history=None) -> pd.DataFrame:
+    """
+    Adds lag/rolling features to `df` and trims the warm-up rows.
+
+    Args:
+        df: Frame with `value_col`, sorted by time.
+        value_col: Name of the value column the features are derived from.
+        spec: Resolved lag spec (see `resolve_lag_spec`).
+        history: (Optional) Values immediately preceding `df` (e.g. the tail of already processed
+                 data or the previous chunk). Rows are trimmed only while the combined history is
+                 shorter than the warm-up, so results match processing the full series at once
+                 as long as at least `lag_warmup(spec)` history values are given.
+    """
+    history = np.asarray(history if history is not None else [], dtype=np.float64)
+    values = np.concatenate((history, df[value_col].to_numpy(dtype=np.float64)))
+    features = compute_lag_features(values, spec, value_col)
+    for name, column in features.items():
+        df[name] = column[len(history):]
+
+    rows_to_trim = max(0, lag_warmup(spec) - len(history))
+    if rows_to_trim:
+        logging.info(f"Trimming {min(rows_to_trim, len(df))} warm-up rows without complete lag history.")
+        df = df.iloc[rows_to_trim:]
+    return df
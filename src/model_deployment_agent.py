@@ -1,15 +1,22 @@
 # /home/ubuntu/load_forecasting_agents/agents/model_deployment_agent.py
 import mlflow
 import pandas as pd
+import numpy as np
 import logging
 import os
 from flask import Flask, request, jsonify
+from agents.calendar_features import get_calendar_engine
+from agents.lag_features import compute_lag_features, recursive_forecast
+from agents.dtype_profiles import apply_dtype_profile
+from agents.global_model import SERIES_CODE_FEATURE, to_global_features
 import threading
 import time
+import copy
 logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
 class ModelDeploymentAgent:
     def __init__(self, registered_model_name: str, stage: str = "None",
-                 mlflow_tracking_uri: str = "file:/home/ubuntu/load_forecasting_agents/mlruns"):
+                 mlflow_tracking_uri: str = "file:/home/ubuntu/load_forecasting_agents/mlruns",
+                 uncertainty_samples: int = None):
         """
         Initializes the Model Deployment Agent.
 
@@ -17,14 +24,18 @@ class ModelDeploymentAgent:
             registered_model_name: Name of the model in the MLflow Model Registry.
             stage: Stage of the model to load (e.g., "Staging", "Production", "None" for latest).
             mlflow_tracking_uri: URI for MLflow tracking server.
+            uncertainty_samples: (Optional) Samples a Prophet model draws for its prediction intervals;
+                                 0 returns point forecasts only. The setting logged with the model is used if None.
         """
         self.registered_model_name = registered_model_name
         self.stage = stage
+        self.uncertainty_samples = uncertainty_samples
         mlflow.set_tracking_uri(mlflow_tracking_uri)
         self.model = None
         self.model_version = None
         self.model_type = None # To store the type (e.g., prophet, lightgbm) for prediction logic
         self.features = None # Store features needed for prediction (for tree models)
+        self.feature_spec = None # Processing metadata logged with the model, used to rebuild features
         self._load_model()
 
     def _get_model_uri(self):
@@ -77,7 +88,7 @@ class ModelDeploymentAgent:
                          self.model_type = "prophet"
                      elif any("mlflow.statsmodels" in f["flavor"] for f in flavors):
                          self.model_type = "statsmodels"
-                     # Add other types as needed (e.g., autots, lstm)
+                     # Add other types as needed (e.g., lstm); AutoTS models are served as python_function
                      else:
                          self.model_type = "python_function" # Default fallback
                  except json.JSONDecodeError:
@@ -108,6 +119,11 @@ class ModelDeploymentAgent:
                         logging.info(f"Loaded features for LightGBM model: {self.features}")
                 except Exception as sig_e:
                     logging.warning(f"Could not retrieve features from model signature: {sig_e}")
+                try:
+                    self.feature_spec = mlflow.artifacts.load_dict(f"runs:/{self.model_version.run_id}/feature_spec.json")
+                    logging.info(f"Loaded feature spec for LightGBM model: {self.feature_spec}")
+                except Exception:
+                    logging.info("No feature spec logged with the model. Features must be supplied by the caller.")
             elif self.model_type == "prophet":
                 self.model = mlflow.prophet.load_model(model_uri)
             elif self.model_type == "statsmodels":
@@ -123,10 +139,126 @@ class ModelDeploymentAgent:
             self.model_version = None
             self.model_type = None
 
-    def predict(self, input_data):
+    def build_features(self, frame: pd.DataFrame) -> pd.DataFrame | None:
+        """
+        Rebuilds the calendar and lag features the model was trained with from recent history.
+
+        Args:
+            frame: DataFrame indexed by timestamp on the training grid, holding the value column.
+                   Rows with known values provide history; rows with a missing value are the
+                   timestamps to forecast.
+
+        Returns:
+            Feature rows for the timestamps to forecast, or None if no feature spec is available.
+            Lag and rolling features that would need values inside the forecast horizon are NaN;
+            forecast_recursive fills them with the predictions of the earlier steps.
+        """
+        if not self.feature_spec:
+            logging.error("No feature spec available for this model. Cannot build features.")
+            return None
+        value_col = self.feature_spec["value_col"]
+        if value_col not in frame.columns:
+            logging.error(f"Value column '{value_col}' missing from history frame.")
+            return None
+
+        frame = frame.sort_index()
+        features = pd.DataFrame(index=frame.index)
+        for name, values in get_calendar_engine(self.feature_spec.get("holiday_calendar")).transform(frame.index).items():
+            features[name] = values
+        if self.feature_spec.get("lag_spec"):
+            lag_features = compute_lag_features(frame[value_col].to_numpy(), self.feature_spec["lag_spec"], value_col)
+            for name, values in lag_features.items():
+                features[name] = values
+        return features[frame[value_col].isna().to_numpy()]
+
+    def forecast_recursive(self, frame: pd.DataFrame, series_id=None) -> pd.DataFrame | None:
+        """
+        Forecasts a multi-step horizon with a LightGBM model trained on lag features.
+
+        The rows of `frame` with a missing value are forecast one step at a time (see
+        lag_features.recursive_forecast): each prediction is fed back as history for the lag and
+        rolling features of the later steps, as no actual values exist inside the horizon.
+
+        Args:
+            frame: DataFrame indexed by timestamp on the training grid, holding the value column.
+                   Rows with known values provide history; the rows to forecast (missing values)
+                   must all follow them.
+            series_id: (Optional) Member series to forecast with a global model.
+
+        Returns:
+            A DataFrame with a "prediction" column indexed by the forecast timestamps, or None on failure.
+        """
+        features = self.build_features(frame)
+        if features is None:
+            return None
+        value_col = self.feature_spec["value_col"]
+        values = frame.sort_index()[value_col].to_numpy(dtype=np.float64)
+        missing = np.isnan(values)
+        first = int(missing.argmax())
+        if not missing.any() or not missing[first:].all():
+            logging.error("The timestamps to forecast (rows without a value) must follow all rows with a known value.")
+            return None
+        lag_spec = self.feature_spec.get("lag_spec")
+        if not lag_spec:
+            return self._predict_lightgbm(features, series_id)
+
+        columns, dtypes = list(features.columns), features.dtypes.to_dict()
+
+        def predict_step(row):
+            prediction = self._predict_lightgbm(pd.DataFrame(row, columns=columns).astype(dtypes), series_id)
+            if prediction is None:
+                raise ValueError("LightGBM prediction failed.")
+            return prediction["prediction"].to_numpy()
+
+        try:
+            predictions = recursive_forecast(predict_step, features.to_numpy(dtype=np.float64), columns,
+                                             values[:first], lag_spec, value_col)
+        except Exception as e:
+            logging.error(f"Error during recursive forecast: {e}", exc_info=True)
+            return None
+        return pd.DataFrame({"prediction": predictions}, index=features.index)
+
+    def _predict_lightgbm(self, input_data: pd.DataFrame, series_id=None) -> pd.DataFrame | None:
+        """Predicts LightGBM feature rows (scaled and tagged with the series code for a global model)."""
+        scale = 1.0
+        global_spec = (self.feature_spec or {}).get("global_model")
+        if global_spec:
+            if series_id is None or str(series_id) not in global_spec["series_codes"]:
+                logging.error(f"Global LightGBM model requires the series_id of a member series (got {series_id}).")
+                return None
+            scale = global_spec["series_scales"][str(series_id)]
+            input_data = to_global_features(input_data.drop(columns=[SERIES_CODE_FEATURE], errors="ignore"),
+                                            global_spec["series_codes"][str(series_id)], scale,
+                                            global_spec["scaled_features"])
+        # Ensure all required features are present
+        if self.features:
+            missing_features = [f for f in self.features if f not in input_data.columns]
+            if missing_features:
+                logging.error(f"Missing required features for LightGBM prediction: {missing_features}")
+                return None
+            input_data = input_data[self.features] # Ensure correct column order
+        else:
+            logging.warning("Feature list not available for LightGBM, using all columns in input_data.")
+        if self.feature_spec:
+            # Same dtypes as in training (e.g. categorical holiday flags under the compact profile)
+            input_data = apply_dtype_profile(input_data, self.feature_spec.get("dtype_profile", "standard"))
+
+        predictions = self.model.predict(input_data) * scale
+        # Return as DataFrame for consistency
+        return pd.DataFrame({"prediction": predictions}, index=input_data.index)
+
+    def predict(self, input_data, uncertainty_samples: int = None, series_id=None):
         """
         Generates predictions using the loaded model.
         Input format depends on the model type.
+
+        A global LightGBM model (see ModelingAgent.train_global_lightgbm) needs the `series_id` of
+        the member series to forecast: its features are scaled and tagged with the series code as in
+        training, and the predictions are returned in the series' original units.
+
+        Prophet predicts exactly the "ds" timestamps given. yhat_lower/yhat_upper are only returned
+        when uncertainty sampling is on (`uncertainty_samples` of this call, else of the agent, else
+        of the logged model); with 0 samples Prophet skips its interval simulation entirely.
         """
         if self.model is None:
             logging.error("Model is not loaded. Cannot predict.")
@@ -139,28 +271,23 @@ class ModelDeploymentAgent:
                 if not isinstance(input_data, pd.DataFrame) or "ds" not in input_data.columns:
                     logging.error("Prophet model requires a pandas DataFrame with a \"ds\" column.")
                     return None
-                forecast = self.model.predict(input_data)
-                # Return relevant columns (e.g., yhat, ds)
-                return forecast[["ds", "yhat", "yhat_lower", "yhat_upper"]]
+                model = self.model
+                if uncertainty_samples is None:
+                    uncertainty_samples = self.uncertainty_samples
+                if uncertainty_samples is not None and uncertainty_samples != model.uncertainty_samples:
+                    # Shallow copy: concurrent requests must not change the shared model's setting
+                    model = copy.copy(model)
+                    model.uncertainty_samples = uncertainty_samples
+                forecast = model.predict(input_data)
+                # Return relevant columns (e.g., yhat, ds); the interval columns only exist if they were sampled
+                return forecast[[col for col in ("ds", "yhat", "yhat_lower", "yhat_upper") if col in forecast.columns]]
             
             elif self.model_type == "lightgbm":
                 # LightGBM expects a DataFrame with feature columns
                 if not isinstance(input_data, pd.DataFrame):
                      logging.error("LightGBM model requires a pandas DataFrame input.")
                      return None
-                # Ensure all required features are present
-                if self.features:
-                    missing_features = [f for f in self.features if f not in input_data.columns]
-                    if missing_features:
-                        logging.error(f"Missing required features for LightGBM prediction: {missing_features}")
-                        return None
-                    input_data = input_data[self.features] # Ensure correct column order
-                else:
-                    logging.warning("Feature list not available for LightGBM, using all columns in input_data.")
-                
-                predictions = self.model.predict(input_data)
-                # Return as DataFrame for consistency
-                return pd.DataFrame({"prediction": predictions}, index=input_data.index)
+                return self._predict_lightgbm(input_data, series_id)
 
             elif self.model_type == "statsmodels":
                 # Statsmodels (like ARIMA) often predicts steps ahead
@@ -184,6 +311,9 @@ class ModelDeploymentAgent:
                      except Exception as convert_e:
                          logging.error(f"Could not convert input to DataFrame for pyfunc model: {convert_e}")
                          return None
+                if "ds" in input_data.columns:
+                    # Forecasters served as pyfunc (e.g. AutoTS) take the timestamps to forecast, like Prophet
+                    input_data = input_data.assign(ds=pd.to_datetime(input_data["ds"]))
                 predictions = self.model.predict(input_data)
                 return predictions # Output format depends on how model was saved
 
@@ -209,16 +339,26 @@ def handle_predict():
 
         # --- Input Data Handling (Needs to be adapted based on expected format) ---
         # Example: Assuming input is JSON that can be converted to DataFrame
-        # For Prophet: Expects { "ds": ["2023-01-01 00:00", ...] }
-        # For LightGBM: Expects { "feature1": [...], "feature2": [...] }
+        # For Prophet: Expects { "ds": ["2023-01-01 00:00", ...] }, optionally with "uncertainty_samples": n (0 for point forecasts)
+        # For LightGBM: Expects { "feature1": [...], "feature2": [...] } (plus "series_id": id for a global model),
+        #   or { "history": {"index": [...], "<value_col>": [..., null, ...]} } to forecast the null rows recursively
         # For ARIMA (steps): Expects { "steps": 10 }
+        # For AutoTS (pyfunc): Expects { "ds": ["2023-01-01 00:00", ...] }
         
         input_df = None
+        history_df = None
         steps = None
+        uncertainty_samples = None
+        series_id = None
+        if deployment_agent.model_type == "lightgbm" and isinstance(data, dict):
+            series_id = data.pop("series_id", None)
         
         if deployment_agent.model_type == "prophet":
             if "ds" in data:
-                input_df = pd.DataFrame(data)
+                uncertainty_samples = data.get("uncertainty_samples")
+                if uncertainty_samples is not None and (not isinstance(uncertainty_samples, int) or uncertainty_samples < 0):
+                    return jsonify({"error": "Invalid \"uncertainty_samples\" value for Prophet model"}), 400
+                input_df = pd.DataFrame({key: values for key, values in data.items() if key != "uncertainty_samples"})
                 input_df["ds"] = pd.to_datetime(input_df["ds"])
             else:
                  return jsonify({"error": "Missing \"ds\" key for Prophet model"}), 400
@@ -226,6 +366,15 @@ def handle_predict():
              steps = data["steps"]
              if not isinstance(steps, int) or steps <= 0:
                  return jsonify({"error": "Invalid \"steps\" value for ARIMA model"}), 400
+        elif deployment_agent.model_type == "lightgbm" and "history" in data and deployment_agent.feature_spec:
+            # Recent actuals (and the timestamps to forecast, with null values); features are rebuilt
+            # server-side and the horizon is forecast recursively
+            try:
+                history_df = pd.DataFrame(data["history"])
+                history_df["index"] = pd.to_datetime(history_df["index"])
+                history_df = history_df.set_index("index")
+            except Exception as hist_e:
+                return jsonify({"error": f"Could not parse \"history\": {hist_e}"}), 400
         else: # Assume tabular data for LightGBM or pyfunc
             try:
                 input_df = pd.DataFrame(data)
@@ -240,11 +389,14 @@ def handle_predict():
                  return jsonify({"error": f"Could not parse input JSON to DataFrame: {df_e}"}), 400
         # --- End Input Data Handling ---
 
-        prediction_input = input_df if input_df is not None else steps
-        if prediction_input is None:
-             return jsonify({"error": "Failed to prepare input data for prediction"}), 400
+        if history_df is not None:
+            predictions = deployment_agent.forecast_recursive(history_df, series_id=series_id)
+        else:
+            prediction_input = input_df if input_df is not None else steps
+            if prediction_input is None:
+                 return jsonify({"error": "Failed to prepare input data for prediction"}), 400
 
-        predictions = deployment_agent.predict(prediction_input)
+            predictions = deployment_agent.predict(prediction_input, uncertainty_samples=uncertainty_samples, series_id=series_id)
 
         if predictions is None:
             return jsonify({"error": "Prediction failed"}), 500
@@ -4,10 +4,31 @@ import numpy as np
 import logging
 import mlflow
 import os
+import hashlib
+import json
+import multiprocessing
+import re
+import shutil
+import signal
+import tempfile
+import time
 import optuna
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from functools import partial
 from sklearn.model_selection import train_test_split
-from sklearn.metrics import mean_absolute_percentage_error, r2_score, mean_absolute_error
 from mlflow.models import infer_signature
+from optuna.storages import JournalStorage
+from optuna.storages.journal import JournalFileBackend
+from agents.processed_data import (is_parquet_path, is_store_path, load_processed_data, read_processed_metadata,
+                                   ProcessedDataStore, SERIES_PARTITION_COL)
+from agents.auto_arima import seasonal_period, differencing_orders, auto_arima_order, arima_trend
+from agents.forecast_metrics import METRIC_NAMES, HIGHER_IS_BETTER_METRICS, compute_metrics
+from agents.autots_model import (AutoTSForecaster, fit_within, DEFAULT_AUTOTS_BUDGET, AUTOTS_GENERATIONS_SHARE,
+                                  AUTOTS_FIT_SHARE, AUTOTS_SLOW_MODEL_SHARE, DEFAULT_AUTOTS_MODEL_LIST,
+                                  DEFAULT_AUTOTS_ENSEMBLE, AUTOTS_MAX_GENERATIONS)
+from agents.lag_features import lag_warmup, recursive_forecast
+from agents.global_model import SERIES_CODE_FEATURE, GLOBAL_SCALINGS, series_scale, scaled_feature_names, to_global_features
+from agents.dtype_profiles import DTYPE_PROFILES, apply_dtype_profile, to_plain_dtypes, log_memory_usage
 
 # Import model libraries (ensure they are installed)
 from prophet import Prophet
@@ -20,27 +41,81 @@ logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(
 # Suppress Optuna info logs to avoid clutter
 optuna.logging.set_verbosity(optuna.logging.WARNING)
 
+MODEL_CANDIDATES = ("Prophet", "LightGBM", "ARIMA")
+OPTIONAL_MODEL_CANDIDATES = ("AutoTS",) # Trained by run_modeling_pipeline only when requested
+MULTI_CORE_CANDIDATES = ("LightGBM", "AutoTS") # Share the cores left by the single-threaded candidates in run_modeling_pipeline
+OPTUNA_PRUNERS = ("median", "hyperband")
+PRUNING_REPORT_INTERVAL = 10 # Boosting rounds between reports of the validation MAE to the pruner
+LIGHTGBM_FIXED_PARAMS = {"objective": "regression_l1", "metric": "mae", "verbose": -1, "seed": 42, "boosting_type": "gbdt"}
+AUTO_ARIMA_SEARCH_ROWS = 1000 # Most recent rows used to rank ARIMA orders; the chosen orders are fitted on all rows
+ARIMA_FINGERPRINT_ROWS = 1000 # Leading rows that identify a series in the differencing-test cache
+DEFAULT_BACKTEST_LIGHTGBM_PARAMS = {"n_estimators": 500, "learning_rate": 0.05, "num_leaves": 31}
+# n_estimators is the upper bound for early stopping on the validation rows of all series
+DEFAULT_GLOBAL_LIGHTGBM_PARAMS = {"n_estimators": 2000, "learning_rate": 0.05, "num_leaves": 63, "min_child_samples": 50}
+GLOBAL_EARLY_STOPPING_ROUNDS = 100
+# Binning is fixed when a Dataset is constructed. feature_pre_filter is off so that trials may vary
+# min_child_samples on the same Dataset (pre-filtering would tie the bins to one value of it).
+LIGHTGBM_DATASET_PARAMS = {"feature_pre_filter": False, "verbose": -1}
+LIGHTGBM_TUNING_SHARE = 0.7 # Part of a candidate's time limit after which no new tuning trial is started, leaving time for the final fit and scoring
+PROPHET_UNCERTAINTY_SAMPLES = 1000 # Prophet's default; draws behind yhat_lower/yhat_upper when serving
+
+
+class CandidateTimeLimitExceeded(BaseException):
+    """
+    Raised in a candidate's worker when its time limit expires. Derives from BaseException so the
+    broad `except Exception` handlers in the training methods do not swallow it.
+    """
+
+
 class ModelingAgent:
     def __init__(self, processed_data_path: str, value_col: str, datetime_col: str = None,
                  mlflow_tracking_uri: str = "file:/home/ubuntu/load_forecasting_agents/mlruns",
                  experiment_name: str = "Load Forecasting Experiment",
-                 registered_model_name: str = "LoadForecastingModel"):
+                 registered_model_name: str = "LoadForecastingModel", dtype_profile: str = None,
+                 series_id: str = None, tuning_dir: str = None):
         """
         Initializes the Modeling Agent.
 
         Args:
-            processed_data_path: Path to the processed data CSV file (output from DataProcessingAgent).
-            value_col: Name of the target variable column (e.g., \'load_kw\').
+            processed_data_path: Path to the processed data file (Parquet or CSV output from DataProcessingAgent),
+                                 or a ProcessedDataStore (.store), which is kept on disk and queried by date range.
+            value_col: Name of the target variable column (e.g., 'load_kw').
             datetime_col: Name of the datetime index column (if not already the index).
             mlflow_tracking_uri: URI for MLflow tracking server.
             experiment_name: Name for the MLflow experiment.
             registered_model_name: Name to use for registering the best model in MLflow Model Registry.
+            dtype_profile: (Optional) Cast the loaded data to a dtype profile ("standard" or "compact",
+                           see dtype_profiles). The dtypes of the processed data are kept if None.
+            series_id: (Optional) Series to model from a multi-series store or series-partitioned Parquet dataset.
+            tuning_dir: (Optional) Directory where LightGBM tuning studies and fitted Prophet parameters are
+                        persisted per registered model (and series), so that retrains warm-start from earlier runs.
         """
         self.processed_data_path = processed_data_path
+        self.mlflow_tracking_uri = mlflow_tracking_uri
+        self.experiment_name = experiment_name
         self.value_col = value_col
         self.datetime_col = datetime_col # Often the index after processing
         self.registered_model_name = registered_model_name
+        self.processed_metadata = {} # Processing metadata stored with Parquet data (e.g. the lag feature spec)
+        self.grid_freq = None # Time grid frequency recorded by DataProcessingAgent, if the data was resampled
+        if dtype_profile is not None and dtype_profile not in DTYPE_PROFILES:
+            raise ValueError(f"Unknown dtype profile '{dtype_profile}'. Available: {list(DTYPE_PROFILES)}")
+        self.dtype_profile = dtype_profile
+        self.memory_bytes = None
+        self.series_id = series_id
+        self.store = None # Set for out-of-core stores; self.df then only carries the schema
+        self.tuning_dir = tuning_dir
+        self._arima_tests = None # Cached differencing orders of the modelled series (see _arima_differencing)
+        if self.tuning_dir:
+            os.makedirs(self.tuning_dir, exist_ok=True)
         self.df = self._load_processed_data()
+        if self.df is not None:
+            if self.dtype_profile is not None:
+                self.df = apply_dtype_profile(self.df, self.dtype_profile)
+                # Recorded with the model so serving casts its inputs the same way
+                self.processed_metadata["dtype_profile"] = self.dtype_profile
+            if self.store is None:
+                self.memory_bytes = log_memory_usage(self.df, "Modeling data")
 
         mlflow.set_tracking_uri(mlflow_tracking_uri)
         mlflow.set_experiment(experiment_name)
@@ -48,7 +123,7 @@ class ModelingAgent:
         try:
             experiment = mlflow.get_experiment_by_name(experiment_name)
             if experiment is None:
-                logging.warning(f"Experiment \'{experiment_name}\' not found, creating it.")
+                logging.warning(f"Experiment '{experiment_name}' not found, creating it.")
                 self.experiment_id = mlflow.create_experiment(experiment_name)
             else:
                 self.experiment_id = experiment.experiment_id
@@ -66,12 +141,45 @@ class ModelingAgent:
     def _load_processed_data(self) -> pd.DataFrame | None:
         """Loads the processed data."""
         try:
+            if is_store_path(self.processed_data_path):
+                # Only the schema is loaded here; splits are read by date range when needed
+                self.store = ProcessedDataStore(self.processed_data_path)
+                self.processed_metadata = self.store.metadata(self.series_id)
+                self.grid_freq = self.processed_metadata.get("grid_freq")
+                if self.series_id is None and not self.store.parts() and self.store.series_ids():
+                    # Batch trainers (train_prophet_batch, train_global_lightgbm) read each series themselves
+                    logging.info(f"Opened multi-series store {self.processed_data_path} with {len(self.store.series_ids())} series; "
+                                 "pass series_id to train a single series.")
+                    return None
+                df = self.store.empty_frame(self.series_id)
+                if self.value_col not in df.columns:
+                    logging.error(f"Value column '{self.value_col}' not found in processed data store.")
+                    return None
+                if not self.datetime_col:
+                    self.datetime_col = df.index.name
+                logging.info(f"Opened processed data store {self.processed_data_path} with {self.store.row_count(self.series_id)} rows on disk.")
+                return df
+
+            if is_parquet_path(self.processed_data_path):
+                # Parquet keeps the datetime index and dtypes, so no timestamp parsing is needed
+                df = load_processed_data(self.processed_data_path, series_id=self.series_id)
+                self.processed_metadata = read_processed_metadata(self.processed_data_path, series_id=self.series_id)
+                self.grid_freq = self.processed_metadata.get("grid_freq")
+                if self.value_col not in df.columns:
+                    logging.error(f"Value column '{self.value_col}' not found in processed data.")
+                    return None
+                if not self.datetime_col:
+                    self.datetime_col = df.index.name
+                df = df.sort_index()
+                logging.info(f"Loaded processed data from {self.processed_data_path}. Shape: {df.shape}")
+                return df
+
             df = pd.read_csv(self.processed_data_path)
             # Attempt to set datetime index if not already set
             datetime_col_to_set = None
             if self.datetime_col and self.datetime_col in df.columns:
                 datetime_col_to_set = self.datetime_col
-            elif df.columns[0].startswith(\'Unnamed\'): # Try inferring index col if not specified and first col is unnamed
+            elif df.columns[0].startswith('Unnamed'): # Try inferring index col if not specified and first col is unnamed
                  logging.warning("First column seems like an unnamed index, attempting to parse as datetime index.")
                  datetime_col_to_set = df.columns[0]
 
@@ -81,16 +189,16 @@ class ModelingAgent:
                     df = df.set_index(datetime_col_to_set)
                     if not self.datetime_col: # Update internal reference if it was inferred
                         self.datetime_col = datetime_col_to_set
-                    logging.info(f"Successfully set column \'{datetime_col_to_set}\' as datetime index.")
+                    logging.info(f"Successfully set column '{datetime_col_to_set}' as datetime index.")
                 except Exception as e:
-                    logging.error(f"Failed to parse column \'{datetime_col_to_set}\' as datetime index: {e}. Proceeding without explicit datetime index.")
+                    logging.error(f"Failed to parse column '{datetime_col_to_set}' as datetime index: {e}. Proceeding without explicit datetime index.")
             elif pd.api.types.is_datetime64_any_dtype(df.index):
                  logging.info("Data already has a datetime index.")
             else:
                  logging.warning("Could not identify or set a datetime index. Some models might fail.")
 
             if self.value_col not in df.columns:
-                logging.error(f"Value column \'{self.value_col}\' not found in processed data.")
+                logging.error(f"Value column '{self.value_col}' not found in processed data.")
                 return None
 
             df = df.sort_index() # Ensure data is sorted by time
@@ -100,8 +208,31 @@ class ModelingAgent:
             logging.error(f"Error loading processed data from {self.processed_data_path}: {e}")
             return None
 
+    def load_window(self, start=None, end=None, columns: list = None) -> pd.DataFrame:
+        """
+        Returns the rows with start <= timestamp <= end (either bound may be None). Stores read
+        only the partitions and row groups that overlap the window; in-memory data is sliced.
+        """
+        if self.store is None:
+            df = self.df.loc[start:end]
+            return df if columns is None else df[columns]
+        df = self.store.query(start=start, end=end, series_id=self.series_id, columns=columns)
+        return apply_dtype_profile(df, self.dtype_profile) if self.dtype_profile else df
+
+    def _row_slice(self, first: int, last: int) -> pd.DataFrame:
+        """Rows first..last-1 in time order, read by timestamp range from a store."""
+        if self.store is None:
+            return self.df.iloc[first:last]
+        if last <= first:
+            return self.df.iloc[0:0] # Empty range; timestamp_at(last - 1) would be outside it
+        return self.load_window(self.store.timestamp_at(first, self.series_id),
+                                self.store.timestamp_at(last - 1, self.series_id))
+
     def _split_data(self, test_size=0.2, validation_size=0.1) -> tuple | None:
-        """Splits data into training, validation (optional), and testing sets based on time."""
+        """
+        Splits data into training, validation (optional), and testing sets based on time.
+        With a store, split points come from the Parquet row counts and each set is read by date range.
+        """
         if self.df is None:
             logging.error("DataFrame not loaded, cannot split data.")
             return None
@@ -110,61 +241,50 @@ class ModelingAgent:
             logging.error("Invalid split sizes. Ensure test_size > 0, validation_size >= 0, and test_size + validation_size < 1.")
             return None
 
-        total_len = len(self.df)
+        total_len = self.store.row_count(self.series_id) if self.store is not None else len(self.df)
         test_split_point = int(total_len * (1 - test_size))
         
         if validation_size > 0:
             val_split_point = int(total_len * (1 - test_size - validation_size))
-            train_df = self.df.iloc[:val_split_point]
-            val_df = self.df.iloc[val_split_point:test_split_point]
-            test_df = self.df.iloc[test_split_point:]
+            train_df = self._row_slice(0, val_split_point)
+            val_df = self._row_slice(val_split_point, test_split_point)
+            test_df = self._row_slice(test_split_point, total_len)
             logging.info(f"Split data: Train shape {train_df.shape}, Validation shape {val_df.shape}, Test shape {test_df.shape}")
             return train_df, val_df, test_df
         else:
-            train_df = self.df.iloc[:test_split_point]
-            test_df = self.df.iloc[test_split_point:]
+            train_df = self._row_slice(0, test_split_point)
+            test_df = self._row_slice(test_split_point, total_len)
             logging.info(f"Split data: Train shape {train_df.shape}, Test shape {test_df.shape}")
             return train_df, None, test_df # Return None for validation set
 
     def _evaluate_model(self, y_true, y_pred):
-        """Calculates evaluation metrics."""
-        # Ensure inputs are numpy arrays
-        y_true = np.asarray(y_true)
-        y_pred = np.asarray(y_pred)
-        
-        # Avoid division by zero in MAPE if y_true contains zeros
-        mask = y_true != 0
-        if np.sum(mask) == 0: # All true values are zero
-             mape = 0.0 if np.allclose(y_pred, 0) else float(\'inf\')
-        else:
-             # Ensure y_pred corresponding to non-zero y_true are finite
-             y_pred_masked = y_pred[mask]
-             y_true_masked = y_true[mask]
-             if not np.all(np.isfinite(y_pred_masked)):
-                 logging.warning("Non-finite values found in predictions for MAPE calculation. Setting MAPE to infinity.")
-                 mape = float(\'inf\')
-             else:
-                 mape = mean_absolute_percentage_error(y_true_masked, y_pred_masked)
-        
-        # Check for non-finite values before calculating MAE and R2
-        if not np.all(np.isfinite(y_pred)):
-            logging.warning("Non-finite values found in predictions. MAE and R2 might be invalid.")
-            mae = float(\'inf\')
-            r2 = -float(\'inf\') # Or some other indicator of invalidity
-        else:
-            mae = mean_absolute_error(y_true, y_pred)
-            r2 = r2_score(y_true, y_pred)
-        
-        metrics = {
-            "MAPE": mape,
-            "MAE": mae,
-            "R2_Score": r2
-        }
+        """Calculates evaluation metrics (see forecast_metrics.compute_metrics)."""
+        metrics = compute_metrics(y_true, y_pred)
+        if not np.isfinite(metrics["MAE"]):
+            logging.warning("Non-finite values found in predictions. Metrics are set to infinity.")
         logging.info(f"Evaluation Metrics: {metrics}")
         return metrics
 
-    def train_prophet(self, train_df, test_df):
-        """Trains and evaluates a Prophet model."""
+    def train_prophet(self, train_df, test_df, uncertainty_samples: int = PROPHET_UNCERTAINTY_SAMPLES,
+                      warm_start: bool = False):
+        """
+        Trains and evaluates a Prophet model.
+
+        The model predicts only the test timestamps, and without uncertainty intervals: the metrics
+        need point forecasts only, and Prophet's interval simulation dominates prediction time.
+
+        With a `tuning_dir`, the fitted parameters are stored per registered model (and series).
+        A warm-started fit begins Stan's optimization from them instead of from Prophet's default
+        initialization, so a refit on slightly more data converges in a fraction of the iterations.
+        Stored vectors whose length no longer fits the model (e.g. a different number of
+        changepoints or seasonal terms) are replaced by Prophet's defaults; if the warm-started fit
+        fails, the model is fitted from scratch.
+
+        Args:
+            uncertainty_samples: Samples the logged model draws for yhat_lower/yhat_upper when
+                                 serving (0 disables intervals).
+            warm_start: Initialize the fit from the stored parameters of the previous fit.
+        """
         logging.info("Training Prophet model...")
         with mlflow.start_run(experiment_id=self.experiment_id, run_name="Prophet") as run:
             run_id = run.info.run_id
@@ -175,33 +295,45 @@ class ModelingAgent:
                      logging.error("Prophet requires a named datetime index or column.")
                      return None, None, None
                 prophet_train_df = train_df.reset_index()[[idx_name, self.value_col]]
-                prophet_train_df.columns = [\"ds\", \"y\"]
+                prophet_train_df.columns = ["ds", "y"]
 
-                model = Prophet()
-                model.fit(prophet_train_df)
+                init = self._load_prophet_init() if warm_start else None
+                start = time.monotonic()
+                model = Prophet(uncertainty_samples=0)
+                if init is not None:
+                    try:
+                        model.fit(prophet_train_df, init=init)
+                    except Exception as e:
+                        logging.warning(f"Warm start from stored Prophet parameters failed ({e}). Fitting from scratch.")
+                        init = None
+                        model = Prophet(uncertainty_samples=0) # A Prophet object can only be fitted once
+                if init is None:
+                    model.fit(prophet_train_df)
+                fit_seconds = time.monotonic() - start
+                self._save_prophet_init(model)
 
-                future = model.make_future_dataframe(periods=len(test_df), freq=pd.infer_freq(test_df.index))
+                future = pd.DataFrame({"ds": test_df.index})
                 forecast = model.predict(future)
+                model.uncertainty_samples = uncertainty_samples # Setting the served model predicts with
 
-                y_pred = forecast[\"yhat\"][-len(test_df):].values
+                y_pred = forecast["yhat"].values
                 y_true = test_df[self.value_col].values
 
                 metrics = self._evaluate_model(y_true, y_pred)
-                mlflow.log_params({"model_type": "Prophet"})
-                mlflow.log_metrics(metrics)
+                mlflow.log_params({"model_type": "Prophet", "grid_freq": self.grid_freq,
+                                   "uncertainty_samples": uncertainty_samples, "warm_start": init is not None})
+                mlflow.log_metrics({**metrics, "fit_seconds": fit_seconds})
                 
                 # Infer signature for Prophet (Input: ds, Output: yhat)
-                signature_input = future[-len(test_df):].drop(columns=["yhat"] if "yhat" in future.columns else [])
-                signature_output = forecast[["yhat"]][-len(test_df):]
-                signature = infer_signature(signature_input, signature_output)
+                signature = infer_signature(future, forecast[["yhat"]])
 
                 try:
                     mlflow.prophet.log_model(model, artifact_path=model_artifact_path, signature=signature)
                 except AttributeError:
                     logging.warning("mlflow.prophet.log_model not available. Model not logged.")
-                    model_artifact_path = None # Indicate model wasn\'t logged
+                    model_artifact_path = None # Indicate model wasn't logged
                 
-                logging.info("Prophet training complete.")
+                logging.info(f"Prophet training complete ({'warm-started' if init is not None else 'cold'} fit in {fit_seconds:.1f}s).")
                 return metrics, model, f"runs:/{run_id}/{model_artifact_path}" if model_artifact_path else None
             except Exception as e:
                 logging.error(f"Error training Prophet: {e}", exc_info=True)
@@ -209,47 +341,338 @@ class ModelingAgent:
                 mlflow.log_param("error", str(e))
                 return None, None, None
 
-    def train_lightgbm_with_optuna(self, train_df, val_df, test_df, n_trials=20):
-        """Trains and evaluates a LightGBM model with Optuna hyperparameter tuning."""
-        logging.info(f"Training LightGBM model with Optuna ({n_trials} trials)...")
+    def _prophet_init_path(self) -> str | None:
+        return os.path.join(self.tuning_dir, f"{self._study_name()}.prophet.json") if self.tuning_dir else None
+
+    def _load_prophet_init(self) -> dict | None:
+        """Parameters of the previous Prophet fit of this registered model (and series), if stored."""
+        path = self._prophet_init_path()
+        if not path or not os.path.exists(path):
+            logging.info("No stored Prophet parameters to warm-start from.")
+            return None
+        with open(path) as f:
+            init = json.load(f)
+        return {name: np.asarray(value) if isinstance(value, list) else value for name, value in init.items()}
+
+    def _save_prophet_init(self, model) -> None:
+        """Stores the parameters of a fitted Prophet model as the warm start of the next fit."""
+        path = self._prophet_init_path()
+        if path:
+            with open(path, "w") as f:
+                json.dump({name: value.tolist() if isinstance(value, np.ndarray) else value
+                           for name, value in _prophet_init(model).items()}, f)
+
+    def _dataset_series_ids(self) -> list:
+        """Ids of the series in the store or series-partitioned Parquet dataset at processed_data_path."""
+        if is_store_path(self.processed_data_path):
+            return ProcessedDataStore(self.processed_data_path).series_ids()
+        if os.path.isdir(self.processed_data_path):
+            prefix = f"{SERIES_PARTITION_COL}="
+            return sorted(name[len(prefix):] for name in os.listdir(self.processed_data_path) if name.startswith(prefix))
+        return []
+
+    def train_prophet_batch(self, series_ids: list = None, max_workers: int = None, test_size: float = 0.2,
+                            warm_start: bool = True, uncertainty_samples: int = PROPHET_UNCERTAINTY_SAMPLES,
+                            register: bool = True) -> dict | None:
+        """
+        Trains one Prophet model per series of a multi-series dataset in parallel across a process pool.
+
+        Each series is trained by its own worker (with its own agent, see `train_prophet`) and, with
+        `register`, registered as "<registered_model_name>-<series_id>". With a `tuning_dir` and
+        `warm_start`, every refit starts from that series' parameters of the previous run, which makes
+        daily refits much faster than the initial fits. A failing series is reported and does not
+        abort the batch.
+
+        Args:
+            series_ids: (Optional) Series to train. Defaults to all series of the store or
+                        series-partitioned Parquet dataset at processed_data_path.
+            max_workers: Number of worker processes (defaults to the number of CPUs).
+            test_size: Fraction of each series held out for evaluation.
+            warm_start: Warm-start each fit from the stored parameters of its series.
+            uncertainty_samples: Interval samples of the logged models when serving (0 disables intervals).
+            register: Register each series' model in the MLflow Model Registry.
+
+        Returns:
+            A dict with test metrics ("metrics"), model URIs ("model_uris"), registered versions
+            ("registered_versions"), training times in seconds ("seconds") and error messages
+            ("failed"), each keyed by series id, or None if no series were found.
+        """
+        if series_ids is None:
+            series_ids = self._dataset_series_ids()
+        if not series_ids:
+            logging.error(f"No series found in {self.processed_data_path}.")
+            return None
+        if warm_start and not self.tuning_dir:
+            logging.warning("warm_start requires a tuning_dir to store fitted parameters; all series are fitted from scratch.")
+
+        metrics, model_uris, registered_versions, seconds, failed = {}, {}, {}, {}, {}
+        start = time.monotonic()
+        logging.info(f"Training Prophet for {len(series_ids)} series with up to {max_workers or os.cpu_count()} workers...")
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            futures = {
+                executor.submit(_prophet_series_task, {**self._agent_settings(), "series_id": series_id},
+                                test_size, warm_start, uncertainty_samples): series_id
+                for series_id in series_ids
+            }
+            for future in as_completed(futures):
+                series_id = futures[future]
+                try:
+                    series_metrics, model_uri, elapsed = future.result()
+                except Exception as e:
+                    failed[series_id] = str(e)
+                    logging.error(f"Prophet training failed for series '{series_id}': {e}")
+                    continue
+                if series_metrics is None or model_uri is None:
+                    failed[series_id] = "no logged model"
+                    continue
+                metrics[series_id], model_uris[series_id], seconds[series_id] = series_metrics, model_uri, elapsed
+
+        if register:
+            for series_id, model_uri in model_uris.items():
+                try:
+                    registered_versions[series_id] = mlflow.register_model(model_uri, f"{self.registered_model_name}-{series_id}")
+                except Exception as e:
+                    logging.error(f"Error registering the Prophet model of series '{series_id}': {e}")
+        logging.info(f"Batch Prophet training finished in {time.monotonic() - start:.1f}s. "
+                     f"{len(metrics)} series succeeded, {len(failed)} failed.")
+        return {"metrics": metrics, "model_uris": model_uris, "registered_versions": registered_versions,
+                "seconds": seconds, "failed": failed}
+
+    def train_global_lightgbm(self, series_ids: list = None, test_size: float = 0.2, validation_size: float = 0.1,
+                              params: dict = None, scaling: str = "mean", max_workers: int = None, n_jobs: int = None,
+                              register: bool = True) -> tuple[dict | None, str | None, object]:
+        """
+        Trains one global LightGBM model on all series of a multi-series dataset.
+
+        Every series is split by time into train/validation/test rows, scaled by its own training
+        scale (see global_model.series_scale) and stacked into one float32 matrix, with the series
+        code as a categorical feature; scaling puts small and large feeders on the same footing for
+        the shared trees. Series are loaded and featurized in parallel across a process pool. The
+        number of boosting rounds is chosen by early stopping on the validation rows, then the final
+        model is refitted on train+validation (reusing the training bins) and evaluated on the test
+        rows in original units; with lag features, each series' test rows are forecast recursively
+        (see lag_features.recursive_forecast).
+
+        The model is logged once, with a feature spec holding the series codes and scales, so the
+        deployment agent can forecast any member series from the single registered artifact.
+
+        Args:
+            series_ids: (Optional) Series to include. Defaults to all series of the store or
+                        series-partitioned Parquet dataset at processed_data_path.
+            test_size, validation_size: Fractions of each series held out for testing and early stopping.
+            params: (Optional) LightGBM parameters overriding DEFAULT_GLOBAL_LIGHTGBM_PARAMS.
+            scaling: Per-series scaling ("mean" or "max" absolute value, or "none").
+            max_workers: Number of worker processes loading series (defaults to the number of CPUs).
+            n_jobs: LightGBM threads (default: all cores).
+            register: Register the model under registered_model_name.
+
+        Returns:
+            (test_metrics, model_uri, registered_version); (None, None, None) on failure.
+        """
+        if scaling not in GLOBAL_SCALINGS:
+            logging.error(f"Unknown series scaling '{scaling}'. Available: {list(GLOBAL_SCALINGS)}")
+            return None, None, None
+        if not (0 < test_size < 1) or not (0 < validation_size < 1) or (test_size + validation_size >= 1):
+            logging.error("Invalid split sizes. The global model needs test_size > 0, validation_size > 0 and test_size + validation_size < 1.")
+            return None, None, None
+        if series_ids is None:
+            series_ids = self._dataset_series_ids()
+        if not series_ids:
+            logging.error(f"No series found in {self.processed_data_path}.")
+            return None, None, None
+        series_ids = list(series_ids)
+        n_jobs = n_jobs or os.cpu_count()
+        start = time.monotonic()
+
+        # The first series defines the features (and the spec replayed at serving time); the others must match
+        feature_spec = read_processed_metadata(self.processed_data_path, series_id=series_ids[0])
+        first_df = load_processed_data(self.processed_data_path, series_id=series_ids[0])
+        if self.value_col not in first_df.columns:
+            logging.error(f"Value column '{self.value_col}' not found in series '{series_ids[0]}'.")
+            return None, None, None
+        features = [col for col in first_df.columns if col != self.value_col]
+        scaled_features = scaled_feature_names({**feature_spec, "value_col": self.value_col}, features)
+        lag_spec = feature_spec.get("lag_spec")
+        del first_df
+
+        parts, failed = {}, {}
+        split_sizes = {"test_size": test_size, "validation_size": validation_size}
+        logging.info(f"Loading {len(series_ids)} series for the global LightGBM model with up to {max_workers or os.cpu_count()} workers...")
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            futures = {
+                executor.submit(_global_series_task, self.processed_data_path, series_id, code, self.value_col,
+                                features, scaled_features, scaling, split_sizes, self.dtype_profile,
+                                lag_warmup(lag_spec) if lag_spec else 0): series_id
+                for code, series_id in enumerate(series_ids)
+            }
+            for future in as_completed(futures):
+                series_id = futures[future]
+                try:
+                    parts[series_id] = future.result()
+                except Exception as e:
+                    failed[series_id] = str(e)
+                    logging.error(f"Series '{series_id}' left out of the global model: {e}")
+        if not parts:
+            logging.error("No series could be prepared for the global model.")
+            return None, None, None
+        # Stack in code order so row order does not depend on worker timing
+        ordered = [parts[series_id] for series_id in series_ids if series_id in parts]
+        X_train, y_train, X_val, y_val, X_test, y_test = (np.concatenate([part[key] for part in ordered])
+                                                          for key in ("X_train", "y_train", "X_val", "y_val", "X_test", "y_test"))
+        test_scales = np.concatenate([np.full(len(part["y_test"]), part["scale"]) for part in ordered])
+        global_features = [SERIES_CODE_FEATURE] + features
+        loading_seconds = time.monotonic() - start
+
+        with mlflow.start_run(experiment_id=self.experiment_id, run_name="LightGBM_Global") as run:
+            run_id = run.info.run_id
+            model_artifact_path = "lightgbm-global-model"
+            try:
+                lgb_params = {**DEFAULT_GLOBAL_LIGHTGBM_PARAMS, **(params or {})}
+                max_rounds = lgb_params.pop("n_estimators")
+                lgb_params.update(LIGHTGBM_FIXED_PARAMS, n_jobs=n_jobs)
+                train_set = lgb.Dataset(X_train, label=y_train, feature_name=global_features,
+                                        categorical_feature=[SERIES_CODE_FEATURE], params=LIGHTGBM_DATASET_PARAMS,
+                                        free_raw_data=False).construct()
+                val_set = lgb.Dataset(X_val, label=y_val, reference=train_set, feature_name=global_features,
+                                      categorical_feature=[SERIES_CODE_FEATURE]).construct()
+                logging.info(f"Training global LightGBM on {len(ordered)} series ({len(X_train)} training rows)...")
+                booster = lgb.train(lgb_params, train_set, num_boost_round=max_rounds, valid_sets=[val_set],
+                                    callbacks=[lgb.early_stopping(GLOBAL_EARLY_STOPPING_ROUNDS, verbose=False)])
+                num_boost_round = booster.best_iteration or max_rounds
+
+                # Binned with the training set's bin boundaries, so only bin assignment is done here
+                train_val_set = lgb.Dataset(np.concatenate([X_train, X_val]), label=np.concatenate([y_train, y_val]),
+                                            reference=train_set, feature_name=global_features,
+                                            categorical_feature=[SERIES_CODE_FEATURE], params=LIGHTGBM_DATASET_PARAMS)
+                final_model = lgb.train(lgb_params, train_val_set, num_boost_round=num_boost_round)
+                training_seconds = time.monotonic() - start - loading_seconds
+
+                if lag_spec:
+                    y_pred_test = np.concatenate([recursive_forecast(final_model.predict, part["X_test"], global_features,
+                                                                     part["history"], lag_spec, self.value_col)
+                                                  for part in ordered]) * test_scales
+                else:
+                    y_pred_test = final_model.predict(X_test) * test_scales
+                test_metrics = self._evaluate_model(y_test, y_pred_test)
+                mlflow.log_params({**lgb_params, "model_type": "LightGBM_Global", "n_series": len(ordered),
+                                   "failed_series": len(failed), "scaling": scaling, "num_boost_round": num_boost_round,
+                                   "test_evaluation": "recursive" if lag_spec else "direct"})
+                mlflow.log_metrics({f"test_{k}": v for k, v in test_metrics.items()})
+                mlflow.log_metrics({"loading_seconds": loading_seconds, "training_seconds": training_seconds})
+
+                signature_input = pd.DataFrame(X_test[:5], columns=global_features).astype({SERIES_CODE_FEATURE: "int32"})
+                signature = infer_signature(signature_input, y_pred_test[:5])
+                mlflow.lightgbm.log_model(final_model, artifact_path=model_artifact_path, signature=signature)
+                feature_spec = {**feature_spec, "global_model": {
+                    "series_codes": {str(series_id): code for code, series_id in enumerate(series_ids) if series_id in parts},
+                    "series_scales": {str(series_id): parts[series_id]["scale"] for series_id in series_ids if series_id in parts},
+                    "scaled_features": scaled_features,
+                    "scaling": scaling,
+                }}
+                # Stored with the model so serving can rebuild the features and scale each series
+                mlflow.log_dict(feature_spec, "feature_spec.json")
+                logging.info(f"Global LightGBM training complete in {time.monotonic() - start:.1f}s "
+                             f"({len(ordered)} series, {len(failed)} failed, {num_boost_round} rounds).")
+            except Exception as e:
+                logging.error(f"Error training global LightGBM: {e}", exc_info=True)
+                mlflow.log_param("status", "failed")
+                mlflow.log_param("error", str(e))
+                return None, None, None
+
+        model_uri = f"runs:/{run_id}/{model_artifact_path}"
+        registered_version = None
+        if register:
+            try:
+                registered_version = mlflow.register_model(model_uri, self.registered_model_name)
+                logging.info(f"Registered global LightGBM as {registered_version.name} v{registered_version.version}.")
+            except Exception as e:
+                logging.error(f"Error registering global LightGBM: {e}")
+        return test_metrics, model_uri, registered_version
+
+    def train_lightgbm_with_optuna(self, train_df, val_df, test_df, n_trials=20, n_workers: int = 1,
+                                   n_jobs: int = None, storage: str = None, timeout: float = None,
+                                   pruner: str = "median", warm_start_trials: int = None):
+        """
+        Trains and evaluates a LightGBM model with Optuna hyperparameter tuning.
+
+        With n_workers > 1, trials run in that many worker processes that share one study through
+        Optuna storage. The `n_jobs` cores are split between the two levels of parallelism: each
+        trial's LightGBM gets n_jobs // n_workers threads, so concurrent trials do not oversubscribe
+        the CPU. The final model is trained with all `n_jobs` threads.
+
+        The features are converted once to a contiguous float32 matrix (train and validation rows
+        back to back) and binned once into an lgb.Dataset that every trial reuses; trials only vary
+        booster parameters, which do not require re-binning. The final fit on train+validation reuses
+        the training bins as well.
+
+        If the agent has a `tuning_dir` (or a persistent `storage` is given), the study is kept per
+        registered model and reused by later calls: the best parameters of the previous call are
+        enqueued as the first trial and the earlier trials inform the sampler. The final model uses
+        the best trial of the current call, since earlier trials were scored on older validation data.
+
+        With lag features, the test rows are forecast recursively from the end of the validation
+        rows (see lag_features.recursive_forecast), so the test score is that of a forecast over the
+        whole test period, like the other candidates', not of one-step-ahead predictions.
+
+        Args:
+            n_trials: Total number of Optuna trials.
+            n_workers: Number of worker processes running trials.
+            n_jobs: Cores available for tuning (default: all cores).
+            storage: (Optional) Optuna storage: an RDB URL (e.g. "sqlite:///optuna.db") or the path of a
+                     journal file. Defaults to a journal file in `tuning_dir`, or a temporary one if
+                     there is no tuning_dir and n_workers > 1.
+            timeout: (Optional) Seconds after which no new trials are started.
+            pruner: "median" or "hyperband" to stop unpromising trials early from the validation MAE
+                    reported every PRUNING_REPORT_INTERVAL boosting rounds, or None to train every trial fully.
+            warm_start_trials: (Optional) Number of trials (at most n_trials) to run when warm-starting
+                               from a persisted study.
+        """
+        if pruner is not None and pruner not in OPTUNA_PRUNERS:
+            logging.error(f"Unknown Optuna pruner '{pruner}'. Available: {list(OPTUNA_PRUNERS)}")
+            return None, None, None
+        n_jobs = n_jobs or os.cpu_count() or 1
+        n_workers = max(1, min(n_workers, n_trials))
+        trial_jobs = max(1, n_jobs // n_workers)
+        logging.info(f"Training LightGBM model with Optuna ({n_trials} trials, {n_workers} workers x {trial_jobs} threads)...")
 
         features = [col for col in train_df.columns if col != self.value_col]
         target = self.value_col
 
-        X_train, y_train = train_df[features], train_df[target]
-        X_val, y_val = val_df[features], val_df[target]
-        X_test, y_test = test_df[features], test_df[target]
-
-        def objective(trial):
-            # Define params inside objective to be logged per trial by Optuna callback if used
-            params = {
-                "objective": "regression_l1", "metric": "mae", "verbose": -1, "n_jobs": -1, "seed": 42, "boosting_type": "gbdt",
-                "n_estimators": trial.suggest_int("n_estimators", 100, 2000),
-                "learning_rate": trial.suggest_float("learning_rate", 1e-3, 0.3, log=True),
-                "num_leaves": trial.suggest_int("num_leaves", 20, 300),
-                "max_depth": trial.suggest_int("max_depth", 3, 12),
-                "feature_fraction": trial.suggest_float("feature_fraction", 0.4, 1.0),
-                "bagging_fraction": trial.suggest_float("bagging_fraction", 0.4, 1.0),
-                "bagging_freq": trial.suggest_int("bagging_freq", 1, 7),
-                "min_child_samples": trial.suggest_int("min_child_samples", 5, 100),
-                "lambda_l1": trial.suggest_float("lambda_l1", 1e-8, 10.0, log=True),
-                "lambda_l2": trial.suggest_float("lambda_l2", 1e-8, 10.0, log=True),
-            }
-            model = lgb.LGBMRegressor(**params)
-            model.fit(X_train, y_train,
-                      eval_set=[(X_val, y_val)],
-                      eval_metric="mae",
-                      callbacks=[lgb.early_stopping(100, verbose=False)])
-            preds = model.predict(X_val)
-            mae = mean_absolute_error(y_val, preds)
-            return mae
+        n_train = len(train_df)
+        X_train_val = _float32_matrix([train_df, val_df], features)
+        y_train_val = np.concatenate([train_df[target].to_numpy(dtype=np.float32), val_df[target].to_numpy(dtype=np.float32)])
+        X_train, y_train = X_train_val[:n_train], y_train_val[:n_train] # Views, no copies
+        X_val, y_val = X_train_val[n_train:], y_train_val[n_train:]
+        X_test, y_test = _float32_matrix([test_df], features), test_df[target]
+
+        study_name = None
+        if storage is None and self.tuning_dir:
+            study_name = self._study_name()
+            storage = os.path.join(self.tuning_dir, f"{study_name}.journal.log")
+        elif storage is not None:
+            study_name = self._study_name()
+        temp_dir = None
+        if storage is None and n_workers > 1:
+            temp_dir = tempfile.mkdtemp(prefix="optuna-")
+            storage = os.path.join(temp_dir, "journal.log")
 
         # Run Optuna study within a parent MLflow run
         with mlflow.start_run(experiment_id=self.experiment_id, run_name="LightGBM_Optuna_Tuning") as parent_run:
             parent_run_id = parent_run.info.run_id
             model_artifact_path = "lightgbm-tuned-model"
             try:
-                study = optuna.create_study(direction="minimize")
+                study = optuna.create_study(direction="minimize", storage=_optuna_storage(storage),
+                                            pruner=_optuna_pruner(pruner), study_name=study_name,
+                                            load_if_exists=study_name is not None)
+                first_trial = len(study.trials)
+                previous_best = study.user_attrs.get("best_params")
+                if previous_best:
+                    study.enqueue_trial(previous_best)
+                    n_trials = min(n_trials, warm_start_trials or n_trials)
+                    n_workers = min(n_workers, n_trials)
+                    trial_jobs = max(1, n_jobs // n_workers)
+                    logging.info(f"Warm-starting study '{study.study_name}' from {first_trial} earlier trials "
+                                 f"and the previous best parameters ({n_trials} trials).")
                 # Optional: Add MLflow callback to log each trial
                 # mlflow_callback = optuna.integration.MLflowCallback(
                 #     tracking_uri=mlflow.get_tracking_uri(),
@@ -257,37 +680,78 @@ class ModelingAgent:
                 #     nest_trials=True # Log trials as nested runs
                 # )
                 # study.optimize(objective, n_trials=n_trials, callbacks=[mlflow_callback])
-                study.optimize(objective, n_trials=n_trials)
+                tuning_start = time.monotonic()
+                train_set, val_set = _lightgbm_datasets(X_train, y_train, X_val, y_val, features)
+                if n_workers == 1:
+                    study.optimize(partial(_lightgbm_objective, train_set=train_set, val_set=val_set,
+                                           n_jobs=trial_jobs, prune=pruner is not None),
+                                   n_trials=n_trials, timeout=timeout)
+                else:
+                    # Trials are split evenly; the workers coordinate their samplers through the shared storage.
+                    # Datasets cannot be shared across processes, so each worker bins its own copy once.
+                    shares = [n_trials // n_workers + (i < n_trials % n_workers) for i in range(n_workers)]
+                    with ProcessPoolExecutor(max_workers=n_workers) as executor:
+                        futures = [executor.submit(_optuna_worker_task, storage, study.study_name, share,
+                                                   X_train, y_train, X_val, y_val, features, trial_jobs,
+                                                   timeout, pruner)
+                                   for share in shares]
+                        for future in futures:
+                            future.result()
+                tuning_seconds = time.monotonic() - tuning_start
 
-                best_params = study.best_params
-                best_value = study.best_value
+                current_trials = [t for t in study.get_trials(deepcopy=False, states=(optuna.trial.TrialState.COMPLETE,))
+                                  if t.number >= first_trial]
+                if not current_trials:
+                    raise ValueError("No tuning trial completed.")
+                best_trial = min(current_trials, key=lambda t: t.value)
+                best_params = best_trial.params
+                best_value = best_trial.value
+                if study_name is not None:
+                    study.set_user_attr("best_params", best_params)
                 logging.info(f"Optuna finished. Best MAE (validation): {best_value:.4f}")
                 logging.info(f"Best params: {best_params}")
 
                 mlflow.log_params(best_params)
                 mlflow.log_metric("best_validation_mae", best_value)
                 mlflow.log_param("n_trials", n_trials)
+                mlflow.log_params({"optuna_workers": n_workers, "lgbm_threads_per_trial": trial_jobs,
+                                   "warm_start": bool(previous_best), "previous_trials": first_trial})
+                mlflow.log_metric("tuning_seconds", tuning_seconds)
+                mlflow.log_param("pruner", pruner)
+                pruning_stats = _pruning_stats(study, first_trial)
+                mlflow.log_metrics(pruning_stats)
+                logging.info(f"Pruned {pruning_stats['pruned_trials']} of {len(study.trials) - first_trial} trials "
+                             f"(about {pruning_stats['pruning_seconds_saved']:.1f}s saved).")
                 mlflow.log_param("model_type", "LightGBM_Tuned")
 
                 # Train final model with best params on combined train+val data
                 logging.info("Training final LightGBM model with best parameters...")
                 final_params = best_params.copy()
-                final_params.update({"objective": "regression_l1", "metric": "mae", "verbose": -1, "n_jobs": -1, "seed": 42, "boosting_type": "gbdt"})
-                
-                X_train_val = pd.concat([X_train, X_val])
-                y_train_val = pd.concat([y_train, y_val])
+                final_params.update(LIGHTGBM_FIXED_PARAMS, n_jobs=n_jobs)
+                num_boost_round = final_params.pop("n_estimators")
 
-                final_model = lgb.LGBMRegressor(**final_params)
-                final_model.fit(X_train_val, y_train_val)
+                # Binned with the training set's bin boundaries, so only bin assignment is done here
+                train_val_set = lgb.Dataset(X_train_val, label=y_train_val, reference=train_set, feature_name=features,
+                                            params=LIGHTGBM_DATASET_PARAMS)
+                final_model = lgb.train(final_params, train_val_set, num_boost_round=num_boost_round)
 
-                # Evaluate on test set
-                y_pred_test = final_model.predict(X_test)
+                # Evaluate on test set, as a forecast over the test period when lag features need earlier predictions
+                lag_spec = (self.processed_metadata or {}).get("lag_spec")
+                if lag_spec:
+                    history = np.concatenate([train_df[target].to_numpy(dtype=np.float64), val_df[target].to_numpy(dtype=np.float64)])
+                    y_pred_test = recursive_forecast(final_model.predict, X_test, features, history, lag_spec, target)
+                else:
+                    y_pred_test = final_model.predict(X_test)
                 test_metrics = self._evaluate_model(y_test, y_pred_test)
+                mlflow.log_param("test_evaluation", "recursive" if lag_spec else "direct")
                 mlflow.log_metrics({f"test_{k}": v for k, v in test_metrics.items()})
 
                 # Infer signature for LightGBM
-                signature = infer_signature(X_test, y_pred_test)
+                signature = infer_signature(to_plain_dtypes(test_df[features]), y_pred_test)
                 mlflow.lightgbm.log_model(final_model, artifact_path=model_artifact_path, signature=signature)
+                if self.processed_metadata:
+                    # Stored with the model so serving can rebuild the same calendar and lag features
+                    mlflow.log_dict(self.processed_metadata, "feature_spec.json")
                 
                 logging.info("Tuned LightGBM training complete.")
                 return test_metrics, final_model, f"runs:/{parent_run_id}/{model_artifact_path}"
@@ -297,9 +761,667 @@ class ModelingAgent:
                 mlflow.log_param("status", "failed")
                 mlflow.log_param("error", str(e))
                 return None, None, None
+            finally:
+                if temp_dir:
+                    shutil.rmtree(temp_dir, ignore_errors=True)
+
+    def train_autots(self, train_df, test_df, time_budget: float = DEFAULT_AUTOTS_BUDGET,
+                     model_list=DEFAULT_AUTOTS_MODEL_LIST, ensemble: str = DEFAULT_AUTOTS_ENSEMBLE,
+                     n_jobs: int = None, max_generations: int = AUTOTS_MAX_GENERATIONS):
+        """
+        Trains and evaluates the best model (or ensemble) of an AutoTS search within a wall-clock budget.
+
+        The genetic search starts no new generation after AUTOTS_GENERATIONS_SHARE of `time_budget`
+        and skips models slower than AUTOTS_SLOW_MODEL_SHARE of it, leaving time to cross-validate
+        the best templates. At AUTOTS_FIT_SHARE of the budget the search is ended with the best
+        model found so far (see autots_model.fit_within), so the final forecast of the test period
+        still fits in the budget. Candidate models are fitted in parallel with `n_jobs` processes.
+        The result is logged as an MLflow pyfunc (see autots_model.AutoTSForecaster) that
+        ModelDeploymentAgent serves from "ds" timestamps. The forecast covers the len(test_df) steps
+        after the end of train_df, so test_df must directly follow it (run_modeling_pipeline fits
+        on the training and validation rows).
+        Within run_modeling_pipeline, the budget is also enforced as a hard limit on the candidate.
+
+        Args:
+            time_budget: Wall-clock budget in seconds.
+            model_list: AutoTS model list: a preset name (e.g. "superfast", "fast", "scalable") or a list of model names.
+            ensemble: AutoTS ensemble types (e.g. "simple", "simple,distance"), or None for single models.
+            n_jobs: Processes fitting candidate models (default: all cores).
+            max_generations: Maximum number of generations of the genetic search.
+        """
+        logging.info(f"Training AutoTS model (budget {time_budget:.0f}s, model list {model_list}, ensemble {ensemble})...")
+        with mlflow.start_run(experiment_id=self.experiment_id, run_name="AutoTS") as run:
+            run_id = run.info.run_id
+            model_artifact_path = "autots-model"
+            try:
+                start = time.monotonic()
+                freq = self.grid_freq or pd.infer_freq(train_df.index[:1000]) or "infer"
+                history = train_df[[self.value_col]].astype(np.float64)
+                model = AutoTS(forecast_length=len(test_df), frequency=freq, ensemble=ensemble, model_list=model_list,
+                               max_generations=max_generations, n_jobs=n_jobs or os.cpu_count(),
+                               generation_timeout=time_budget * AUTOTS_GENERATIONS_SHARE / 60, # In minutes
+                               skip_slow_models_seconds=max(1, int(time_budget * AUTOTS_SLOW_MODEL_SHARE)),
+                               random_seed=42, verbose=0)
+                model = fit_within(model, history, time_budget * AUTOTS_FIT_SHARE)
+                search_seconds = time.monotonic() - start
+
+                prediction = model.predict(forecast_length=len(test_df))
+                y_pred = prediction.forecast[self.value_col].to_numpy()
+                y_true = test_df[self.value_col].values
+                metrics = self._evaluate_model(y_true, y_pred)
+
+                mlflow.log_params({"model_type": "AutoTS", "grid_freq": freq, "time_budget": time_budget,
+                                   "model_list": str(model_list), "ensemble": str(ensemble),
+                                   "max_generations": max_generations, "best_model": model.best_model_name,
+                                   "history_rows": len(history), # Kept in the served artifact (see AutoTSForecaster)
+                                   "search_interrupted": bool(getattr(model, "run_was_interrupted", False))})
+                mlflow.log_metrics({**metrics, "search_seconds": search_seconds,
+                                    "training_seconds": time.monotonic() - start})
+
+                # Only the winning template is served; it is refitted on the training history like AutoTS.predict does
+                template = {"Model": model.best_model_name, "ModelParameters": model.best_model_params,
+                            "TransformationParameters": model.best_model_transformation_params}
+                forecaster = AutoTSForecaster(template, history, model.used_frequency, model.prediction_interval)
+                signature_input = pd.DataFrame({"ds": test_df.index})
+                signature_output = pd.DataFrame({"ds": test_df.index, "yhat": y_pred,
+                                                 "yhat_lower": prediction.lower_forecast[self.value_col].to_numpy(),
+                                                 "yhat_upper": prediction.upper_forecast[self.value_col].to_numpy()})
+                signature = infer_signature(signature_input, signature_output)
+                mlflow.pyfunc.log_model(artifact_path=model_artifact_path, python_model=forecaster, signature=signature)
+
+                logging.info(f"AutoTS training complete in {time.monotonic() - start:.1f}s. Best model: {model.best_model_name}.")
+                return metrics, forecaster, f"runs:/{run_id}/{model_artifact_path}"
+            except Exception as e:
+                logging.error(f"Error training AutoTS: {e}", exc_info=True)
+                mlflow.log_param("status", "failed")
+                mlflow.log_param("error", str(e))
+                return None, None, None
+
+    def _arima_differencing(self, y: np.ndarray, m: int) -> tuple[int, int]:
+        """
+        Differencing orders (d, D) of the modelled series, cached in memory and, with a tuning_dir,
+        across runs. The cache is keyed by the series' leading rows and the seasonal period, so it
+        stays valid as new data is appended.
+        """
+        fingerprint = hashlib.sha1(np.ascontiguousarray(y[:ARIMA_FINGERPRINT_ROWS]).tobytes() + str(m).encode()).hexdigest()
+        path = os.path.join(self.tuning_dir, f"{self._study_name()}.arima.json") if self.tuning_dir else None
+        cached = self._arima_tests
+        if cached is None and path and os.path.exists(path):
+            with open(path) as f:
+                cached = json.load(f)
+        if cached and cached.get("fingerprint") == fingerprint:
+            return cached["d"], cached["D"]
+        d, D = differencing_orders(y, m)
+        self._arima_tests = {"fingerprint": fingerprint, "m": m, "d": d, "D": D}
+        if path:
+            with open(path, "w") as f:
+                json.dump(self._arima_tests, f)
+        return d, D
+
+    def _auto_arima_orders(self, train_df, criterion: str = "aic", search_rows: int = AUTO_ARIMA_SEARCH_ROWS,
+                           max_workers: int = None) -> dict:
+        """Runs the stepwise ARIMA order search (see auto_arima) on the training series."""
+        y = train_df[self.value_col].to_numpy(dtype=np.float64)
+        freq = self.grid_freq or (pd.infer_freq(train_df.index[:1000]) if len(train_df) >= 3 else None)
+        m = seasonal_period(freq)
+        d, D = self._arima_differencing(y, m)
+        return auto_arima_order(y[-search_rows:], m, d=d, D=D, criterion=criterion, max_workers=max_workers)
+
+    def train_arima(self, train_df, test_df, order=None, seasonal_order=None, criterion: str = "aic",
+                    search_rows: int = AUTO_ARIMA_SEARCH_ROWS, max_workers: int = None):
+        """
+        Trains and evaluates an ARIMA model.
+
+        If `order` is None, the (seasonal) orders are chosen by a stepwise search that ranks
+        candidates by `criterion` ("aic" or "bic") on the last `search_rows` training rows and fits
+        each step's candidates in up to `max_workers` processes (see auto_arima). The seasonal period
+        follows the grid frequency. The chosen orders are then fitted on the full training data.
+        The model forecasts the len(test_df) steps after the end of train_df, so test_df must directly
+        follow it (run_modeling_pipeline fits on the training and validation rows).
+        """
+        logging.info(f"Training ARIMA model with order {order or 'auto'}...")
+        with mlflow.start_run(experiment_id=self.experiment_id, run_name="ARIMA") as run:
+            run_id = run.info.run_id
+            model_artifact_path = "arima-model"
+            try:
+                if order is None:
+                    search = self._auto_arima_orders(train_df, criterion, search_rows, max_workers)
+                    order, seasonal_order = search["order"], search["seasonal_order"]
+                    mlflow.log_params({"order_search": "stepwise", "criterion": criterion, "search_rows": search_rows})
+                    mlflow.log_metrics({f"search_{criterion}": search["score"], "search_fitted_models": search["fitted_models"]})
+                seasonal_order = tuple(seasonal_order or (0, 0, 0, 0))
+                model = ARIMA(train_df[self.value_col], order=order, seasonal_order=seasonal_order,
+                              trend=arima_trend(order, seasonal_order))
+                model_fit = model.fit()
+
+                y_pred = model_fit.forecast(steps=len(test_df))
+                y_true = test_df[self.value_col].values
+
+                metrics = self._evaluate_model(y_true, np.asarray(y_pred))
+                mlflow.log_params({"model_type": "ARIMA", "order": str(tuple(order)), "seasonal_order": str(seasonal_order)})
+                mlflow.log_metrics(metrics)
+
+                mlflow.statsmodels.log_model(model_fit, artifact_path=model_artifact_path)
+
+                logging.info("ARIMA training complete.")
+                return metrics, model_fit, f"runs:/{run_id}/{model_artifact_path}"
+            except Exception as e:
+                logging.error(f"Error training ARIMA: {e}", exc_info=True)
+                mlflow.log_param("status", "failed")
+                mlflow.log_param("error", str(e))
+                return None, None, None
+
+    def _study_name(self) -> str:
+        """Name of the persisted tuning study of this registered model (and series)."""
+        name = self.registered_model_name + (f"-{self.series_id}" if self.series_id is not None else "")
+        return re.sub(r"[^A-Za-z0-9_.-]", "_", name)
+
+    def _agent_settings(self) -> dict:
+        """Constructor arguments that recreate this agent (e.g. in a worker process)."""
+        return {
+            "processed_data_path": self.processed_data_path,
+            "value_col": self.value_col,
+            "datetime_col": self.datetime_col,
+            "mlflow_tracking_uri": self.mlflow_tracking_uri,
+            "experiment_name": self.experiment_name,
+            "registered_model_name": self.registered_model_name,
+            "dtype_profile": self.dtype_profile,
+            "series_id": self.series_id,
+            "tuning_dir": self.tuning_dir,
+        }
+
+    def run_modeling_pipeline(self, optuna_trials: int = 20, candidates: list = None, selection_metric: str = "MAPE",
+                              time_limit: float = None, max_workers: int = None, test_size: float = 0.2,
+                              validation_size: float = 0.1, optuna_workers: int = 1,
+                              warm_start_trials: int = None, autots_budget: float = None,
+                              autots_model_list=DEFAULT_AUTOTS_MODEL_LIST,
+                              autots_ensemble: str = DEFAULT_AUTOTS_ENSEMBLE) -> tuple[dict, str | None, object]:
+        """
+        Trains the candidate models concurrently, selects the best one and registers it.
+
+        Each candidate is trained in its own worker process (which reloads the processed data and
+        makes the same time-based split) and logs its own MLflow run. The candidate with the best
+        test `selection_metric` is registered under `registered_model_name`.
+
+        Args:
+            optuna_trials: Number of Optuna trials for the LightGBM candidate.
+            candidates: (Optional) Candidate names to train (default: all of MODEL_CANDIDATES; the
+                        OPTIONAL_MODEL_CANDIDATES, i.e. AutoTS, only when listed here).
+            selection_metric: Test metric that selects the best model (one of METRIC_NAMES).
+                              Lower is better, except for HIGHER_IS_BETTER_METRICS.
+            time_limit: (Optional) Wall-clock limit in seconds for each candidate, counted from the
+                        start of its training. A candidate that exceeds it is stopped and counted as failed.
+                        The limit is best-effort: it is delivered as a signal to the candidate's
+                        worker, which kills the processes the candidate started and stops at its next
+                        Python instruction, so a long native call (e.g. one LightGBM or Stan fit) can
+                        overrun it. LightGBM tuning stops starting trials after LIGHTGBM_TUNING_SHARE
+                        of the limit, leaving the rest for its final fit and scoring.
+            max_workers: Maximum number of concurrent candidates (default: one per candidate).
+            test_size: Fraction of the data held out for testing.
+            validation_size: Fraction of the data used for validation (required by LightGBM).
+            optuna_workers: Worker processes running LightGBM tuning trials (see train_lightgbm_with_optuna).
+                            Prophet and ARIMA (including its order search) train single-threaded
+                            unless they are the only concurrent candidate; LightGBM and AutoTS split
+                            the other cores between them, and LightGBM's share is split again
+                            between its trial workers.
+            warm_start_trials: (Optional) LightGBM trials to run when its tuning study is warm-started
+                               (see tuning_dir); `optuna_trials` otherwise.
+            autots_budget: (Optional) Wall-clock budget in seconds of the AutoTS candidate (default:
+                           `time_limit`, or DEFAULT_AUTOTS_BUDGET). It is enforced like `time_limit`.
+            autots_model_list: AutoTS model list (preset name or list of model names, see train_autots).
+            autots_ensemble: AutoTS ensemble types, or None for single models. AutoTS fits its models
+                             in as many processes as its share of the cores (see optuna_workers).
+
+        Returns:
+            A tuple (results, best_model_name, registered_version), where results maps each successful
+            candidate to its test metrics and registered_version is the MLflow ModelVersion.
+            best_model_name and registered_version are None if no candidate succeeded or registration failed.
+        """
+        if self.df is None:
+            logging.error("DataFrame not loaded, cannot run the modeling pipeline.")
+            return {}, None, None
+        candidates = list(candidates or MODEL_CANDIDATES)
+        unknown = [name for name in candidates if name not in MODEL_CANDIDATES + OPTIONAL_MODEL_CANDIDATES]
+        if unknown:
+            logging.error(f"Unknown model candidates {unknown}. Available: {list(MODEL_CANDIDATES + OPTIONAL_MODEL_CANDIDATES)}")
+            return {}, None, None
+        if selection_metric not in METRIC_NAMES:
+            logging.error(f"Unknown selection metric '{selection_metric}'. Available: {list(METRIC_NAMES)}")
+            return {}, None, None
+
+        results, model_uris = {}, {}
+        split_sizes = {"test_size": test_size, "validation_size": validation_size}
+        concurrent = min(max_workers or len(candidates), len(candidates))
+        # Prophet and ARIMA train single-threaded next to other candidates; the remaining cores are split
+        # between the multi-core candidates that run at the same time
+        multi_core = min(concurrent, sum(name in MULTI_CORE_CANDIDATES for name in candidates))
+        candidate_jobs = max(1, ((os.cpu_count() or 1) - (concurrent - multi_core)) // max(multi_core, 1))
+        # Tuning (in every trial worker) stops starting trials after its share of the time limit, so the
+        # refit on train+val and the recursive test forecast still fit within the limit
+        tuning_timeout = time_limit * LIGHTGBM_TUNING_SHARE if time_limit else None
+        lightgbm_options = {"n_workers": optuna_workers, "timeout": tuning_timeout, "warm_start_trials": warm_start_trials,
+                            "n_jobs": candidate_jobs}
+        # The ARIMA order search runs in the candidate's own process next to other candidates
+        arima_options = {"max_workers": candidate_jobs if concurrent == 1 else 1}
+        autots_budget = autots_budget or time_limit or DEFAULT_AUTOTS_BUDGET
+        if time_limit:
+            autots_budget = min(autots_budget, time_limit)
+        # AutoTS's own worker processes use its share of the cores, so its fixed budget is not spent competing with LightGBM
+        autots_options = {"time_budget": autots_budget, "model_list": autots_model_list, "ensemble": autots_ensemble,
+                          "n_jobs": candidate_jobs}
+        logging.info(f"Training {len(candidates)} candidates ({candidates}) with up to {max_workers or len(candidates)} workers...")
+        with ProcessPoolExecutor(max_workers=max_workers or len(candidates)) as executor:
+            futures = {
+                executor.submit(_train_candidate_task, self._agent_settings(), name, split_sizes,
+                                optuna_trials, time_limit, lightgbm_options, autots_options, arima_options): name
+                for name in candidates
+            }
+            for future in as_completed(futures):
+                name = futures[future]
+                try:
+                    metrics, model_uri, elapsed = future.result()
+                except Exception as e:
+                    logging.error(f"Candidate {name} failed: {e}")
+                    continue
+                if metrics is None or model_uri is None:
+                    logging.error(f"Candidate {name} did not produce a logged model.")
+                    continue
+                logging.info(f"Candidate {name} finished in {elapsed:.1f}s: {metrics}")
+                results[name], model_uris[name] = metrics, model_uri
+
+        scored = {name: metrics[selection_metric] for name, metrics in results.items()
+                  if np.isfinite(metrics.get(selection_metric, np.nan))}
+        if not scored:
+            logging.error("No candidate produced a finite selection metric; nothing to register.")
+            return results, None, None
+        pick = max if selection_metric in HIGHER_IS_BETTER_METRICS else min
+        best_model_name = pick(scored, key=scored.get)
+        logging.info(f"Best model by {selection_metric}: {best_model_name} ({scored[best_model_name]:.4f})")
+
+        try:
+            registered_version = mlflow.register_model(model_uris[best_model_name], self.registered_model_name)
+            logging.info(f"Registered {best_model_name} as {registered_version.name} v{registered_version.version}.")
+        except Exception as e:
+            logging.error(f"Error registering model {best_model_name}: {e}")
+            registered_version = None
+        return results, best_model_name, registered_version
+
+    def _backtest_folds(self, horizon: int, step: int, n_folds: int, window: int = None) -> list | None:
+        """Row ranges of rolling-origin folds; the last fold's test window ends at the last row."""
+        total_len = self.store.row_count(self.series_id) if self.store is not None else len(self.df)
+        folds = []
+        for fold in range(n_folds):
+            test_end = total_len - (n_folds - 1 - fold) * step
+            test_start = test_end - horizon
+            train_start = 0 if window is None else max(0, test_start - window)
+            folds.append({"fold": fold, "train_start": train_start, "train_end": test_start,
+                          "test_start": test_start, "test_end": test_end})
+        if folds[0]["train_end"] - folds[0]["train_start"] < horizon:
+            logging.error(f"Not enough data for {n_folds} folds of horizon {horizon} and step {step} ({total_len} rows).")
+            return None
+        return folds
+
+    def _fold_forecast(self, model: str, train_df: pd.DataFrame, test_df: pd.DataFrame, params: dict,
+                       state: dict) -> np.ndarray:
+        """
+        Fits `model` on one backtest fold and forecasts the test rows. `state` carries what the next
+        (consecutive) fold can reuse: the LightGBM bin boundaries, the ARIMA parameter estimates and
+        the Prophet parameters (as initial values for the next fit). ARIMA orders are searched on
+        the first fold unless given in `params`. LightGBM with lag features forecasts the test rows
+        recursively (see lag_features.recursive_forecast), like the other models forecast the horizon.
+        """
+        if model == "LightGBM":
+            features = [col for col in train_df.columns if col != self.value_col]
+            params = {**DEFAULT_BACKTEST_LIGHTGBM_PARAMS, **(params or {})}
+            num_boost_round = params.pop("n_estimators")
+            params.update(LIGHTGBM_FIXED_PARAMS, n_jobs=1)
+            X_train = _float32_matrix([train_df], features)
+            y_train = train_df[self.value_col].to_numpy(dtype=np.float32)
+            if "reference" not in state:
+                train_set = lgb.Dataset(X_train, label=y_train, feature_name=features, params=LIGHTGBM_DATASET_PARAMS)
+                state["reference"] = train_set.construct()
+            else:
+                # The first fold's bin boundaries are reused, so later folds skip the bin search
+                train_set = lgb.Dataset(X_train, label=y_train, reference=state["reference"])
+            booster = lgb.train(params, train_set, num_boost_round=num_boost_round)
+            X_test = _float32_matrix([test_df], features)
+            lag_spec = (self.processed_metadata or {}).get("lag_spec")
+            if lag_spec:
+                # Lags shorter than the horizon must use earlier forecasts, not the fold's actual test values
+                return recursive_forecast(booster.predict, X_test, features, train_df[self.value_col].to_numpy(dtype=np.float64),
+                                          lag_spec, self.value_col)
+            return booster.predict(X_test)
+
+        if model == "ARIMA":
+            params = params or {}
+            if "arima_orders" not in state:
+                if "order" in params:
+                    state["arima_orders"] = (tuple(params["order"]), tuple(params.get("seasonal_order", (0, 0, 0, 0))))
+                else:
+                    # Searched once on the chunk's first fold; later folds keep the orders
+                    search = self._auto_arima_orders(train_df, max_workers=1)
+                    state["arima_orders"] = (search["order"], search["seasonal_order"])
+            order, seasonal_order = state["arima_orders"]
+            arima = ARIMA(train_df[self.value_col].to_numpy(), order=order, seasonal_order=seasonal_order,
+                          trend=arima_trend(order, seasonal_order))
+            # The previous fold's estimates are a close starting point for the optimizer
+            model_fit = arima.fit(start_params=state.get("arima_params"))
+            state["arima_params"] = model_fit.params
+            return np.asarray(model_fit.forecast(steps=len(test_df)))
+
+        prophet_train_df = pd.DataFrame({"ds": train_df.index, "y": train_df[self.value_col].to_numpy()})
+        # Fold scores need point forecasts only; skip the interval simulation unless asked for
+        prophet = Prophet(**{"uncertainty_samples": 0, **(params or {})})
+        if "prophet_params" in state:
+            prophet.fit(prophet_train_df, init=state["prophet_params"])
+        else:
+            prophet.fit(prophet_train_df)
+        state["prophet_params"] = _prophet_init(prophet)
+        return prophet.predict(pd.DataFrame({"ds": test_df.index}))["yhat"].to_numpy()
+
+    def backtest(self, model: str = "LightGBM", horizon: int = 24, step: int = None, n_folds: int = 5,
+                 window: int = None, params: dict = None, max_workers: int = None) -> pd.DataFrame | None:
+        """
+        Rolling-origin backtest of one model family.
+
+        The forecast origin moves forward by `step` rows between folds; each fold trains on the rows
+        before its origin (all of them, or the last `window` rows) and forecasts the next `horizon`
+        rows. The last fold ends at the last row. Folds are split into contiguous chunks that run in
+        parallel worker processes; within a chunk, consecutive folds reuse training state (see
+        `_fold_forecast`). The per-fold metrics are logged to an MLflow run as metric steps and as
+        a CSV table.
+
+        Args:
+            model: Model family to backtest (one of MODEL_CANDIDATES).
+            horizon: Rows forecast by each fold.
+            step: Rows between consecutive origins (default: horizon, i.e. non-overlapping test windows).
+            n_folds: Number of folds.
+            window: (Optional) Length in rows of a sliding training window. Expanding window if None.
+            params: (Optional) Model parameters: LightGBM parameters (default DEFAULT_BACKTEST_LIGHTGBM_PARAMS),
+                    {"order": (p, d, q), "seasonal_order": (P, D, Q, m)} for ARIMA (searched if not given)
+                    or Prophet constructor arguments.
+            max_workers: Maximum number of worker processes (default: one per core, at most one per fold).
+
+        Returns:
+            A DataFrame with one row per fold (row ranges, timestamps and test metrics), or None on failure.
+        """
+        if self.df is None:
+            logging.error("DataFrame not loaded, cannot backtest.")
+            return None
+        if model not in MODEL_CANDIDATES:
+            logging.error(f"Unknown model '{model}'. Available: {list(MODEL_CANDIDATES)}")
+            return None
+        step = step or horizon
+        if horizon < 1 or step < 1 or n_folds < 1:
+            logging.error("horizon, step and n_folds must be positive.")
+            return None
+        folds = self._backtest_folds(horizon, step, n_folds, window)
+        if folds is None:
+            return None
+
+        n_chunks = min(max_workers or os.cpu_count() or 1, n_folds)
+        chunks = [list(chunk) for chunk in np.array_split(np.arange(n_folds), n_chunks)]
+        logging.info(f"Backtesting {model}: {n_folds} folds (horizon {horizon}, step {step}, "
+                     f"{'expanding' if window is None else f'window {window}'}) in {n_chunks} workers...")
+        rows = []
+        with ProcessPoolExecutor(max_workers=n_chunks) as executor:
+            futures = [executor.submit(_backtest_chunk_task, self._agent_settings(), model,
+                                       [folds[i] for i in chunk], params) for chunk in chunks]
+            for future in as_completed(futures):
+                try:
+                    rows.extend(future.result())
+                except Exception as e:
+                    logging.error(f"Backtest folds failed: {e}")
+                    return None
+        rows.sort(key=lambda row: row["fold"])
+        # All folds have `horizon` points, so they are scored together as one folds x horizon batch
+        fold_metrics = compute_metrics(np.stack([row.pop("y_true") for row in rows]),
+                                       np.stack([row.pop("y_pred") for row in rows]))
+        table = pd.DataFrame(rows).assign(**fold_metrics)
+
+        with mlflow.start_run(experiment_id=self.experiment_id, run_name=f"Backtest_{model}"):
+            mlflow.log_params({"model_type": model, "horizon": horizon, "step": step, "n_folds": n_folds,
+                               "window": window if window is not None else "expanding"})
+            for row in table.to_dict("records"):
+                mlflow.log_metrics({f"fold_{name}": row[name] for name in METRIC_NAMES}, step=row["fold"])
+            mlflow.log_metrics({f"mean_{name}": float(table[name].mean()) for name in METRIC_NAMES})
+            mlflow.log_text(table.to_csv(index=False), "backtest_folds.csv")
+        logging.info(f"Backtest of {model} finished. Mean metrics: {table[list(METRIC_NAMES)].mean().to_dict()}")
+        return table
+
+
+def _optuna_storage(storage: str = None):
+    """Optuna storage for an RDB URL or a journal file path (None keeps the study in memory)."""
+    if storage is None or "://" in storage:
+        return storage
+    return JournalStorage(JournalFileBackend(storage))
+
+
+def _optuna_pruner(pruner: str = None):
+    """Optuna pruner by name. Steps are boosting rounds; no trial is pruned before 50 rounds."""
+    if pruner == "median":
+        return optuna.pruners.MedianPruner(n_startup_trials=5, n_warmup_steps=50)
+    if pruner == "hyperband":
+        return optuna.pruners.HyperbandPruner(min_resource=50, max_resource=2000, reduction_factor=3)
+    return optuna.pruners.NopPruner()
+
+
+def _pruning_callback(trial):
+    """
+    LightGBM callback that reports the validation MAE to `trial` every PRUNING_REPORT_INTERVAL
+    rounds and stops training with optuna.TrialPruned if the pruner says so.
+    """
+    def callback(env):
+        step = env.iteration + 1
+        if step % PRUNING_REPORT_INTERVAL or not env.evaluation_result_list:
+            return
+        trial.report(env.evaluation_result_list[0][2], step)
+        if trial.should_prune():
+            raise optuna.TrialPruned(f"Pruned at boosting round {step}.")
+    return callback
+
+
+def _pruning_stats(study, first_trial: int = 0) -> dict:
+    """
+    Counts pruned trials (numbered from `first_trial`) and estimates the time they saved: for each
+    pruned trial, the mean duration of the completed trials minus its own duration.
+    """
+    states = optuna.trial.TrialState
+    def seconds(trials):
+        return [t.duration.total_seconds() for t in trials if t.duration is not None and t.number >= first_trial]
+    completed = seconds(study.get_trials(deepcopy=False, states=(states.COMPLETE,)))
+    pruned = seconds(study.get_trials(deepcopy=False, states=(states.PRUNED,)))
+    mean_completed = np.mean(completed) if completed else 0.0
+    return {
+        "pruned_trials": len(pruned),
+        "completed_trials": len(completed),
+        "pruning_seconds_saved": float(sum(max(mean_completed - d, 0.0) for d in pruned)),
+    }
+
+
+def _float32_matrix(frames: list, features: list) -> np.ndarray:
+    """Stacks the `features` columns of `frames` into one C-contiguous float32 matrix (categoricals as their values)."""
+    matrix = np.empty((sum(len(frame) for frame in frames), len(features)), dtype=np.float32)
+    start = 0
+    for frame in frames:
+        matrix[start:start + len(frame)] = to_plain_dtypes(frame[features]).to_numpy(dtype=np.float32)
+        start += len(frame)
+    return matrix
+
+
+def _lightgbm_datasets(X_train, y_train, X_val, y_val, features: list) -> tuple[lgb.Dataset, lgb.Dataset]:
+    """Bins the training matrix once; the validation set is binned with the same boundaries."""
+    train_set = lgb.Dataset(X_train, label=y_train, feature_name=features, params=LIGHTGBM_DATASET_PARAMS,
+                            free_raw_data=False).construct()
+    val_set = lgb.Dataset(X_val, label=y_val, reference=train_set, free_raw_data=False).construct()
+    return train_set, val_set
+
+
+def _lightgbm_objective(trial, train_set: lgb.Dataset, val_set: lgb.Dataset, n_jobs: int, prune: bool = False) -> float:
+    """Optuna objective: validation MAE (at the early-stopping iteration) of a LightGBM booster with sampled hyperparameters."""
+    params = {
+        **LIGHTGBM_FIXED_PARAMS, "n_jobs": n_jobs,
+        "learning_rate": trial.suggest_float("learning_rate", 1e-3, 0.3, log=True),
+        "num_leaves": trial.suggest_int("num_leaves", 20, 300),
+        "max_depth": trial.suggest_int("max_depth", 3, 12),
+        "feature_fraction": trial.suggest_float("feature_fraction", 0.4, 1.0),
+        "bagging_fraction": trial.suggest_float("bagging_fraction", 0.4, 1.0),
+        "bagging_freq": trial.suggest_int("bagging_freq", 1, 7),
+        "min_child_samples": trial.suggest_int("min_child_samples", 5, 100),
+        "lambda_l1": trial.suggest_float("lambda_l1", 1e-8, 10.0, log=True),
+        "lambda_l2": trial.suggest_float("lambda_l2", 1e-8, 10.0, log=True),
+    }
+    num_boost_round = trial.suggest_int("n_estimators", 100, 2000)
+    booster = lgb.train(params, train_set, num_boost_round=num_boost_round, valid_sets=[val_set],
+                        callbacks=[lgb.early_stopping(100, verbose=False)] + ([_pruning_callback(trial)] if prune else []))
+    return booster.best_score["valid_0"]["l1"]
+
+
+def _optuna_worker_task(storage: str, study_name: str, n_trials: int, X_train, y_train, X_val, y_val,
+                        features: list, n_jobs: int, timeout: float = None, pruner: str = None) -> None:
+    """Runs up to `n_trials` trials of a shared study in a worker process."""
+    # The pruner is not part of the stored study, so each worker recreates it
+    study = optuna.load_study(study_name=study_name, storage=_optuna_storage(storage), pruner=_optuna_pruner(pruner))
+    train_set, val_set = _lightgbm_datasets(X_train, y_train, X_val, y_val, features)
+    study.optimize(partial(_lightgbm_objective, train_set=train_set, val_set=val_set, n_jobs=n_jobs,
+                           prune=pruner is not None),
+                   n_trials=n_trials, timeout=timeout)
+
+
+def _raise_time_limit(signum, frame):
+    # Processes the candidate started (the ARIMA order search pool, Optuna trial workers, AutoTS's
+    # joblib workers) are killed first: they would keep running, and their executors wait for them on exit
+    for child in multiprocessing.active_children():
+        child.kill()
+    raise CandidateTimeLimitExceeded()
+
+
+def _prophet_init(model) -> dict:
+    """Parameters of a fitted Prophet model, in the form `Prophet.fit(init=...)` accepts."""
+    # Scalars are stored as 1x1 arrays, vectors as 1xN (one row per posterior sample; MAP fits have one)
+    init = {name: float(model.params[name][0][0]) for name in ("k", "m", "sigma_obs")}
+    init.update({name: np.asarray(model.params[name][0], dtype=np.float64) for name in ("delta", "beta")})
+    return init
+
+
+def _history_frame(train_df: pd.DataFrame, val_df: pd.DataFrame | None) -> pd.DataFrame:
+    """Training and validation rows together: everything before the test period."""
+    return train_df if val_df is None else pd.concat([train_df, val_df])
+
+
+def _train_candidate_task(agent_settings: dict, candidate: str, split_sizes: dict, optuna_trials: int = 20,
+                          time_limit: float = None, lightgbm_options: dict = None,
+                          autots_options: dict = None, arima_options: dict = None) -> tuple[dict | None, str | None, float]:
+    """
+    Trains one model candidate in a worker process. `lightgbm_options` are passed to train_lightgbm_with_optuna,
+    `autots_options` to train_autots, whose time budget is also the candidate's time limit, and
+    `arima_options` (e.g. the order search's max_workers) to train_arima.
+    Returns its test metrics, model URI and training time; raises on failure so the caller can record it.
+    """
+    agent = ModelingAgent(**agent_settings)
+    if agent.df is None:
+        raise ValueError("Failed to load processed data.")
+    splits = agent._split_data(**split_sizes)
+    if splits is None:
+        raise ValueError("Failed to split data.")
+    train_df, val_df, test_df = splits
+
+    start = time.monotonic()
+    if candidate == "AutoTS" and autots_options and autots_options.get("time_budget"):
+        time_limit = autots_options["time_budget"]
+    if time_limit:
+        # The worker runs the candidate on its main thread, so a timer signal can interrupt it
+        signal.signal(signal.SIGALRM, _raise_time_limit)
+        signal.setitimer(signal.ITIMER_REAL, time_limit)
+    try:
+        # Every candidate is fitted on all rows before the test period (LightGBM refits on train+val itself)
+        if candidate == "Prophet":
+            metrics, _, model_uri = agent.train_prophet(_history_frame(train_df, val_df), test_df)
+        elif candidate == "LightGBM":
+            if val_df is None:
+                raise ValueError("LightGBM requires a validation set (validation_size > 0).")
+            metrics, _, model_uri = agent.train_lightgbm_with_optuna(train_df, val_df, test_df, n_trials=optuna_trials,
+                                                                     **(lightgbm_options or {}))
+        elif candidate == "AutoTS":
+            metrics, _, model_uri = agent.train_autots(_history_frame(train_df, val_df), test_df, **(autots_options or {}))
+        else:
+            metrics, _, model_uri = agent.train_arima(_history_frame(train_df, val_df), test_df, **(arima_options or {}))
+    except CandidateTimeLimitExceeded:
+        raise TimeoutError(f"time limit of {time_limit}s exceeded") from None
+    finally:
+        if time_limit:
+            signal.setitimer(signal.ITIMER_REAL, 0)
+    return metrics, model_uri, time.monotonic() - start
+
+
+def _prophet_series_task(agent_settings: dict, test_size: float = 0.2, warm_start: bool = True,
+                         uncertainty_samples: int = PROPHET_UNCERTAINTY_SAMPLES) -> tuple[dict | None, str | None, float]:
+    """
+    Trains the Prophet model of one series (agent_settings["series_id"]) in a worker process.
+    Returns its test metrics, model URI and training time; raises on failure so the caller can record it.
+    """
+    agent = ModelingAgent(**agent_settings)
+    if agent.df is None:
+        raise ValueError("Failed to load processed data.")
+    splits = agent._split_data(test_size=test_size, validation_size=0)
+    if splits is None:
+        raise ValueError("Failed to split data.")
+    train_df, _, test_df = splits
+    start = time.monotonic()
+    metrics, _, model_uri = agent.train_prophet(train_df, test_df, uncertainty_samples=uncertainty_samples,
+                                                warm_start=warm_start)
+    return metrics, model_uri, time.monotonic() - start
+
+
+def _global_series_task(processed_data_path: str, series_id, series_code: int, value_col: str, features: list,
+                        scaled_features: list, scaling: str, split_sizes: dict, dtype_profile: str = None,
+                        history_rows: int = 0) -> dict:
+    """
+    Loads one series in a worker process and returns its scaled global-model rows: float32 feature
+    matrices and targets per split (test targets in original units), the series scale and the last
+    `history_rows` scaled values before the test rows (the history of a recursive test forecast).
+    Raises on failure so the caller can record it.
+    """
+    df = load_processed_data(processed_data_path, series_id=series_id)
+    if dtype_profile:
+        df = apply_dtype_profile(df, dtype_profile)
+    missing = [col for col in features + [value_col] if col not in df.columns]
+    if missing:
+        raise ValueError(f"Missing columns: {missing}")
+    df = df.sort_index()
+    total_len = len(df)
+    test_start = int(total_len * (1 - split_sizes["test_size"]))
+    val_start = int(total_len * (1 - split_sizes["test_size"] - split_sizes["validation_size"]))
+    if val_start < 1 or test_start <= val_start or total_len <= test_start:
+        raise ValueError(f"Too few rows ({total_len}) for the train/validation/test split.")
+    y = df[value_col].to_numpy(dtype=np.float64)
+    scale = series_scale(y[:val_start], scaling)
+    X = _float32_matrix([to_global_features(df[features], series_code, scale, scaled_features)],
+                        [SERIES_CODE_FEATURE] + features)
+    y_scaled = (y / scale).astype(np.float32)
+    return {"scale": scale,
+            "X_train": X[:val_start], "y_train": y_scaled[:val_start],
+            "X_val": X[val_start:test_start], "y_val": y_scaled[val_start:test_start],
+            "X_test": X[test_start:], "y_test": y[test_start:],
+            "history": y[max(0, test_start - history_rows):test_start] / scale}
+
 
-    def train_arima(self, train_df, test_df, order=(5,1,0)):
-        """Trains and evaluates an ARIMA model."""
-        logging.info(f"Training ARIMA model with order {order}...")
-        with mlflow.start_run(experiment_id=self.experiment_id, 
-(Content truncated due to size limit. Use line ranges to read in chunks)
\ No newline at end of file
+def _backtest_chunk_task(agent_settings: dict, model: str, folds: list, params: dict = None) -> list:
+    """
+    Runs consecutive backtest folds in a worker process, carrying reusable training state from
+    one fold to the next. Returns one row (fold ranges, timestamps, actuals and forecasts) per fold;
+    the caller scores all folds at once.
+    """
+    agent = ModelingAgent(**agent_settings)
+    if agent.df is None:
+        raise ValueError("Failed to load processed data.")
+    state, rows = {}, []
+    for fold in folds:
+        train_df = agent._row_slice(fold["train_start"], fold["train_end"])
+        test_df = agent._row_slice(fold["test_start"], fold["test_end"])
+        start = time.monotonic()
+        y_pred = agent._fold_forecast(model, train_df, test_df, params, state)
+        rows.append({**fold, "origin": test_df.index[0], "test_last": test_df.index[-1],
+                     "fit_seconds": time.monotonic() - start,
+                     "y_true": test_df[agent.value_col].to_numpy(dtype=np.float64), "y_pred": np.asarray(y_pred, dtype=np.float64)})
+    return rows
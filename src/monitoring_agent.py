@@ -2,16 +2,20 @@
 import pandas as pd
 import numpy as np
 import logging
+import os
 from scipy.stats import ks_2samp
 import requests
 import time
 import schedule # For scheduling checks
 import threading
+from agents.processed_data import (is_parquet_path, is_store_path, load_processed_data, processed_row_count, read_processed_tail,
+                                   ProcessedDataStore)
+from agents.data_profile import PROFILE_VERSION, load_profile, profile_path
 
-# Assuming metrics calculation is similar to ModelingAgent
-from sklearn.metrics import mean_absolute_percentage_error, r2_score, mean_absolute_error
+# Same metrics as ModelingAgent
+from agents.forecast_metrics import compute_metrics
 
-logging.basicConfig(level=logging.INFO, format=\"%(asctime)s - %(levelname)s - %(message)s\")
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
 
 # --- Alerting Placeholder ---
 # In a real system, this would integrate with PagerDuty, Slack, Email, etc.
@@ -27,7 +31,10 @@ class MonitoringAgent:
                  prediction_service_url: str = "http://127.0.0.1:5001",
                  drift_threshold: float = 0.05, # p-value threshold for KS test
                  mape_threshold: float = 0.15, # Example threshold for MAPE degradation
-                 check_interval_minutes: int = 60):
+                 check_interval_minutes: int = 60,
+                 reference_window: str = None,
+                 series_id: str = None,
+                 use_profile: bool = True):
         """
         Initializes the Monitoring Agent.
 
@@ -38,6 +45,15 @@ class MonitoringAgent:
             drift_threshold: p-value threshold for the Kolmogorov-Smirnov test for data drift.
             mape_threshold: Threshold for acceptable Mean Absolute Percentage Error.
             check_interval_minutes: How often to run monitoring checks (in minutes).
+            reference_window: (Optional) Only use the most recent part of the training data as the
+                              drift reference, e.g. "90D". From a ProcessedDataStore (.store) only
+                              that window is read from disk. The full history is used if None.
+            series_id: (Optional) Series to monitor in a multi-series store.
+            use_profile: Initialize from the profile sidecar written by DataProcessingAgent (a few KB; the
+                         series' own sidecar if `series_id` is set) instead of loading the training data,
+                         if one exists. The sidecar covers the full history, so it is not used together
+                         with `reference_window`. A profile that no longer matches the data (see
+                         `_profile_matches_data`) is ignored.
         """
         self.training_data_path = training_data_path
         self.value_col = value_col
@@ -45,57 +61,115 @@ class MonitoringAgent:
         self.drift_threshold = drift_threshold
         self.mape_threshold = mape_threshold
         self.check_interval_minutes = check_interval_minutes
-        self.reference_data = self._load_reference_data()
+        self.reference_window = reference_window
+        self.series_id = series_id
+        self.reference_profile = None
+        self.reference_data = None
+        if use_profile and not reference_window:
+            self.reference_profile = load_profile(profile_path(training_data_path, series_id=series_id))
+            if self.reference_profile is not None and not self._profile_matches_data(self.reference_profile):
+                self.reference_profile = None
+        if self.reference_profile is not None:
+            logging.info(f"Loaded reference data profile for {training_data_path} ({self.reference_profile['rows']} rows profiled).")
+        else:
+            self.reference_data = self._load_reference_data()
         self.stop_scheduler = threading.Event()
         self.scheduler_thread = None
 
-        if self.reference_data is None:
+        if self.reference_data is None and self.reference_profile is None:
             logging.error("Failed to load reference training data. Monitoring agent may not function correctly.")
 
         logging.info("MonitoringAgent initialized.")
 
+    def _profile_matches_data(self, profile: dict) -> bool:
+        """
+        Checks that a profile sidecar still describes the training data: its row count must match the
+        Parquet footers (or, for CSV, its last timestamp the data's last row). A stale profile, e.g. one
+        left behind by a writer that appended rows without updating it, is rejected.
+        """
+        try:
+            if profile.get("version") != PROFILE_VERSION:
+                logging.warning(f"Data profile version {profile.get('version')} is not supported; loading the reference data instead.")
+                return False
+            rows = processed_row_count(self.training_data_path, series_id=self.series_id)
+            if rows is not None:
+                matches, found = rows == profile.get("rows"), f"{rows} rows"
+            else:
+                tail = read_processed_tail(self.training_data_path)
+                end = str(tail.index[-1]) if tail is not None and not tail.empty else None
+                matches, found = end == profile.get("end"), f"last timestamp {end}"
+        except Exception as e:
+            logging.warning(f"Could not check the data profile against {self.training_data_path}: {e}")
+            return False
+        if not matches:
+            logging.warning(f"Data profile is stale (it covers {profile.get('rows')} rows up to {profile.get('end')}, "
+                            f"the data has {found}); loading the reference data instead.")
+        return matches
+
     def _load_reference_data(self) -> pd.DataFrame | None:
         """Loads the reference training data."""
         try:
-            df = pd.read_csv(self.training_data_path)
+            if is_store_path(self.training_data_path):
+                store = ProcessedDataStore(self.training_data_path)
+                start = None
+                if self.reference_window:
+                    bounds = store.bounds(self.series_id)
+                    start = bounds[1] - pd.Timedelta(self.reference_window) if bounds else None
+                df = store.query(start=start, series_id=self.series_id)
+            else:
+                if is_parquet_path(self.training_data_path):
+                    df = load_processed_data(self.training_data_path, series_id=self.series_id)
+                else:
+                    df = pd.read_csv(self.training_data_path)
+                if self.reference_window and isinstance(df.index, pd.DatetimeIndex) and not df.empty:
+                    df = df.loc[df.index[-1] - pd.Timedelta(self.reference_window):]
             logging.info(f"Loaded reference training data from {self.training_data_path}. Shape: {df.shape}")
             return df
         except Exception as e:
             logging.error(f"Error loading reference data from {self.training_data_path}: {e}")
             return None
 
+    def _reference_columns(self) -> list:
+        if self.reference_profile is not None:
+            return [col for col, stats in self.reference_profile["columns"].items() if stats.get("count")]
+        return list(self.reference_data.columns) if self.reference_data is not None else []
+
     def check_data_drift(self, current_data: pd.DataFrame, column: str) -> bool:
         """
         Checks for data drift in a specific column using the KS test.
-        Triggers an alert if drift is detected.
+        Triggers an alert if drift is detected. With a reference profile, the test runs against
+        its sorted sample of the column (evenly spaced order statistics of the training data).
         """
         # ... (previous checks for data availability remain the same)
-        if self.reference_data is None or column not in self.reference_data.columns:
-            logging.error(f"Reference data or column \'{column}\' not available for drift check.")
+        if column not in self._reference_columns():
+            logging.error(f"Reference data or column '{column}' not available for drift check.")
             return False
         if current_data is None or column not in current_data.columns:
-            logging.error(f"Current data or column \'{column}\' not available for drift check.")
+            logging.error(f"Current data or column '{column}' not available for drift check.")
             return False
 
-        reference_col_data = self.reference_data[column].dropna()
+        if self.reference_profile is not None:
+            reference_col_data = np.asarray(self.reference_profile["columns"][column]["sample"])
+        else:
+            reference_col_data = self.reference_data[column].dropna()
         current_col_data = current_data[column].dropna()
 
         if len(reference_col_data) < 2 or len(current_col_data) < 2:
-            logging.warning(f"Not enough data points in column \'{column}\' for KS test.")
+            logging.warning(f"Not enough data points in column '{column}' for KS test.")
             return False
 
         try:
             ks_statistic, p_value = ks_2samp(reference_col_data, current_col_data)
-            logging.info(f"Data drift check for column \'{column}\': KS Statistic={ks_statistic:.4f}, p-value={p_value:.4f}")
+            logging.info(f"Data drift check for column '{column}': KS Statistic={ks_statistic:.4f}, p-value={p_value:.4f}")
             
             if p_value < self.drift_threshold:
-                alert_msg = f"Data drift detected in column \'{column}\' (p-value: {p_value:.4f} < threshold: {self.drift_threshold})"
+                alert_msg = f"Data drift detected in column '{column}' (p-value: {p_value:.4f} < threshold: {self.drift_threshold})"
                 trigger_alert(severity="warning", component="Data Drift", message=alert_msg)
                 return True # Drift detected
             else:
                 return False # No significant drift detected
         except Exception as e:
-            logging.error(f"Error during KS test for column \'{column}\': {e}")
+            logging.error(f"Error during KS test for column '{column}': {e}")
             return False
 
     def check_model_performance(self, recent_predictions: pd.Series, recent_actuals: pd.Series) -> bool:
@@ -112,13 +186,9 @@ class MonitoringAgent:
             return False
 
         try:
-            mask = recent_actuals != 0
-            if np.sum(mask) == 0:
-                 mape = 0.0 if np.allclose(recent_predictions, 0) else float(\"inf\")
-            else:
-                 mape = mean_absolute_percentage_error(recent_actuals[mask], recent_predictions[mask])
-            
-            logging.info(f"Model performance check: Current MAPE = {mape:.4f}")
+            metrics = compute_metrics(np.asarray(recent_actuals), np.asarray(recent_predictions))
+            mape = metrics["MAPE"]
+            logging.info(f"Model performance check: Current MAPE = {mape:.4f} (all metrics: {metrics})")
 
             if mape > self.mape_threshold:
                 alert_msg = f"Model performance degradation detected! Current MAPE ({mape:.4f}) exceeds threshold ({self.mape_threshold})"
@@ -159,8 +229,9 @@ class MonitoringAgent:
         is_healthy = self.check_system_health()
         
         # 2. Data Drift
-        if current_data is not None and self.reference_data is not None:
-            columns_to_check = [self.value_col] + [col for col in [\"hour\", \"dayofweek\"] if col in self.reference_data.columns and col in current_data.columns]
+        reference_columns = self._reference_columns()
+        if current_data is not None and reference_columns:
+            columns_to_check = [self.value_col] + [col for col in ["hour", "dayofweek"] if col in reference_columns and col in current_data.columns]
             drift_detected = False
             for col in columns_to_check:
                 if self.check_data_drift(current_data, col):
@@ -221,25 +292,26 @@ class MonitoringAgent:
             logging.info("Scheduler not running.")
 
 # Example Usage (Conceptual)
-if __name__ == \"__main__\":
-    train_data_file = \"/home/ubuntu/load_forecasting_agents/data/processed/processed_dummy_load_data_v2.csv\"
+if __name__ == "__main__":
+    train_data_file = "/home/ubuntu/load_forecasting_agents/data/processed/processed_dummy_load_data_v2.parquet"
     service_url = "http://127.0.0.1:5001"
 
     if not os.path.exists(train_data_file):
         print(f"Error: Training data file not found at {train_data_file}")
     else:
-        monitor_agent = MonitoringAgent(training_data_path=train_data_file, value_col=\"load_kw\", prediction_service_url=service_url, check_interval_minutes=1)
+        monitor_agent = MonitoringAgent(training_data_path=train_data_file, value_col="load_kw", prediction_service_url=service_url, check_interval_minutes=1)
         
-        if monitor_agent.reference_data is not None:
+        if monitor_agent.reference_data is not None or monitor_agent.reference_profile is not None:
             print("Monitoring Agent initialized with alerting.")
             
             print("\n--- Running Manual Checks (Simulation) ---")
-            dummy_current_data = monitor_agent.reference_data.tail(5).copy()
+            recent_reference = read_processed_tail(train_data_file, n_rows=5)
+            dummy_current_data = recent_reference.copy()
             # Simulate drift by adding noise
             dummy_current_data[monitor_agent.value_col] += np.random.normal(0, 50, size=len(dummy_current_data))
             # Simulate performance degradation
             dummy_preds = dummy_current_data[monitor_agent.value_col] * 1.5 # Significant error
-            dummy_actuals = monitor_agent.reference_data.tail(5)[monitor_agent.value_col] # Use original values as actuals
+            dummy_actuals = recent_reference[monitor_agent.value_col] # Use original values as actuals
             
             monitor_agent.run_monitoring_checks(current_data=dummy_current_data, 
                                                 recent_predictions=dummy_preds, 
@@ -0,0 +1,138 @@
+# /home/ubuntu/load_forecasting_agents/agents/outliers.py
+import pandas as pd
+import numpy as np
+import logging
+from numpy.lib.stride_tricks import sliding_window_view
+
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+
+DEFAULT_OUTLIER_WINDOW = 7 # Rows in the centred window; short enough that daily seasonality does not inflate the MAD
+MEDIAN_BLOCK_ROWS = 1 << 20 # Windows materialized at once by the rolling median
+DEFAULT_OUTLIER_SIGMAS = 3.0
+MAD_TO_SIGMA = 1.4826 # Scales the median absolute deviation to a standard deviation for normal data
+# Floor of a window's robust deviation, as a fraction of the whole series' one: flat windows have a MAD of 0
+MIN_SCALE_FRACTION = 0.1
+SCALE_SAMPLE_SIZE = 10_000 # Values per chunk of a stream sampled to estimate the series' robust deviation up front
+OUTLIER_REPAIRS = ("median", "interpolate", "clip", "drop", "flag")
+
+
+def rolling_median_mad(x: np.ndarray, window: int) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Centred rolling median and median absolute deviation (about that median) over an odd `window`.
+    Windows at the edges shrink to the available rows.
+
+    Interior windows are taken as a strided view and both medians are selected with np.partition,
+    processed in blocks of MEDIAN_BLOCK_ROWS windows to bound memory.
+    """
+    half = window // 2
+    n = len(x)
+    median = np.empty(n)
+    mad = np.empty(n)
+    for start in range(0, max(n - window + 1, 0), MEDIAN_BLOCK_ROWS):
+        windows = sliding_window_view(x[start:start + MEDIAN_BLOCK_ROWS + window - 1], window)
+        centre = slice(start + half, start + half + len(windows))
+        median[centre] = np.partition(windows, half, axis=1)[:, half]
+        mad[centre] = np.partition(np.abs(windows - median[centre, None]), half, axis=1)[:, half]
+    # Rows within `half` of either end (all rows, for series shorter than the window) see truncated windows
+    edges = np.unique(np.r_[0:min(half, n), max(n - half, 0):n]) if n >= window else np.arange(n)
+    for i in edges:
+        values = x[max(0, i - half):i + half + 1]
+        median[i] = np.median(values)
+        mad[i] = np.median(np.abs(values - median[i]))
+    return median, mad
+
+
+def robust_scale(values) -> float:
+    """Robust standard deviation (scaled MAD) of a series, or its standard deviation if the MAD is 0."""
+    x = np.asarray(values, dtype=np.float64)
+    if len(x) == 0:
+        return 0.0
+    scale = MAD_TO_SIGMA * np.median(np.abs(x - np.median(x)))
+    return float(scale if scale > 0 else x.std())
+
+
+def hampel_filter(values, window: int = DEFAULT_OUTLIER_WINDOW, n_sigmas: float = DEFAULT_OUTLIER_SIGMAS,
+                  context=None, lookahead=None, scale: float = None) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Hampel outlier test with rolling medians.
+
+    A point is an outlier if it deviates from the median of the centred `window` around it by more
+    than `n_sigmas` robust standard deviations, where the robust deviation is the median absolute
+    deviation (MAD) of the window scaled by 1.4826. Both are computed over strided window views
+    (see `rolling_median_mad`), so there is no per-point Python loop. The window's deviation is
+    floored at MIN_SCALE_FRACTION of the series' robust deviation (its standard deviation if that
+    is 0 too), so a window of repeated values does not flag every small change as an outlier.
+
+    A series tested piece by piece (e.g. a stream) gets the same result as in one pass if every
+    piece is given the raw values around it as `context` and `lookahead`, and the same `scale`.
+
+    Args:
+        values: 1-D array of values (no NaNs).
+        window: Size of the centred window in rows (odd).
+        n_sigmas: Threshold in robust standard deviations.
+        context: (Optional) Values immediately preceding `values` (e.g. the previous chunk), used
+                 to fill the windows at the start. Only `values` are tested.
+        lookahead: (Optional) Values immediately following `values` (e.g. the start of the next
+                   chunk), used to fill the windows at the end. They are not tested either.
+        scale: (Optional) Robust deviation of the whole series (see `robust_scale`), for the
+               floor. Computed from the context, values and lookahead if None.
+
+    Returns:
+        (is_outlier, rolling_median, threshold) arrays aligned with `values`.
+    """
+    if window < 3 or window % 2 == 0:
+        raise ValueError("The outlier window must be an odd number of rows >= 3.")
+    context = np.asarray(context if context is not None else [], dtype=np.float64)[-window:]
+    lookahead = np.asarray(lookahead if lookahead is not None else [], dtype=np.float64)[:window]
+    values = np.asarray(values, dtype=np.float64)
+    x = np.concatenate((context, values, lookahead))
+    median, mad = rolling_median_mad(x, window)
+    series_scale = robust_scale(x) if scale is None else scale
+    threshold = n_sigmas * np.maximum(MAD_TO_SIGMA * mad, MIN_SCALE_FRACTION * series_scale)
+    is_outlier = np.abs(x - median) > threshold
+    tested = slice(len(context), len(context) + len(values))
+    return is_outlier[tested], median[tested], threshold[tested]
+
+
+def repair_outliers(df: pd.DataFrame, value_col: str, repair: str, window: int = DEFAULT_OUTLIER_WINDOW,
+                    n_sigmas: float = DEFAULT_OUTLIER_SIGMAS, context=None, lookahead=None,
+                    scale: float = None) -> tuple[pd.DataFrame, int]:
+    """
+    Detects outliers in `value_col` with `hampel_filter` (`context`, `lookahead` and `scale` are
+    passed on) and repairs them.
+
+    Repairs:
+        "median": replace by the rolling median.
+        "interpolate": replace by linear interpolation between the neighbouring inliers.
+        "clip": clip to the rolling median +/- threshold.
+        "drop": remove the rows.
+        "flag": keep the values and only count them.
+
+    Returns:
+        The repaired frame and the number of flagged points.
+    """
+    if repair not in OUTLIER_REPAIRS:
+        raise ValueError(f"Unknown outlier repair '{repair}'. Available: {list(OUTLIER_REPAIRS)}")
+    values = df[value_col].to_numpy(dtype=np.float64)
+    is_outlier, median, threshold = hampel_filter(values, window, n_sigmas, context, lookahead, scale)
+    n_flagged = int(is_outlier.sum())
+    if n_flagged == 0 or repair == "flag":
+        return df, n_flagged
+
+    if repair == "drop":
+        return df[~is_outlier], n_flagged
+    repaired = values.copy()
+    if repair == "median":
+        repaired[is_outlier] = median[is_outlier]
+    elif repair == "clip":
+        repaired = np.clip(repaired, median - threshold, median + threshold)
+    elif repair == "interpolate":
+        inliers = np.flatnonzero(~is_outlier)
+        if len(inliers) == 0:
+            repaired = median
+        else:
+            outliers = np.flatnonzero(is_outlier)
+            repaired[outliers] = np.interp(outliers, inliers, values[inliers])
+    df = df.copy()
+    df[value_col] = repaired
+    return df, n_flagged
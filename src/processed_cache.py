@@ -0,0 +1,105 @@
+# /home/ubuntu/load_forecasting_agents/agents/processed_cache.py
+import pandas as pd
+import hashlib
+import json
+import logging
+import os
+from agents.processed_data import save_processed_data, load_processed_data
+
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+
+DEFAULT_CACHE_MAX_BYTES = 2 * 1024 ** 3 # 2 GiB
+HASH_BLOCK_BYTES = 1024 * 1024
+
+
+def hash_file(path: str) -> str:
+    """Returns the SHA-256 hex digest of a file's bytes, read in fixed-size blocks."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(HASH_BLOCK_BYTES), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class ProcessedDataCache:
+    """
+    Content-addressed on-disk cache of processed frames.
+
+    Entries are keyed on the hash of the raw input bytes plus the processing parameters
+    (column names, feature-engineering version, ...) and stored as Parquet files. The cache
+    is bounded by total size on disk; the least recently used entries (by file mtime, which
+    is refreshed on every hit) are evicted first.
+    """
+
+    def __init__(self, cache_dir: str, max_bytes: int = DEFAULT_CACHE_MAX_BYTES):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    @staticmethod
+    def make_key(source_path: str, params: dict) -> str:
+        """Builds a cache key from the raw file contents and the processing parameters."""
+        digest = hashlib.sha256()
+        digest.update(hash_file(source_path).encode())
+        digest.update(json.dumps(params, sort_keys=True, default=str).encode())
+        return digest.hexdigest()
+
+    def path_for(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f"{key}.parquet")
+
+    def get(self, key: str) -> pd.DataFrame | None:
+        """Returns the cached frame for `key`, or None on a miss."""
+        path = self.path_for(key)
+        if not os.path.exists(path):
+            return None
+        try:
+            df = load_processed_data(path)
+            os.utime(path) # Mark as recently used
+            logging.info(f"Processed data cache hit: {key[:12]}")
+            return df
+        except Exception as e:
+            logging.warning(f"Could not read cache entry {path}, discarding it: {e}")
+            self._remove(path)
+            return None
+
+    def put(self, key: str, df: pd.DataFrame, metadata: dict = None) -> str | None:
+        """Stores `df` (and its processing metadata) under `key` and evicts old entries if the cache is over its size limit."""
+        path = self.path_for(key)
+        partial_path = os.path.join(self.cache_dir, f"partial_{key}.parquet")
+        try:
+            save_processed_data(df, partial_path, metadata=metadata)
+            os.replace(partial_path, path)
+        except Exception as e:
+            logging.warning(f"Could not write cache entry {path}: {e}")
+            self._remove(partial_path)
+            return None
+        logging.info(f"Stored processed data in cache: {key[:12]}")
+        self._evict()
+        return path
+
+    def _evict(self):
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            if not name.endswith(".parquet") or name.startswith("partial_"):
+                continue
+            path = os.path.join(self.cache_dir, name)
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+
+        total_bytes = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total_bytes <= self.max_bytes:
+                break
+            self._remove(path)
+            total_bytes -= size
+            logging.info(f"Evicted processed data cache entry: {os.path.basename(path)}")
+
+    @staticmethod
+    def _remove(path: str):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
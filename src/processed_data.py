@@ -0,0 +1,447 @@
+# /home/ubuntu/load_forecasting_agents/agents/processed_data.py
+import pandas as pd
+import numpy as np
+import io
+import json
+import logging
+import os
+import shutil
+from datetime import datetime
+import pyarrow as pa
+import pyarrow.parquet as pq
+from agents.dtype_profiles import apply_dtype_profile
+
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+
+# Processed data is handed between agents as Parquet by default. The DatetimeIndex and column
+# dtypes are stored in the file schema, so readers never re-parse timestamps from text.
+PROCESSED_FORMAT = "parquet"
+PARQUET_EXTENSIONS = (".parquet", ".pq")
+# Partition key of multi-series datasets (one hive-style directory per series)
+SERIES_PARTITION_COL = "series_id"
+# Schema metadata key under which processing metadata (JSON) is stored in Parquet files
+METADATA_KEY = b"afp.processing"
+# Directories with this extension are ProcessedDataStores (Parquet parts partitioned by series and month)
+STORE_EXTENSION = ".store"
+MONTH_PARTITION_COL = "month"
+DEFAULT_SERIES_ID = "default"
+
+
+def is_parquet_path(path: str) -> bool:
+    """Returns True if the path refers to Parquet processed data (a file, dataset directory or store)."""
+    return os.path.splitext(path)[1].lower() in PARQUET_EXTENSIONS or is_store_path(path)
+
+
+def is_store_path(path: str) -> bool:
+    """Returns True if the path refers to a ProcessedDataStore."""
+    return os.path.splitext(os.path.normpath(path))[1].lower() == STORE_EXTENSION
+
+
+def processed_filename(name: str, fmt: str = PROCESSED_FORMAT) -> str:
+    """Builds the default processed-data filename for a dataset name."""
+    extension = "parquet" if fmt == "parquet" else "csv"
+    return f"processed_{name}.{extension}"
+
+
+def _to_table(df: pd.DataFrame, metadata: dict = None) -> pa.Table:
+    """Converts a processed frame to Arrow, attaching processing metadata to the schema."""
+    table = pa.Table.from_pandas(df, preserve_index=True)
+    if metadata:
+        schema_metadata = dict(table.schema.metadata or {})
+        schema_metadata[METADATA_KEY] = json.dumps(metadata, default=str).encode()
+        table = table.replace_schema_metadata(schema_metadata)
+    return table
+
+
+def read_processed_metadata(path: str, series_id=None) -> dict:
+    """
+    Returns the processing metadata (e.g. the lag feature spec) stored with a Parquet
+    processed dataset, or an empty dict if there is none (CSV files carry no metadata).
+    With a `series_id`, the metadata of that series' partition is read.
+    """
+    if not is_parquet_path(path):
+        return {}
+    if series_id is not None:
+        path = series_partition_path(path, series_id)
+    if not os.path.exists(path):
+        return {}
+    if os.path.isdir(path):
+        part_files = sorted(os.path.join(root, name) for root, _, names in os.walk(path)
+                            for name in names if is_parquet_path(name))
+        if not part_files:
+            return {}
+        path = part_files[-1]
+    return _schema_processing_metadata(pq.read_schema(path, memory_map=True))
+
+
+def _schema_processing_metadata(schema: pa.Schema) -> dict:
+    schema_metadata = schema.metadata or {}
+    if METADATA_KEY not in schema_metadata:
+        return {}
+    return json.loads(schema_metadata[METADATA_KEY])
+
+
+def save_processed_data(df: pd.DataFrame, path: str, metadata: dict = None) -> None:
+    """
+    Saves a processed frame. Parquet paths keep the DatetimeIndex and typed columns, plus
+    optional processing `metadata`; any other extension falls back to CSV for backwards compatibility.
+    """
+    if is_store_path(path):
+        store = ProcessedDataStore(path)
+        store.clear()
+        store.write(df, metadata=metadata)
+    elif is_parquet_path(path):
+        if os.path.isdir(path): # Replace a dataset that was previously appended to
+            shutil.rmtree(path)
+        pq.write_table(_to_table(df, metadata), path)
+    else:
+        df.to_csv(path)
+
+
+def load_processed_data(path: str, columns: list = None, series_id=None) -> pd.DataFrame:
+    """
+    Loads a processed frame written by `save_processed_data` or `append_processed_data`.
+
+    Parquet files (or directories of Parquet parts) are memory mapped and come back with their
+    DatetimeIndex and dtypes intact; the dtype profile recorded at processing time is re-applied for
+    types Parquet does not keep (e.g. categorical flags). CSV files are parsed with the first column
+    as the datetime index.
+
+    Args:
+        path: Path to the processed data file or Parquet dataset directory.
+        columns: (Optional) Subset of columns to read. Only applies to Parquet files.
+        series_id: (Optional) Series to read from a series-partitioned dataset directory or store.
+    """
+    if is_store_path(path):
+        return ProcessedDataStore(path).query(series_id=series_id, columns=columns)
+    if is_parquet_path(path):
+        if series_id is not None:
+            path = series_partition_path(path, series_id)
+        table = pq.read_table(path, columns=columns, memory_map=True)
+        df = _table_to_frame(table)
+        return df.sort_index() if os.path.isdir(path) else df
+    df = pd.read_csv(path, index_col=0)
+    df.index = pd.to_datetime(df.index)
+    return df
+
+
+def _table_to_frame(table: pa.Table) -> pd.DataFrame:
+    df = table.to_pandas()
+    return apply_dtype_profile(df, _schema_processing_metadata(table.schema).get("dtype_profile", "standard"))
+
+
+def _part_paths(path: str) -> list:
+    """Sorted part files of a Parquet dataset directory (part names sort chronologically)."""
+    return sorted(os.path.join(path, name) for name in os.listdir(path)
+                  if name.startswith("part-") and is_parquet_path(name))
+
+
+def _part_filename(df: pd.DataFrame) -> str:
+    return f"part-{df.index[0]:%Y%m%d%H%M%S%f}-{df.index[-1]:%Y%m%d%H%M%S%f}.parquet"
+
+
+def read_processed_tail(path: str, n_rows: int = 1) -> pd.DataFrame | None:
+    """
+    Reads (up to) the last `n_rows` rows of a processed dataset without loading all of it.
+
+    Parquet reads only the trailing row groups (of the trailing part files, for dataset
+    directories) and applies the stored dtype profile like `load_processed_data`; CSV reads
+    only the trailing bytes of the file. Returns None if the dataset does not exist or is empty.
+    """
+    if not os.path.exists(path):
+        return None
+    if is_store_path(path):
+        return ProcessedDataStore(path).tail(n_rows)
+    if is_parquet_path(path):
+        parts = _part_paths(path) if os.path.isdir(path) else [path]
+        frames = []
+        rows = 0
+        for part in reversed(parts):
+            parquet_file = pq.ParquetFile(part, memory_map=True)
+            for row_group in reversed(range(parquet_file.num_row_groups)):
+                frames.insert(0, _table_to_frame(parquet_file.read_row_group(row_group, use_pandas_metadata=True)))
+                rows += len(frames[0])
+                if rows >= n_rows:
+                    break
+            if rows >= n_rows:
+                break
+        if not frames:
+            return None
+        return pd.concat(frames).tail(n_rows)
+
+    with open(path, "rb") as f:
+        header = f.readline()
+        f.seek(0, os.SEEK_END)
+        file_size = f.tell()
+        block_size = 64 * 1024
+        while True:
+            offset = max(len(header), file_size - block_size)
+            f.seek(offset)
+            lines = f.read().splitlines()
+            # The first line of the block may be partial unless the block starts right after the header
+            complete_lines = lines if offset == len(header) else lines[1:]
+            if len(complete_lines) >= n_rows or offset == len(header):
+                break
+            block_size *= 2
+    if not complete_lines:
+        return None
+    df = pd.read_csv(io.BytesIO(header + b"\n".join(complete_lines[-n_rows:]) + b"\n"), index_col=0)
+    df.index = pd.to_datetime(df.index)
+    return df
+
+
+def processed_row_count(path: str, series_id=None) -> int | None:
+    """
+    Number of rows of a Parquet dataset or ProcessedDataStore, from the Parquet footers only.
+    Returns None for CSV files, whose rows cannot be counted without reading them.
+    """
+    if is_store_path(path):
+        return ProcessedDataStore(path).row_count(series_id)
+    if not is_parquet_path(path):
+        return None
+    if series_id is not None:
+        path = series_partition_path(path, series_id)
+    parts = _part_paths(path) if os.path.isdir(path) else [path]
+    return sum(pq.ParquetFile(part, memory_map=True).metadata.num_rows for part in parts)
+
+
+def append_processed_data(df: pd.DataFrame, path: str, metadata: dict = None) -> None:
+    """
+    Appends processed rows to an existing dataset in time proportional to the new rows.
+
+    CSV files are appended in place. Parquet datasets are stored as a directory of part files
+    and each append adds a new part; a single-file Parquet dataset is converted (by rename, not
+    rewrite) into a directory dataset the first time it is appended to.
+    """
+    if df.empty:
+        return
+    if is_store_path(path):
+        ProcessedDataStore(path).write(df, metadata=metadata)
+        return
+    if not is_parquet_path(path):
+        write_header = not os.path.exists(path) or os.path.getsize(path) == 0
+        with open(path, "a", newline="") as f:
+            df.to_csv(f, header=write_header)
+        return
+
+    if os.path.isfile(path):
+        staging_path = f"{path}.converting"
+        os.replace(path, staging_path)
+        os.makedirs(path)
+        os.replace(staging_path, os.path.join(path, f"part-{0:020d}-{0:020d}.parquet"))
+        logging.info(f"Converted {path} to a Parquet dataset directory for incremental appends.")
+    os.makedirs(path, exist_ok=True)
+    pq.write_table(_to_table(df, metadata), os.path.join(path, _part_filename(df)))
+
+
+def series_partition_path(dataset_path: str, series_id) -> str:
+    """Directory of one series inside a series-partitioned (hive-style) Parquet dataset."""
+    safe_id = str(series_id).replace(os.sep, "_").replace("=", "_")
+    return os.path.join(dataset_path, f"{SERIES_PARTITION_COL}={safe_id}")
+
+
+def write_series_partition(df: pd.DataFrame, dataset_path: str, series_id, metadata: dict = None) -> str:
+    """
+    Writes one series' processed rows as its own partition of a Parquet dataset directory
+    (or ProcessedDataStore), replacing any previous output for that series. Returns the partition directory.
+    """
+    partition_path = series_partition_path(dataset_path, series_id)
+    if os.path.isdir(partition_path):
+        shutil.rmtree(partition_path)
+    if is_store_path(dataset_path):
+        ProcessedDataStore(dataset_path).write(df, series_id=series_id, metadata=metadata)
+        return partition_path
+    os.makedirs(partition_path)
+    pq.write_table(_to_table(df, metadata), os.path.join(partition_path, _part_filename(df)))
+    return partition_path
+
+
+class ProcessedDataWriter:
+    """
+    Incrementally appends processed chunks to a single file. Parquet output is written one
+    row group per chunk; CSV output is appended with the header written once. Stores get
+    one part per chunk and month.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.rows_written = 0
+        self._parquet_writer = None
+        self._csv_file = None
+
+    def write(self, df: pd.DataFrame, metadata: dict = None) -> None:
+        """Writes a chunk. `metadata` is stored in the Parquet schema when the first chunk is written."""
+        if is_store_path(self.path):
+            ProcessedDataStore(self.path).write(df, metadata=metadata)
+        elif is_parquet_path(self.path):
+            table = _to_table(df, metadata if self._parquet_writer is None else None)
+            if self._parquet_writer is None:
+                self._parquet_writer = pq.ParquetWriter(self.path, table.schema)
+            self._parquet_writer.write_table(table)
+        else:
+            if self._csv_file is None:
+                self._csv_file = open(self.path, "w", newline="")
+            df.to_csv(self._csv_file, header=self.rows_written == 0)
+        self.rows_written += len(df)
+
+    def close(self) -> None:
+        if self._parquet_writer is not None:
+            self._parquet_writer.close()
+            self._parquet_writer = None
+        if self._csv_file is not None:
+            self._csv_file.close()
+            self._csv_file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
+
+
+class ProcessedDataStore:
+    """
+    Out-of-core processed data store: Parquet part files partitioned by series and month
+    (`<root>/series_id=<id>/month=YYYY-MM/part-<first>-<last>.parquet`).
+
+    Writes append new parts, so existing data is never rewritten. Queries prune partitions by
+    series and month from the directory names, skip parts whose time span (encoded in the file
+    name) misses the requested range and push the remaining date predicate down to the Parquet
+    row-group statistics, so only the slices that are needed are read.
+    """
+
+    def __init__(self, root: str):
+        self.root = root
+
+    def clear(self) -> None:
+        """Removes all data from the store."""
+        if os.path.isdir(self.root):
+            shutil.rmtree(self.root)
+
+    def _series_dir(self, series_id) -> str:
+        return series_partition_path(self.root, DEFAULT_SERIES_ID if series_id is None else series_id)
+
+    def write(self, df: pd.DataFrame, series_id=None, metadata: dict = None) -> int:
+        """Appends processed rows (sorted by time) as one part per month. Returns the number of rows written."""
+        if df.empty:
+            return 0
+        series_dir = self._series_dir(series_id)
+        month_keys = df.index.year.to_numpy() * 12 + df.index.month.to_numpy() - 1
+        boundaries = np.concatenate(([0], np.flatnonzero(np.diff(month_keys)) + 1, [len(df)]))
+        for start, end in zip(boundaries[:-1], boundaries[1:]):
+            df_month = df.iloc[start:end]
+            month_dir = os.path.join(series_dir, f"{MONTH_PARTITION_COL}={df_month.index[0]:%Y-%m}")
+            os.makedirs(month_dir, exist_ok=True)
+            pq.write_table(_to_table(df_month, metadata), os.path.join(month_dir, _part_filename(df_month)))
+        return len(df)
+
+    def series_ids(self) -> list:
+        """Ids of the series in the store."""
+        if not os.path.isdir(self.root):
+            return []
+        prefix = f"{SERIES_PARTITION_COL}="
+        return sorted(name[len(prefix):] for name in os.listdir(self.root) if name.startswith(prefix))
+
+    @staticmethod
+    def _part_span(name: str) -> tuple[pd.Timestamp, pd.Timestamp]:
+        first, last = os.path.splitext(name)[0].split("-")[1:3]
+        return (pd.Timestamp(datetime.strptime(first, "%Y%m%d%H%M%S%f")),
+                pd.Timestamp(datetime.strptime(last, "%Y%m%d%H%M%S%f")))
+
+    def parts(self, series_id=None, start=None, end=None) -> list:
+        """Part files of a series that may hold rows in [start, end], in chronological order."""
+        series_dir = self._series_dir(series_id)
+        if not os.path.isdir(series_dir):
+            return []
+        start = pd.Timestamp(start) if start is not None else None
+        end = pd.Timestamp(end) if end is not None else None
+        prefix = f"{MONTH_PARTITION_COL}="
+        selected = []
+        for month_name in sorted(os.listdir(series_dir)):
+            if not month_name.startswith(prefix):
+                continue
+            month = pd.Period(month_name[len(prefix):], freq="M")
+            if (start is not None and month.end_time < start) or (end is not None and month.start_time > end):
+                continue
+            month_dir = os.path.join(series_dir, month_name)
+            for part in _part_paths(month_dir):
+                first, last = self._part_span(os.path.basename(part))
+                if (start is not None and last < start) or (end is not None and first > end):
+                    continue
+                selected.append((first, part))
+        return [part for _, part in sorted(selected)]
+
+    def bounds(self, series_id=None) -> tuple[pd.Timestamp, pd.Timestamp] | None:
+        """First and last timestamp of a series, from part file names only (no data is read)."""
+        spans = [self._part_span(os.path.basename(part)) for part in self.parts(series_id)]
+        if not spans:
+            return None
+        return min(first for first, _ in spans), max(last for _, last in spans)
+
+    def row_count(self, series_id=None) -> int:
+        """Number of rows of a series, from the Parquet footers."""
+        return sum(pq.ParquetFile(part, memory_map=True).metadata.num_rows for part in self.parts(series_id))
+
+    def empty_frame(self, series_id=None) -> pd.DataFrame:
+        """Zero-row frame with the columns, dtypes and index of a series, read from the Parquet schema only."""
+        parts = self.parts(series_id)
+        if not parts:
+            return pd.DataFrame()
+        return _table_to_frame(pq.read_schema(parts[0], memory_map=True).empty_table())
+
+    def metadata(self, series_id=None) -> dict:
+        """Processing metadata of the most recently written part of a series."""
+        parts = self.parts(series_id)
+        return read_processed_metadata(parts[-1]) if parts else {}
+
+    def query(self, start=None, end=None, series_id=None, columns: list = None) -> pd.DataFrame:
+        """
+        Loads the rows of a series with start <= timestamp <= end (either bound may be None).
+
+        Args:
+            start: (Optional) First timestamp to include.
+            end: (Optional) Last timestamp to include.
+            series_id: (Optional) Series to read. Defaults to the series written without an id.
+            columns: (Optional) Subset of columns to read; the datetime index is always included.
+        """
+        parts = self.parts(series_id, start, end)
+        if not parts:
+            return pd.DataFrame()
+        index_name = pq.read_schema(parts[0], memory_map=True).pandas_metadata["index_columns"][0]
+        filters = []
+        if start is not None:
+            filters.append((index_name, ">=", pd.Timestamp(start).to_pydatetime()))
+        if end is not None:
+            filters.append((index_name, "<=", pd.Timestamp(end).to_pydatetime()))
+        read_columns = None if columns is None else list(columns) + [index_name]
+        tables = [pq.read_table(part, columns=read_columns, filters=filters or None, memory_map=True) for part in parts]
+        return _table_to_frame(pa.concat_tables(tables))
+
+    def tail(self, n_rows: int, series_id=None) -> pd.DataFrame | None:
+        """Reads (up to) the last `n_rows` rows of a series from its trailing parts."""
+        frames, rows = [], 0
+        for part in reversed(self.parts(series_id)):
+            frames.insert(0, _table_to_frame(pq.read_table(part, memory_map=True)))
+            rows += len(frames[0])
+            if rows >= n_rows:
+                break
+        if not frames:
+            return None
+        return pd.concat(frames).tail(n_rows)
+
+    def timestamp_at(self, position: int, series_id=None) -> pd.Timestamp:
+        """
+        Timestamp of the row at `position` (0-based, in time order) of a series. Row counts come
+        from the Parquet footers, so only the index column of the part holding the row is read.
+        """
+        if position < 0:
+            raise IndexError("Row position out of range of the store.")
+        for part in self.parts(series_id):
+            parquet_file = pq.ParquetFile(part, memory_map=True)
+            num_rows = parquet_file.metadata.num_rows
+            if position < num_rows:
+                index_name = parquet_file.schema_arrow.pandas_metadata["index_columns"][0]
+                return pd.Timestamp(parquet_file.read(columns=[index_name]).column(0)[position].as_py())
+            position -= num_rows
+        raise IndexError("Row position out of range of the store.")
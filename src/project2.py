@@ -20,10 +20,14 @@ if original_agents_path not in sys.path:
 try:
     from agents.data_processing_agent import DataProcessingAgent
     from agents.modeling_agent import ModelingAgent
+    from agents.processed_data import processed_filename, read_processed_metadata
+    from agents.lag_features import AUTO_LAG_SPEC
 except ImportError as e:
     logging.error(f"Could not import agents: {e}. Ensure {original_agents_path} is correct and contains the agent files.")
     # Define dummy classes if import fails to allow app to run
     class DataProcessingAgent:
+        def __init__(self, *args, **kwargs):
+            pass
         def process_data(*args, **kwargs):
             logging.error("DataProcessingAgent not loaded.")
             return None
@@ -34,6 +38,11 @@ except ImportError as e:
         def run_modeling_pipeline(*args, **kwargs):
             logging.error("ModelingAgent not loaded.")
             return {}, None, None
+    def processed_filename(name, fmt="parquet"):
+        return f"processed_{name}.{fmt}"
+    def read_processed_metadata(path, series_id=None):
+        return {}
+    AUTO_LAG_SPEC = None
 
 project_bp = Blueprint("project_bp", __name__)
 
@@ -41,10 +50,14 @@ project_bp = Blueprint("project_bp", __name__)
 UPLOAD_FOLDER = os.path.join(os.path.dirname(os.path.dirname(__file__)), "uploads")
 RESULTS_FOLDER = os.path.join(os.path.dirname(os.path.dirname(__file__)), "results")
 SAMPLE_DATA_FOLDER = os.path.join(os.path.dirname(os.path.dirname(__file__)), "sample_data")
+PROCESSED_CACHE_FOLDER = os.path.join(os.path.dirname(os.path.dirname(__file__)), "cache", "processed")
+TUNING_STUDIES_FOLDER = os.path.join(os.path.dirname(os.path.dirname(__file__)), "cache", "tuning")
 
 os.makedirs(UPLOAD_FOLDER, exist_ok=True)
 os.makedirs(RESULTS_FOLDER, exist_ok=True)
 os.makedirs(SAMPLE_DATA_FOLDER, exist_ok=True)
+os.makedirs(PROCESSED_CACHE_FOLDER, exist_ok=True)
+os.makedirs(TUNING_STUDIES_FOLDER, exist_ok=True)
 
 # TODO: Add some sample CSV files to SAMPLE_DATA_FOLDER
 # Example: Create a dummy sample file
@@ -259,20 +272,35 @@ def execute_ml_pipeline(project_id, app):
 
         logging.info(f"[Thread-{project_id}] Starting data processing.")
         try:
-            data_processor = DataProcessingAgent()
-            # Define output path for processed data
-            processed_filename = f"processed_{secure_filename(project.name)}_{project.id}.csv"
-            processed_output_path = os.path.join(UPLOAD_FOLDER, processed_filename) # Store processed data near raw
+            # Store processed data near raw; reruns on unchanged raw data are served from the cache.
+            # The series is resampled onto the grid of the requested forecast granularity, and its lags
+            # and rolling windows are scaled to that grid (a day of hourly rows, a week of daily rows, ...).
+            data_processor = DataProcessingAgent(raw_data_dir=UPLOAD_FOLDER, processed_data_dir=UPLOAD_FOLDER,
+                                                 cache_dir=PROCESSED_CACHE_FOLDER, lag_spec=AUTO_LAG_SPEC,
+                                                 resample_freq=project.forecast_granularity or "infer")
+            # Define output path for processed data (Parquet, shared with the modeling agent)
+            processed_output_filename = processed_filename(f"{secure_filename(project.name)}_{project.id}")
+            processed_output_path = os.path.join(UPLOAD_FOLDER, processed_output_filename)
             
             # Get column names from project model (assuming they were added)
             datetime_col = getattr(project, "datetime_col_name", "timestamp")
             value_col = getattr(project, "value_col_name", "load_kw")
 
+            # Reuse the datetime format of the project's previous run (kept in its processed-data metadata),
+            # so repeat uploads skip detection; a new file in another format falls back to per-value parsing
+            previous_metadata = {}
+            if os.path.exists(processed_output_path):
+                try:
+                    previous_metadata = read_processed_metadata(processed_output_path)
+                except Exception as e:
+                    logging.warning(f"[Thread-{project_id}] Could not read the previous processed metadata: {e}")
+
             processed_df = data_processor.process_data(
                 source_path=project.raw_data_path,
                 datetime_col=datetime_col,
                 value_col=value_col,
-                output_path=processed_output_path # Pass full path
+                output_filename=processed_output_filename,
+                datetime_format=previous_metadata.get("datetime_format")
             )
             
             if processed_df is None:
@@ -302,6 +330,7 @@ def execute_ml_pipeline(project_id, app):
                 processed_data_path=project.processed_data_path,
                 value_col=value_col, # Use the value col name stored in project
                 registered_model_name=registered_model_name,
+                tuning_dir=TUNING_STUDIES_FOLDER, # Retrains of the project warm-start from its earlier tuning
                 # mlflow_tracking_uri=mlflow_tracking_uri # Optional
             )
             
@@ -346,5 +375,18 @@ def get_results(project_id):
     if not project:
         return jsonify({"error": "Project not found or access denied"}), 404
     
-    if project.status != "Ready
-(Content truncated due to size limit. Use line ranges to read in chunks)
\ No newline at end of file
+    if project.status != "Ready":
+        return jsonify({"error": f"Results not available while project status is {project.status}"}), 400
+
+    results = {
+        "project_id": project.id,
+        "status": project.status,
+        "best_model_name": project.best_model_name,
+        "mlflow_run_id": project.mlflow_run_id,
+        "processed_data_path": project.processed_data_path,
+        "forecast_result_path": project.forecast_result_path,
+        "forecast_horizon": project.forecast_horizon,
+        "forecast_granularity": project.forecast_granularity,
+        "target_unit": project.target_unit
+    }
+    return jsonify(results), 200
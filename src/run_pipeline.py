@@ -13,7 +13,7 @@ from agents.modeling_agent import ModelingAgent
 from agents.monitoring_agent import MonitoringAgent
 # ModelDeploymentAgent is run separately to start the server
 
-logging.basicConfig(level=logging.INFO, format=\"%(asctime)s - %(levelname)s - %(message)s\")
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
 
 def run_end_to_end_validation():
     logging.info("--- Starting End-to-End Pipeline Validation ---")
@@ -24,14 +24,14 @@ def run_end_to_end_validation():
     raw_data_source = "/home/ubuntu/load_forecasting_agents/data/raw/dummy_load_data_v2.csv" # Use the dummy data
     datetime_col = "timestamp"
     value_col = "load_kw"
-    processed_data_output = "/home/ubuntu/load_forecasting_agents/data/processed/processed_dummy_validation.csv"
+    processed_data_output = "/home/ubuntu/load_forecasting_agents/data/processed/processed_dummy_validation.parquet"
     registered_model_name = "ValidationLoadForecaster"
     prediction_service_url = "http://127.0.0.1:5001" # Default port used in deployment agent
     optuna_trials = 5 # Keep low for validation speed
 
     # --- 1. Data Processing ---
     logging.info("--- Stage 1: Data Processing ---")
-    data_processor = DataProcessingAgent()
+    data_processor = DataProcessingAgent(resample_freq="infer")
     processed_df = data_processor.process_data(
         source_path=raw_data_source, 
         datetime_col=datetime_col, 
@@ -65,13 +65,13 @@ def run_end_to_end_validation():
         logging.info(f"Test Metrics for {best_model_name}: {final_metrics}")
         # Check if metrics meet basic criteria (e.g., R2 > 0)
         if final_metrics and final_metrics.get("R2_Score", -1) < 0:
-             logging.warning(f"Best model {best_model_name} has poor R2 score: {final_metrics.get(\"R2_Score\")}")
+             logging.warning(f"Best model {best_model_name} has poor R2 score: {final_metrics.get('R2_Score')}")
              # Decide if this constitutes failure
              # overall_success = False 
 
     # --- 3. Deployment (Run as separate process) ---
     logging.info("--- Stage 3: Deployment (Assumed Running) ---")
-    logging.info(f"Please ensure the ModelDeploymentAgent server is running for model \'{registered_model_name}\' on {prediction_service_url}")
+    logging.info(f"Please ensure the ModelDeploymentAgent server is running for model '{registered_model_name}' on {prediction_service_url}")
     logging.info("Waiting 10 seconds for server to potentially start...")
     time.sleep(10) # Give time for manual start or background process
 
@@ -82,7 +82,7 @@ def run_end_to_end_validation():
         value_col=value_col,
         prediction_service_url=prediction_service_url
     )
-    if monitor.reference_data is None:
+    if monitor.reference_data is None and monitor.reference_profile is None:
         logging.warning("Monitoring agent could not load reference data. Checks will be limited.")
     
     # Perform checks (simulate recent data using last few points of processed data)
@@ -105,10 +105,11 @@ def run_end_to_end_validation():
 
         prediction_payload = None
         if processed_df is not None:
-            if model_type == "prophet":
+            if model_type in ("prophet", "python_function"): # AutoTS is served as a pyfunc taking "ds" timestamps
                 last_date = processed_df.index.max()
-                freq = pd.infer_freq(processed_df.index) or \'H\' # Default to Hourly if inference fails
-                future_dates = pd.date_range(start=last_date + pd.Timedelta(hours=1), periods=5, freq=freq)
+                # Grid recorded by the data processor; inference only if the data was not resampled
+                freq = data_processor.grid_freq or pd.infer_freq(processed_df.index) or 'h' # Default to Hourly if inference fails
+                future_dates = pd.date_range(start=last_date, periods=6, freq=freq)[1:]
                 prediction_payload = {"ds": [d.isoformat() for d in future_dates]}
             elif model_type == "lightgbm":
                 last_features = processed_df.drop(columns=[value_col]).tail(1).to_dict(orient="records")[0]
@@ -152,17 +153,17 @@ if __name__ == "__main__":
          # Make slightly more data for better validation
          num_records = 96 # 4 days of hourly data
          base_data = {
-            \"load_kw\": [100 + 20 * np.sin(i / (24/ (2*np.pi))) + np.random.normal(0,5) for i in range(num_records)],
-            \"other_col\": [\"val\"] * num_records
+            "load_kw": [100 + 20 * np.sin(i / (24/ (2*np.pi))) + np.random.normal(0,5) for i in range(num_records)],
+            "other_col": ["val"] * num_records
          }
          dummy_df = pd.DataFrame(base_data)
-         dummy_df[\"timestamp\"] = pd.date_range(start=\"2023-01-01\", periods=len(dummy_df), freq=\"H\")
+         dummy_df["timestamp"] = pd.date_range(start="2023-01-01", periods=len(dummy_df), freq="H")
          # Introduce some NaNs and duplicates
          nan_indices = np.random.choice(dummy_df.index, size=5, replace=False)
-         dummy_df.loc[nan_indices, \"load_kw\"] = np.nan
+         dummy_df.loc[nan_indices, "load_kw"] = np.nan
          dup_indices = np.random.choice(dummy_df.index[:num_records//2], size=2, replace=False)
          dummy_df = pd.concat([dummy_df, dummy_df.loc[dup_indices]])
-         dummy_df = dummy_df.sort_values(by=\"timestamp\").reset_index(drop=True)
+         dummy_df = dummy_df.sort_values(by="timestamp").reset_index(drop=True)
 
          os.makedirs(os.path.dirname(dummy_data_path), exist_ok=True)
          dummy_df.to_csv(dummy_data_path, index=False)
@@ -186,9 +187,9 @@ if __name__ == "__main__":
     
     if metrics:
         print("\nBest Model Metrics (on Test Set):")
-        print(f"  MAPE: {metrics.get(\"MAPE\", \"N/A\"):.4f}")
-        print(f"  MAE:  {metrics.get(\"MAE\", \"N/A\"):.4f}")
-        print(f"  R2:   {metrics.get(\"R2_Score\", \"N/A\"):.4f}")
+        print(f"  MAPE: {metrics.get('MAPE', float('nan')):.4f}")
+        print(f"  MAE:  {metrics.get('MAE', float('nan')):.4f}")
+        print(f"  R2:   {metrics.get('R2_Score', float('nan')):.4f}")
     else:
         print("\nMetrics for the best model are not available (modeling may have failed).")
 
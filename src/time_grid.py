@@ -0,0 +1,132 @@
+# /home/ubuntu/load_forecasting_agents/agents/time_grid.py
+import pandas as pd
+import numpy as np
+import logging
+from pandas.tseries.frequencies import to_offset
+from pandas.tseries.offsets import Tick
+
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+
+# Project forecast granularities (as offered by the web app) mapped to pandas offset aliases
+GRANULARITY_FREQS = {
+    "15min": "15min",
+    "30min": "30min",
+    "hourly": "h",
+    "daily": "D",
+    "weekly": "W-MON",
+    "monthly": "MS",
+    "yearly": "YS",
+}
+RESAMPLE_AGGREGATIONS = ("mean", "sum", "min", "max", "median", "first", "last")
+DEFAULT_MAX_GAP = 3 # Longest run of missing grid slots that is interpolated
+
+
+def granularity_to_freq(granularity: str) -> str | None:
+    """
+    Maps a project forecast granularity ("Hourly", "Daily", ...) or a pandas offset alias
+    ("15min", "h") to a canonical offset alias. Returns None if the value is not recognised.
+    """
+    if not granularity:
+        return None
+    freq = GRANULARITY_FREQS.get(str(granularity).strip().lower(), granularity)
+    try:
+        return to_offset(freq).freqstr
+    except ValueError:
+        logging.warning(f"Unrecognised forecast granularity '{granularity}'.")
+        return None
+
+
+def infer_grid_freq(index: pd.DatetimeIndex) -> str | None:
+    """
+    Infers the grid frequency of a sorted index from its median spacing, so that a few
+    gaps or irregular stamps do not defeat the inference (unlike `pd.infer_freq`).
+    The spacing is rounded to whole minutes (or seconds, below a minute) to absorb clock jitter.
+    """
+    if len(index) < 2:
+        return None
+    step = pd.Series(index).diff().median()
+    if pd.isna(step):
+        return None
+    step = step.round("min") if step >= pd.Timedelta(minutes=1) else step.round("s")
+    if step <= pd.Timedelta(0):
+        return None
+    return to_offset(step).freqstr
+
+
+def _resample(obj, freq: str):
+    """
+    Resamples into left-closed intervals labelled by their start. Fixed frequencies are aligned to
+    the epoch (rather than the first timestamp) so that separately processed parts of a series share the same grid.
+    """
+    if isinstance(to_offset(freq), Tick):
+        return obj.resample(freq, closed="left", label="left", origin="epoch")
+    return obj.resample(freq, closed="left", label="left")
+
+
+def grid_label(timestamp: pd.Timestamp, freq: str) -> pd.Timestamp:
+    """Returns the label of the grid interval that contains `timestamp`."""
+    return _resample(pd.Series([0], index=pd.DatetimeIndex([timestamp])), freq).sum().index[0]
+
+
+def regularize(df: pd.DataFrame, value_col: str, freq: str, agg: str = "mean", max_gap: int = DEFAULT_MAX_GAP,
+               anchor: pd.Series = None) -> pd.DataFrame:
+    """
+    Puts a sorted, cleaned series on a regular time grid.
+
+    Readings are aggregated into `freq` intervals labelled by their start. Runs of up to
+    `max_gap` empty intervals are filled by linear interpolation; longer runs are dropped, so
+    they are not bridged with made-up values.
+
+    Args:
+        df: Frame indexed by a sorted DatetimeIndex with `value_col`.
+        value_col: Name of the value column.
+        freq: Pandas offset alias of the target grid.
+        agg: Aggregation applied within each interval (one of RESAMPLE_AGGREGATIONS).
+        max_gap: Longest run of empty intervals that is interpolated.
+        anchor: (Optional) Last regularized row preceding `df` (a Series named by its timestamp), used to
+                interpolate across the boundary with already processed data. Readings that fall into
+                the anchor's interval (or earlier) are dropped since that interval is already final.
+
+    Returns:
+        The regularized frame with only `value_col`.
+    """
+    if agg not in RESAMPLE_AGGREGATIONS:
+        raise ValueError(f"Unknown resample aggregation '{agg}'. Available: {list(RESAMPLE_AGGREGATIONS)}")
+    values = df[[value_col]]
+    if anchor is not None:
+        next_label = anchor.name + to_offset(freq)
+        settled = values.index < next_label
+        if settled.any():
+            logging.warning(f"Dropped {int(settled.sum())} readings in grid intervals up to {anchor.name}, which are already processed.")
+            values = values[~settled]
+        values = pd.concat([anchor.to_frame().T[[value_col]].astype(values.dtypes), values])
+    if values.empty:
+        return values
+
+    resampler = _resample(values, freq)
+    # Empty intervals must come out as NaN so they are treated as gaps (plain sum() gives 0)
+    grid = resampler.sum(min_count=1) if agg == "sum" else getattr(resampler, agg)()
+
+    y = grid[value_col].to_numpy(dtype=np.float64, copy=True)
+    missing = np.isnan(y)
+    if missing.any():
+        known = np.flatnonzero(~missing)
+        gaps = np.flatnonzero(missing)
+        # Each missing slot lies between two known slots; the run length is their distance minus one
+        right = np.searchsorted(known, gaps)
+        inside = (right > 0) & (right < len(known))
+        run_length = np.full(len(gaps), np.iinfo(np.int64).max)
+        run_length[inside] = known[right[inside]] - known[right[inside] - 1] - 1
+        fillable = run_length <= max_gap
+        y[gaps[fillable]] = np.interp(gaps[fillable], known, y[known])
+        grid[value_col] = y
+        unfilled = int((~fillable).sum())
+        logging.info(f"Interpolated {int(fillable.sum())} missing grid intervals (gaps of up to {max_gap}).")
+        if unfilled:
+            logging.warning(f"Dropped {unfilled} grid intervals in gaps longer than {max_gap} intervals.")
+            grid = grid[~np.isnan(y)]
+
+    if anchor is not None:
+        grid = grid.iloc[1:]
+    grid.index.name = df.index.name
+    return grid
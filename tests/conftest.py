@@ -0,0 +1,11 @@
+import os
+import sys
+import types
+
+# The agent modules in src/ import each other as the `agents` package (their deployed location).
+# Map that package onto src/ without running src/__init__.py, which builds the Flask app.
+SRC_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src")
+if "agents" not in sys.modules:
+    agents = types.ModuleType("agents")
+    agents.__path__ = [SRC_DIR]
+    sys.modules["agents"] = agents
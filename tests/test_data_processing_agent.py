@@ -0,0 +1,85 @@
+import os
+import shutil
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from agents.data_processing_agent import DataProcessingAgent
+
+LAG_SPEC = {"lags": [1, 2], "rolling_windows": [3], "rolling_stats": ["mean", "max"], "same_hour_last_week": False}
+
+
+def _write_raw(path, n=50):
+    timestamps = pd.date_range("2023-01-01", periods=n, freq="h").strftime("%Y-%m-%d %H:%M:%S").tolist()
+    values = [f"{100 + i % 7}" for i in range(n)]
+    values[0] = "" # Leading NaN: back filled
+    values[9] = "n/a" # Malformed cells become NaN and are forward filled
+    values[10] = "-"
+    values[23] = ""
+    timestamps[30] = timestamps[29] # Duplicate timestamp: the first row is kept
+    pd.DataFrame({"timestamp": timestamps, "load": values}).to_csv(path, index=False)
+
+
+def _agent(tmp_path, name, **settings):
+    return DataProcessingAgent(raw_data_dir=str(tmp_path / name / "raw"), processed_data_dir=str(tmp_path / name),
+                               **settings)
+
+
+@pytest.mark.parametrize("chunksize", [1, 4, 11, 1000])
+@pytest.mark.parametrize("settings", [{}, {"lag_spec": LAG_SPEC}], ids=["plain", "lags"])
+def test_streaming_matches_in_memory(tmp_path, chunksize, settings):
+    raw_path = tmp_path / "raw.csv"
+    _write_raw(raw_path)
+    expected = _agent(tmp_path, "single", **settings).process_data(str(raw_path), "timestamp", "load",
+                                                                   output_filename="out.parquet")
+    streamed = _agent(tmp_path, "streamed", **settings)
+    path = streamed.process_data_streaming(str(raw_path), "timestamp", "load", output_filename="out.parquet",
+                                           chunksize=chunksize)
+    assert path is not None
+    assert streamed.datetime_format == "%Y-%m-%d %H:%M:%S"
+    result = pd.read_parquet(path)
+    pd.testing.assert_frame_equal(result, expected, check_freq=False)
+    assert result["load"].dtype == np.float64
+    assert not result["load"].isna().any()
+
+
+def test_incremental_append_ignores_stored_rows_and_keeps_agent_settings(tmp_path):
+    index = pd.date_range("2023-01-01", periods=60, freq="h")
+    raw = pd.DataFrame({"timestamp": index.strftime("%Y-%m-%d %H:%M:%S"), "load": 100.0 + np.arange(60) % 5})
+    raw_path = tmp_path / "first.csv"
+    raw.iloc[:40].to_csv(raw_path, index=False)
+    builder = _agent(tmp_path, "first", outlier_repair="median", outlier_window=5, dtype_profile="compact")
+    builder.process_data(str(raw_path), "timestamp", "load", output_filename="out.parquet")
+    processed_path = str(tmp_path / "first" / "out.parquet")
+    clean_path = str(tmp_path / "clean.parquet")
+    shutil.copytree(processed_path, clean_path) if os.path.isdir(processed_path) else shutil.copyfile(processed_path, clean_path)
+
+    # Rows already stored (here with a spike) must not change the new rows, e.g. by forward filling them
+    raw.loc[40, "load"] = np.nan
+    overlapping = raw.iloc[35:].copy()
+    overlapping.loc[39, "load"] = 10_000.0
+    appender = _agent(tmp_path, "appender")
+    appended = appender.process_incremental(overlapping, processed_path, "timestamp", "load")
+    expected = _agent(tmp_path, "clean").process_incremental(raw.iloc[40:].copy(), clean_path, "timestamp", "load")
+    pd.testing.assert_frame_equal(appended, expected)
+    assert len(appended) == 20
+
+    assert appender.outlier_repair is None and appender.dtype_profile == "standard"
+    assert appender.outlier_window != 5 and appender.outlier_scale is None
+
+
+@pytest.mark.parametrize("layout", ["compact", "epoch"])
+def test_stale_datetime_format_is_replaced_by_the_detected_one(tmp_path, layout):
+    index = pd.date_range("2023-03-01", periods=30, freq="h")
+    timestamps = index.strftime("%Y%m%d%H%M") if layout == "compact" else index.as_unit("s").asi8
+    raw_path = tmp_path / "raw.csv"
+    pd.DataFrame({"timestamp": timestamps, "load": np.arange(30.0)}).to_csv(raw_path, index=False)
+
+    expected = _agent(tmp_path, "fresh").process_data(str(raw_path), "timestamp", "load", output_filename="out.parquet")
+    stale = _agent(tmp_path, "stale")
+    result = stale.process_data(str(raw_path), "timestamp", "load", output_filename="out.parquet",
+                                datetime_format="%Y-%m-%d %H:%M:%S")
+    pd.testing.assert_frame_equal(result, expected)
+    assert result.index[0] == index[0]
+    assert stale.datetime_format == ("%Y%m%d%H%M" if layout == "compact" else "epoch_s")
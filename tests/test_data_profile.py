@@ -0,0 +1,85 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from agents.data_profile import ProfileBuilder, build_profile, merge_profiles
+from agents.dtype_profiles import apply_dtype_profile
+from agents.processed_data import append_processed_data, load_processed_data, read_processed_tail, save_processed_data
+
+EXACT_STATS = ("count", "missing", "min", "max")
+
+
+def _frame(n=500, seed=0):
+    rng = np.random.default_rng(seed)
+    index = pd.date_range("2023-01-01", periods=n, freq="h")
+    index = index.delete([100, 101, 102, 300]) # Two gaps: 3 and 1 missing intervals
+    values = rng.gamma(4.0, 25.0, len(index))
+    values[[10, 20]] = np.nan
+    return pd.DataFrame({"load": values, "hour": index.hour.astype(np.int32)}, index=index)
+
+
+@pytest.mark.parametrize("split", [1, 101, 250, 495])
+def test_merged_profile_keeps_exact_counts_and_moments(split):
+    df = _frame()
+    columns = ["load", "hour"]
+    whole = build_profile(df, columns, grid_freq="h", cleaning_stats={"missing_values": 2, "outliers": 3})
+    merged = merge_profiles(build_profile(df.iloc[:split], columns, grid_freq="h", cleaning_stats={"missing_values": 2}),
+                            build_profile(df.iloc[split:], columns, grid_freq="h", cleaning_stats={"outliers": 3}))
+    assert merged["approximate"] is True
+    for key in ("rows", "start", "end", "cleaning"):
+        assert merged[key] == whole[key]
+    # Gaps inside either part and at the boundary between them are all counted
+    for key in ("step", "gaps", "missing_intervals", "longest_gap"):
+        assert merged["gaps"][key] == whole["gaps"][key]
+    for col in columns:
+        for key in EXACT_STATS:
+            assert merged["columns"][col][key] == whole["columns"][col][key]
+        assert merged["columns"][col]["mean"] == pytest.approx(whole["columns"][col]["mean"])
+        assert merged["columns"][col]["std"] == pytest.approx(whole["columns"][col]["std"])
+        assert sum(merged["columns"][col]["histogram"]["counts"]) == whole["columns"][col]["count"]
+        np.testing.assert_allclose(merged["columns"][col]["quantiles"], whole["columns"][col]["quantiles"],
+                                   atol=0.05 * (whole["columns"][col]["max"] - whole["columns"][col]["min"]))
+
+
+def test_merge_with_an_empty_profile_returns_the_other():
+    df = _frame()
+    profile = build_profile(df, ["load"], grid_freq="h")
+    empty = build_profile(df.iloc[:0], ["load"], grid_freq="h")
+    assert merge_profiles(profile, empty) == profile
+    assert merge_profiles(empty, profile) == profile
+
+
+@pytest.mark.parametrize("chunk", [1, 7, 100, 1000])
+def test_profile_builder_matches_build_profile_within_the_reservoir(chunk):
+    df = _frame()
+    columns = ["load", "hour"]
+    builder = ProfileBuilder(columns, grid_freq="h")
+    for start in range(0, len(df), chunk):
+        builder.update(df.iloc[start:start + chunk])
+    built = builder.profile(cleaning_stats={"missing_values": 2})
+    expected = build_profile(df, columns, grid_freq="h", cleaning_stats={"missing_values": 2})
+    assert "approximate" not in built
+    assert built["rows"] == expected["rows"] and built["gaps"] == expected["gaps"]
+    assert built["start"] == expected["start"] and built["end"] == expected["end"]
+    for col in columns:
+        for key in ("count", "missing", "min", "max", "quantiles", "histogram", "sample"):
+            np.testing.assert_allclose(np.asarray(built["columns"][col][key] if key != "histogram"
+                                                  else built["columns"][col][key]["counts"], dtype=np.float64),
+                                       np.asarray(expected["columns"][col][key] if key != "histogram"
+                                                  else expected["columns"][col][key]["counts"], dtype=np.float64))
+        assert built["columns"][col]["mean"] == pytest.approx(expected["columns"][col]["mean"])
+        assert built["columns"][col]["std"] == pytest.approx(expected["columns"][col]["std"])
+
+
+@pytest.mark.parametrize("profile", ["standard", "compact"])
+def test_processed_tail_has_the_dtypes_of_the_loaded_data(tmp_path, profile):
+    df = _frame().ffill()
+    df["is_holiday"] = (df.index.dayofyear == 1).astype(np.int64) # The tail has no holidays
+    df = apply_dtype_profile(df, profile)
+    path = str(tmp_path / "processed.parquet")
+    save_processed_data(df.iloc[:300], path, metadata={"dtype_profile": profile})
+    append_processed_data(df.iloc[300:], path, metadata={"dtype_profile": profile})
+    tail = read_processed_tail(path, n_rows=5)
+    loaded = load_processed_data(path)
+    assert tail.dtypes.to_dict() == loaded.dtypes.to_dict() == df.dtypes.to_dict()
+    pd.testing.assert_frame_equal(tail, loaded.tail(5), check_freq=False)
@@ -0,0 +1,77 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from agents.datetime_parsing import detect_datetime_format, parse_datetimes, _parse_fixed_width
+
+TIMESTAMPS = pd.Series(pd.to_datetime(["2023-01-01 00:00:00", "2023-02-28 13:05:09", "2024-02-29 23:59:59",
+                                       "1999-12-31 12:30:00", "2023-11-05 01:00:00"]))
+
+
+@pytest.mark.parametrize("fmt", [
+    "%Y-%m-%d %H:%M:%S",
+    "%Y-%m-%dT%H:%M:%S",
+    "%Y/%m/%d %H:%M:%S",
+    "%d/%m/%Y %H:%M:%S",
+    "%m/%d/%Y %H:%M:%S",
+    "%d.%m.%Y %H:%M:%S",
+    "%Y%m%d%H%M%S",
+])
+def test_fixed_width_parser_round_trips(fmt):
+    strings = TIMESTAMPS.dt.strftime(fmt)
+    parsed = _parse_fixed_width(strings, fmt)
+    assert parsed is not None
+    pd.testing.assert_series_equal(parsed, pd.to_datetime(strings, format=fmt))
+    pd.testing.assert_series_equal(parse_datetimes(strings, fmt), pd.to_datetime(strings, format=fmt))
+
+
+@pytest.mark.parametrize("fmt", ["%Y-%m-%d %H:%M", "%Y-%m-%d", "%Y%m%d"])
+def test_fixed_width_parser_round_trips_without_seconds(fmt):
+    strings = TIMESTAMPS.dt.strftime(fmt)
+    expected = pd.to_datetime(strings, format=fmt)
+    pd.testing.assert_series_equal(_parse_fixed_width(strings, fmt), expected)
+
+
+def test_fixed_width_parser_rejects_impossible_dates():
+    with pytest.raises(ValueError):
+        _parse_fixed_width(pd.Series(["2023-02-30 00:00:00"]), "%Y-%m-%d %H:%M:%S")
+    with pytest.raises(ValueError):
+        _parse_fixed_width(pd.Series(["2023-01-01 24:00:00"]), "%Y-%m-%d %H:%M:%S")
+    with pytest.raises(ValueError):
+        _parse_fixed_width(pd.Series(["2023-01-0a 00:00:00"]), "%Y-%m-%d %H:%M:%S")
+
+
+def test_fixed_width_parser_defers_variable_width_values():
+    # Unpadded values and formats with variable-width fields are left to pandas
+    assert _parse_fixed_width(pd.Series(["2023-1-1 00:00:00"]), "%Y-%m-%d %H:%M:%S") is None
+    assert _parse_fixed_width(pd.Series(["2023-01-01 00:00:00.5"]), "%Y-%m-%d %H:%M:%S.%f") is None
+
+
+@pytest.mark.parametrize("fmt", ["%Y-%m-%d %H:%M:%S", "%Y-%m-%dT%H:%M", "%d.%m.%Y %H:%M", "%Y/%m/%d %H:%M"])
+def test_detects_strftime_formats(fmt):
+    assert detect_datetime_format(TIMESTAMPS.dt.strftime(fmt)) == fmt
+
+
+def test_detects_day_first_dates_from_later_values():
+    strings = pd.Series(["01/02/2023 00:00", "05/02/2023 00:00", "25/02/2023 00:00"])
+    assert detect_datetime_format(strings) == "%d/%m/%Y %H:%M"
+
+
+@pytest.mark.parametrize("fmt", ["%Y%m%d", "%Y%m%d%H%M", "%Y%m%d%H%M%S"])
+def test_detects_compact_formats_before_epochs(fmt):
+    strings = TIMESTAMPS.dt.strftime(fmt)
+    assert detect_datetime_format(strings) == fmt
+    assert detect_datetime_format(strings.astype(np.int64)) == fmt
+
+
+@pytest.mark.parametrize("unit, fmt", [("s", "epoch_s"), ("ms", "epoch_ms"), ("us", "epoch_us"), ("ns", "epoch_ns")])
+def test_detects_and_parses_epochs(unit, fmt):
+    numbers = pd.Series(TIMESTAMPS.astype("datetime64[ns]").astype(np.int64) // pd.Timedelta(1, unit=unit).value)
+    assert detect_datetime_format(numbers) == fmt
+    assert detect_datetime_format(numbers.astype(str)) == fmt
+    pd.testing.assert_series_equal(parse_datetimes(numbers, fmt).astype("datetime64[ns]"),
+                                   TIMESTAMPS.astype("datetime64[ns]"))
+
+
+def test_implausible_integers_are_not_epochs():
+    assert detect_datetime_format(pd.Series([1, 2, 3])) is None
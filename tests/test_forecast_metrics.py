@@ -0,0 +1,84 @@
+import numpy as np
+import pytest
+
+from agents.forecast_metrics import METRIC_NAMES, compute_metrics
+
+
+def _reference_metrics(y_true, y_pred, quantile=0.5):
+    """Per-vector metrics as ModelingAgent._evaluate_model computed them before the batched engine."""
+    keep = ~np.isnan(y_true)
+    y_true, y_pred = y_true[keep], y_pred[keep]
+    if not np.all(np.isfinite(y_pred)):
+        return {name: -np.inf if name == "R2_Score" else np.inf for name in METRIC_NAMES}
+    nonzero = y_true != 0
+    if not nonzero.any():
+        mape = 0.0 if np.allclose(y_pred, 0) else np.inf
+    else:
+        mape = np.mean(np.abs(y_true[nonzero] - y_pred[nonzero]) / np.abs(y_true[nonzero]))
+    error = y_true - y_pred
+    denominator = np.abs(y_true) + np.abs(y_pred)
+    smape = np.mean([2 * abs(e) / d if d > 0 else 0.0 for e, d in zip(error, denominator)])
+    total = np.sum((y_true - y_true.mean()) ** 2)
+    residual = np.sum(error ** 2)
+    r2 = 1 - residual / total if total > 0 else (1.0 if residual == 0 else 0.0)
+    return {"MAPE": mape, "sMAPE": smape, "MAE": np.mean(np.abs(error)), "RMSE": np.sqrt(np.mean(error ** 2)),
+            "R2_Score": r2, "Pinball": np.mean(np.maximum(quantile * error, (quantile - 1) * error))}
+
+
+def _batch(seed=0):
+    rng = np.random.default_rng(seed)
+    y_true = rng.gamma(4.0, 25.0, 48)
+    y_true[[3, 17]] = 0.0 # Zero actuals: skipped by MAPE only
+    y_true[30] = np.nan # Missing actual: skipped by every metric
+    y_pred = y_true[None, :] + rng.normal(0, 5, (5, 48))
+    y_pred[2, 10] = np.inf # Broken forecast
+    y_pred[3, 30] = np.nan # Prediction at a missing actual does not count
+    return y_true, y_pred
+
+
+@pytest.mark.parametrize("quantile", [0.5, 0.9])
+def test_batched_metrics_match_per_vector_reference(quantile):
+    y_true, y_pred = _batch()
+    metrics = compute_metrics(y_true, y_pred, quantile=quantile)
+    for row in range(len(y_pred)):
+        expected = _reference_metrics(y_true, y_pred[row], quantile)
+        for name in METRIC_NAMES:
+            assert metrics[name][row] == pytest.approx(expected[name]), (name, row)
+    assert metrics["MAE"][2] == np.inf and metrics["R2_Score"][2] == -np.inf
+    assert np.isfinite(metrics["MAE"][3])
+
+
+def test_one_dimensional_input_returns_floats():
+    y_true, y_pred = _batch()
+    metrics = compute_metrics(y_true, y_pred[0])
+    assert all(isinstance(value, float) for value in metrics.values())
+    assert metrics["Pinball"] == pytest.approx(metrics["MAE"] / 2)
+
+
+def test_folds_by_horizon_broadcast_against_each_other():
+    rng = np.random.default_rng(1)
+    y_true = rng.normal(100, 10, (4, 12))
+    y_pred = y_true + rng.normal(0, 1, (4, 12))
+    metrics = compute_metrics(y_true, y_pred)
+    for fold in range(4):
+        assert metrics["RMSE"][fold] == pytest.approx(compute_metrics(y_true[fold], y_pred[fold])["RMSE"])
+
+
+def test_degenerate_actuals():
+    assert compute_metrics(np.zeros(5), np.zeros(5))["MAPE"] == 0.0
+    assert compute_metrics(np.zeros(5), np.ones(5))["MAPE"] == np.inf
+    assert compute_metrics(np.full(5, 3.0), np.full(5, 3.0))["R2_Score"] == 1.0
+    assert compute_metrics(np.full(5, 3.0), np.full(5, 4.0))["R2_Score"] == 0.0
+
+
+def test_matches_sklearn_on_finite_data():
+    sklearn_metrics = pytest.importorskip("sklearn.metrics")
+    rng = np.random.default_rng(2)
+    y_true = rng.gamma(4.0, 25.0, 200)
+    y_pred = y_true + rng.normal(0, 8, 200)
+    metrics = compute_metrics(y_true, y_pred)
+    assert metrics["MAPE"] == pytest.approx(sklearn_metrics.mean_absolute_percentage_error(y_true, y_pred))
+    assert metrics["MAE"] == pytest.approx(sklearn_metrics.mean_absolute_error(y_true, y_pred))
+    assert metrics["RMSE"] == pytest.approx(np.sqrt(sklearn_metrics.mean_squared_error(y_true, y_pred)))
+    assert metrics["R2_Score"] == pytest.approx(sklearn_metrics.r2_score(y_true, y_pred))
+    assert metrics["Pinball"] == pytest.approx(sklearn_metrics.mean_pinball_loss(y_true, y_pred, alpha=0.5))
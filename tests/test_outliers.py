@@ -0,0 +1,72 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from agents.data_processing_agent import DataProcessingAgent
+from agents.outliers import hampel_filter, repair_outliers, robust_scale
+
+WINDOW = 7
+
+
+def _series(n=60, seed=0):
+    rng = np.random.default_rng(seed)
+    values = 100 + 10 * np.sin(np.arange(n) / 4) + rng.normal(0, 1, n)
+    values[[5, 17, 18, 40]] = [400, -50, 300, 0]
+    values[25:32] = 120.0 # Flat run: the window MAD is 0 there
+    return values
+
+
+@pytest.mark.parametrize("chunk", [1, WINDOW - 1, WINDOW, WINDOW + 1])
+def test_hampel_in_pieces_matches_single_pass(chunk):
+    values = _series()
+    scale = robust_scale(values)
+    expected = hampel_filter(values, WINDOW, scale=scale)
+    pieces = [hampel_filter(values[start:start + chunk], WINDOW, context=values[:start],
+                            lookahead=values[start + chunk:], scale=scale)
+              for start in range(0, len(values), chunk)]
+    for expected_part, part in zip(expected, zip(*pieces)):
+        np.testing.assert_array_equal(np.concatenate(part), expected_part)
+
+
+def test_hampel_flags_spikes_but_not_changes_after_flat_windows():
+    values = _series()
+    is_outlier, _, _ = hampel_filter(values, WINDOW)
+    assert is_outlier[[5, 17, 40]].all()
+    assert not is_outlier[25:32].any()
+
+
+@pytest.mark.parametrize("repair", ["median", "interpolate", "clip", "drop", "flag"])
+def test_repair_outliers_counts_and_removes_spikes(repair):
+    df = pd.DataFrame({"load": _series()}, index=pd.date_range("2023-01-01", periods=60, freq="h"))
+    repaired, n_flagged = repair_outliers(df, "load", repair, window=WINDOW)
+    assert n_flagged >= 3
+    if repair == "drop":
+        assert len(repaired) == len(df) - n_flagged
+    elif repair == "flag":
+        pd.testing.assert_frame_equal(repaired, df)
+    else:
+        assert repaired["load"].max() < 400
+        assert len(repaired) == len(df)
+
+
+@pytest.mark.parametrize("chunksize", [1, WINDOW - 1, WINDOW, WINDOW + 1])
+@pytest.mark.parametrize("repair", ["median", "drop"])
+def test_streamed_outlier_repair_matches_single_pass(tmp_path, chunksize, repair):
+    values = _series()
+    raw_path = tmp_path / "raw.csv"
+    pd.DataFrame({"timestamp": pd.date_range("2023-01-01", periods=len(values), freq="h").strftime("%Y-%m-%d %H:%M:%S"),
+                  "load": values}).to_csv(raw_path, index=False)
+
+    def agent(name):
+        return DataProcessingAgent(raw_data_dir=str(tmp_path / name / "raw"), processed_data_dir=str(tmp_path / name),
+                                   outlier_repair=repair, outlier_window=WINDOW)
+
+    single = agent("single")
+    expected = single.process_data(str(raw_path), "timestamp", "load", output_filename="out.parquet")
+    streamed = agent("streamed")
+    path = streamed.process_data_streaming(str(raw_path), "timestamp", "load", output_filename="out.parquet",
+                                           chunksize=chunksize)
+    assert path is not None
+    assert streamed.cleaning_stats["outliers"] == single.cleaning_stats["outliers"] > 0
+    result = pd.read_parquet(path)
+    pd.testing.assert_frame_equal(result, expected, check_freq=False)
@@ -0,0 +1,78 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from agents.time_grid import granularity_to_freq, grid_label, infer_grid_freq, regularize
+
+
+def _frame(timestamps, values):
+    return pd.DataFrame({"load": np.asarray(values, dtype=np.float64)},
+                        index=pd.DatetimeIndex(pd.to_datetime(timestamps), name="timestamp"))
+
+
+def test_aggregates_readings_into_left_labelled_intervals():
+    df = _frame(["2023-01-01 00:10", "2023-01-01 00:50", "2023-01-01 01:20"], [1, 3, 10])
+    grid = regularize(df, "load", "h")
+    assert list(grid.index) == list(pd.to_datetime(["2023-01-01 00:00", "2023-01-01 01:00"]))
+    assert grid["load"].tolist() == [2.0, 10.0]
+    assert regularize(df, "load", "h", agg="sum")["load"].tolist() == [4.0, 10.0]
+
+
+def test_interpolates_short_gaps_and_drops_long_ones():
+    index = pd.date_range("2023-01-01", periods=12, freq="h")
+    values = np.arange(12, dtype=np.float64)
+    keep = np.ones(12, dtype=bool)
+    keep[[2, 3]] = False # Gap of 2 intervals: interpolated
+    keep[6:10] = False # Gap of 4 intervals: dropped
+    grid = regularize(_frame(index[keep], values[keep]), "load", "h", max_gap=3)
+    expected_index = index[~np.isin(np.arange(12), range(6, 10))]
+    assert list(grid.index) == list(expected_index)
+    np.testing.assert_allclose(grid["load"], values[~np.isin(np.arange(12), range(6, 10))])
+
+
+def test_gap_of_exactly_max_gap_is_filled():
+    index = pd.date_range("2023-01-01", periods=6, freq="h")
+    df = _frame(index[[0, 4, 5]], [0, 4, 5])
+    assert len(regularize(df, "load", "h", max_gap=3)) == 6
+    assert len(regularize(df, "load", "h", max_gap=2)) == 3
+
+
+def test_anchor_interpolates_across_the_boundary_and_drops_settled_readings():
+    anchor = pd.Series({"load": 0.0}, name=pd.Timestamp("2023-01-01 00:00"))
+    df = _frame(["2023-01-01 00:30", "2023-01-01 03:00"], [99, 3])
+    grid = regularize(df, "load", "h", anchor=anchor)
+    # The 00:30 reading falls into the anchor's interval and is dropped; 01:00 and 02:00 are interpolated from it
+    assert list(grid.index) == list(pd.date_range("2023-01-01 01:00", periods=3, freq="h"))
+    np.testing.assert_allclose(grid["load"], [1.0, 2.0, 3.0])
+
+
+@pytest.mark.parametrize("split", [1, 3, 5])
+def test_regularizing_in_parts_with_an_anchor_matches_one_pass(split):
+    index = pd.date_range("2023-01-01", periods=10, freq="h") + pd.Timedelta(minutes=15)
+    keep = np.ones(10, dtype=bool)
+    keep[[4, 5]] = False
+    df = _frame(index[keep], np.arange(10)[keep])
+    expected = regularize(df, "load", "h")
+    first = regularize(df.iloc[:split], "load", "h")
+    second = regularize(df.iloc[split:], "load", "h", anchor=first.iloc[-1])
+    pd.testing.assert_frame_equal(pd.concat([first, second]), expected, check_freq=False)
+
+
+def test_grid_is_aligned_to_the_epoch():
+    assert grid_label(pd.Timestamp("2023-01-01 00:20"), "15min") == pd.Timestamp("2023-01-01 00:15")
+    df = _frame(["2023-01-01 00:20", "2023-01-01 00:50"], [1, 2])
+    assert regularize(df, "load", "15min").index[0] == pd.Timestamp("2023-01-01 00:15")
+
+
+def test_unknown_aggregation_raises():
+    with pytest.raises(ValueError):
+        regularize(_frame(["2023-01-01"], [1]), "load", "h", agg="mode")
+
+
+def test_granularity_and_inferred_frequencies():
+    assert granularity_to_freq("Hourly") == "h"
+    assert granularity_to_freq("Daily") == "D"
+    assert granularity_to_freq("fortnightly") is None
+    index = pd.DatetimeIndex(pd.to_datetime(["2023-01-01 00:00:01", "2023-01-01 00:15:00", "2023-01-01 00:30:00",
+                                             "2023-01-01 01:30:00", "2023-01-01 01:45:02"]))
+    assert infer_grid_freq(index) == "15min"